@@ -0,0 +1,348 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.aiobackend
+~~~~~~~~~~~~~~~~~
+
+This module provides the ``asyncio`` engine of the backend daemon. All client
+sockets are served from a single event loop, so an idle connection costs a
+suspended coroutine instead of a thread and its stack. Request processing is
+the same :meth:`HttpAdapter.dispatch <HttpAdapter.dispatch>` used by the
+threaded engine: it runs in a thread pool executor because the endpoints do
+blocking file and socket I/O, and writes its response through a
+:class:`WriterSink` that applies the stream's backpressure.
+
+Requirements:
+--------------
+- asyncio: event loop and stream based socket I/O.
+- concurrent.futures: executor for the blocking request handlers.
+- httpadapter: the class for handling HTTP requests.
+
+Usage Example:
+--------------
+>>> create_backend("127.0.0.1", 9000, routes={}, engine="asyncio")
+
+"""
+
+import asyncio
+import concurrent.futures
+
+from . import backend
+from .httpadapter import HttpAdapter
+from .httpparser import RequestParser, HttpParseError, BodyStream, READ_SIZE
+from .router import compile_routes
+
+#: Seconds a new client may take to start its first request, and seconds
+#: allowed between two reads of a request that has started arriving.
+READ_TIMEOUT = 2.0
+
+#: Listen backlog of the asyncio server socket.
+BACKLOG = 1024
+
+
+class ResponseSink:
+    """A socket stand-in collecting a response built on the event loop
+    itself, such as :meth:`HttpAdapter.reject`.
+
+    Like a real socket, sending after :meth:`close` raises :class:`OSError`,
+    so a handler branch that falls through after answering cannot append a
+    second response.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def sendall(self, data):
+        if self.closed:
+            raise OSError("sink is closed")
+        self.chunks.append(bytes(data))
+
+    def sendmsg(self, buffers):
+        if self.closed:
+            raise OSError("sink is closed")
+        self.chunks.extend(bytes(buf) for buf in buffers)
+        return sum(len(buf) for buf in buffers)
+
+    def close(self):
+        self.closed = True
+
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+
+class WriterSink:
+    """A socket stand-in that lets :meth:`HttpAdapter.dispatch`, running in
+    an executor thread, write to a :class:`asyncio.StreamWriter`.
+
+    Every :meth:`sendall` waits until the event loop has handed the bytes
+    to the transport and the transport buffer has drained below its high
+    water mark, so a streamed response is produced no faster than the
+    client reads it.
+    """
+
+    def __init__(self, writer, loop):
+        self.writer = writer
+        self.loop = loop
+
+    async def _write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def sendall(self, data):
+        asyncio.run_coroutine_threadsafe(self._write(data), self.loop).result()
+
+    async def _writelines(self, buffers):
+        self.writer.writelines(buffers)
+        await self.writer.drain()
+
+    def sendmsg(self, buffers):
+        """Writes several buffers in one hop to the event loop; the
+        transport takes them whole, so the count returned is never short."""
+        asyncio.run_coroutine_threadsafe(self._writelines(buffers), self.loop).result()
+        return sum(len(buf) for buf in buffers)
+
+    async def _sendfile(self, file, offset, count):
+        await self.writer.drain()
+        return await self.loop.sendfile(self.writer.transport, file, offset, count)
+
+    def sendfile(self, file, offset=0, count=None):
+        """Sends part of a file with ``loop.sendfile`` (``os.sendfile`` when
+        the transport allows it, reads and writes otherwise)."""
+        return asyncio.run_coroutine_threadsafe(
+            self._sendfile(file, offset, count), self.loop).result()
+
+
+class AsyncBackend:
+    """The event loop server behind ``create_backend(..., engine="asyncio")``.
+
+    :attrs ip (str): IP address to bind the server.
+    :attrs port (int): Port number to listen on.
+    :attrs routes (RouteTable): compiled dispatch table.
+    :attrs executor (ThreadPoolExecutor): runs the blocking handlers.
+    :attrs connections (int): currently open client connections.
+    """
+
+    def __init__(self, ip, port, routes, max_workers=None, reuse_port=False):
+        self.ip = ip
+        self.port = port
+        self.routes = compile_routes(routes)
+        self.reuse_port = reuse_port
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="backend-handler"
+        )
+        self.connections = 0
+        self.served = 0
+
+    async def read_requests(self, reader, pipeline, parser, body_consumed):
+        """
+        Parses requests ahead of the responses and queues them in arrival
+        order. ``pipeline`` is bounded, so once it holds
+        :attr:`HttpAdapter.max_pipeline_depth` requests this task stops
+        reading and the client is held back by TCP flow control. A parse
+        error is queued as the :class:`HttpParseError` itself and a ``None``
+        entry marks the end of the input.
+
+        Like the threaded reader, once part of a request has arrived every
+        read must bring more within :data:`READ_TIMEOUT`, or the request is
+        queued as incomplete; a slow but steady upload is never cut off.
+        Waiting between requests is timed by :meth:`handle_client`.
+
+        A request with a streamed body hands the stream over to its handler:
+        this task waits until ``body_consumed`` is set, once the handler is
+        done with the body, before it reads on. The parser's buffer goes
+        back to the pool when this task ends.
+
+        :param reader (asyncio.StreamReader): client input stream.
+        :param pipeline (asyncio.Queue): requests waiting for a response.
+        :param parser (RequestParser): parser of the connection.
+        :param body_consumed (asyncio.Event): set by :meth:`handle_client`
+                                              after a streamed request.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                msg = parser.next_request()
+                if msg is not None:
+                    if isinstance(msg.body, BodyStream):
+                        msg.body.fill = self.body_reader(reader, parser, loop)
+                        body_consumed.clear()
+                        await pipeline.put(msg)
+                        await body_consumed.wait()
+                        if not msg.body.done:
+                            break
+                        continue
+                    await pipeline.put(msg)
+                    continue
+                if parser.pending():
+                    try:
+                        data = await asyncio.wait_for(reader.read(READ_SIZE), READ_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        await pipeline.put(HttpParseError("incomplete request"))
+                        break
+                else:
+                    data = await reader.read(READ_SIZE)
+                if not data:
+                    if parser.pending():
+                        await pipeline.put(HttpParseError("incomplete request"))
+                    break
+                parser.feed(data)
+        except HttpParseError as e:
+            await pipeline.put(e)
+        except ConnectionError:
+            pass
+        finally:
+            parser.release()
+        await pipeline.put(None)
+
+    def body_reader(self, reader, parser, loop):
+        """
+        Returns the ``fill`` callable of a :class:`BodyStream`. It runs in
+        an executor thread and reads through the event loop.
+
+        :param reader (asyncio.StreamReader): client input stream.
+        :param parser (RequestParser): parser the bytes are fed to.
+        :param loop (asyncio.AbstractEventLoop): loop owning ``reader``.
+
+        :rtype callable: ``fill() -> int``, 0 once the client has closed.
+        """
+        def fill():
+            future = asyncio.run_coroutine_threadsafe(reader.read(READ_SIZE), loop)
+            try:
+                data = future.result(READ_TIMEOUT)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise HttpParseError("request body timed out")
+            except ConnectionError:
+                return 0
+            parser.feed(data)
+            return len(data)
+        return fill
+
+    async def handle_client(self, reader, writer):
+        """
+        Serves the requests of one client connection from the event loop,
+        keeping it open as long as :attr:`HttpAdapter.keep_alive` allows.
+        Pipelined requests are answered one after the other, in order. The
+        connection is closed once it has been idle, with no request even
+        partly received, for the keep-alive timeout (:data:`READ_TIMEOUT`
+        before the first request).
+
+        :param reader (asyncio.StreamReader): client input stream.
+        :param writer (asyncio.StreamWriter): client output stream.
+        """
+        addr = writer.get_extra_info("peername")
+        adapter = HttpAdapter(self.ip, self.port, None, addr, self.routes)
+        loop = asyncio.get_running_loop()
+        sink = WriterSink(writer, loop)
+        pipeline = asyncio.Queue(maxsize=adapter.max_pipeline_depth)
+        parser = RequestParser(stream_body=self.routes.streams,
+                               max_body_size=adapter.max_body_size)
+        # At most one streamed body is in flight: the reader waits for it.
+        body_consumed = asyncio.Event()
+        read_ahead = asyncio.ensure_future(
+            self.read_requests(reader, pipeline, parser, body_consumed))
+        self.connections += 1
+        try:
+            while True:
+                timeout = adapter.keepalive_timeout if adapter.served else READ_TIMEOUT
+                try:
+                    msg = await asyncio.wait_for(pipeline.get(), timeout)
+                except asyncio.TimeoutError:
+                    # A request still arriving is timed per read by
+                    # read_requests, only an idle connection ends here.
+                    if parser.pending():
+                        continue
+                    break
+                if not msg:
+                    break
+                if isinstance(msg, HttpParseError):
+                    rejected = ResponseSink()
+                    adapter.reject(rejected, msg)
+                    writer.write(rejected.getvalue())
+                    await writer.drain()
+                    break
+
+                adapter.next_request()
+                try:
+                    await loop.run_in_executor(self.executor, adapter.dispatch,
+                                               sink, msg, self.routes)
+                finally:
+                    if isinstance(msg.body, BodyStream):
+                        body_consumed.set()
+                    msg.release()
+                self.served += 1
+
+                if not adapter.keep_alive:
+                    break
+        except ConnectionError as e:
+            print("[Backend] connection error on {}: {}".format(addr, e))
+        finally:
+            read_ahead.cancel()
+            # Requests parsed ahead but never answered give their buffers back.
+            while not pipeline.empty():
+                msg = pipeline.get_nowait()
+                if msg and not isinstance(msg, HttpParseError):
+                    msg.release()
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def stats(self):
+        """
+        Returns the engine occupancy for ``/pool-status``.
+
+        :rtype dict: mode, connections, served, workers.
+        """
+        return {
+            "mode": "asyncio",
+            "connections": self.connections,
+            "served": self.served,
+            "workers": self.executor._max_workers,
+        }
+
+    async def serve(self):
+        server = await asyncio.start_server(
+            self.handle_client, self.ip, self.port,
+            backlog=BACKLOG,
+            reuse_port=self.reuse_port or None
+        )
+        print("[Backend] Listening on port {} (asyncio)".format(self.port))
+        if self.routes.app_routes:
+            print("[Backend] route settings {}".format(self.routes.app_routes))
+        async with server:
+            await server.serve_forever()
+
+
+def run_aio_backend(ip, port, routes, max_workers=None, reuse_port=False):
+    """
+    Starts the asyncio engine and blocks serving requests.
+
+    :param ip (str): IP address to bind the server.
+    :param port (int): Port number to listen on.
+    :param routes (dict): Dictionary of route handlers.
+    :param max_workers (int): executor threads for the handlers, None for the default.
+    :param reuse_port (bool): bind with ``SO_REUSEPORT`` (pre-fork workers).
+    """
+    server = AsyncBackend(ip, port, routes, max_workers, reuse_port)
+    backend._pool = server
+    try:
+        asyncio.run(server.serve())
+    except OSError as e:
+        print("Socket error: {}".format(e))
+    finally:
+        server.executor.shutdown(wait=False)
@@ -23,6 +23,8 @@ Requirements:
 --------------
 - socket: provide socket networking interface.
 - threading: Enables concurrent client handling via threads.
+- queue: bounded hand-off queue between the accept loop and the worker pool.
+- selectors: watches the idle keep-alive connections of the worker pool.
 - response: response utilities.
 - httpadapter: the class for handling HTTP requests.
 - CaseInsensitiveDict: provides dictionary for managing headers or routes.
@@ -31,26 +33,316 @@ Requirements:
 Notes:
 ------
 - The server create daemon threads for client handling.
+- With ``pool_size > 0`` a fixed :class:`WorkerPool <WorkerPool>` serves the
+  connections instead; when its queue is full the client gets an immediate
+  ``503 Service Unavailable`` with ``Retry-After``.
+- In pool mode a keep-alive connection waiting for its next request holds
+  no worker: it is parked in :class:`IdleConnections <IdleConnections>` and
+  queued again when the request arrives. Every request after the first thus
+  pays one more hand-off between threads, and is answered ``503`` like a new
+  connection if the queue is full at that moment; in exchange idle clients
+  (the chat page polls every few seconds) never starve the busy ones.
 - The current implementation error handling is minimal, socket errors are printed to the console.
 - The actual request processing is delegated to the HttpAdapter class.
 
 Usage Example:
 --------------
 >>> create_backend("127.0.0.1", 9000, routes={})
+>>> create_backend("127.0.0.1", 9000, routes={}, pool_size=32, queue_size=256)
+>>> create_backend("127.0.0.1", 9000, routes={}, engine="asyncio")
 
 """
 
 import socket
 import threading
 import argparse
+import queue
+import selectors
+import signal
+import time
 
 from .response import *
 from .httpadapter import HttpAdapter
+from .router import compile_routes
+from .filecache import static_cache
+from .compression import encoder
+from .sockio import send_buffers
+from .manifest import assets
+from .bufferpool import buffers
+from .httpparser import MAX_HEADER_SIZE, READ_SIZE
 from .dictionary import CaseInsensitiveDict
 
 # Global simple in-memory session store
 sessions = {}
 
+#: Default depth of the accept queue in front of the worker pool.
+DEFAULT_QUEUE_SIZE = 128
+
+#: Default ``Retry-After`` (seconds) advertised when the pool is saturated.
+DEFAULT_RETRY_AFTER = 1
+
+#: Seconds a rejected connection may take to accept its ``503`` and to be
+#: drained of the request it sent.
+REJECT_TIMEOUT = 0.5
+
+#: The running :class:`WorkerPool <WorkerPool>`, or None in thread-per-connection mode.
+_pool = None
+
+
+class IdleConnections:
+    """Keep-alive connections of a :class:`WorkerPool` waiting for their next
+    request, watched by one selector thread instead of a worker each.
+
+    A worker hands a connection over with :meth:`park` once it has answered
+    every request received on it. When the client sends more, the
+    connection is submitted to the pool again (``503`` if the queue is
+    full); one idle for :attr:`HttpAdapter.keepalive_timeout
+    <daemon.httpadapter.HttpAdapter.keepalive_timeout>` seconds is closed.
+
+    :attrs pool (WorkerPool): pool the woken connections are submitted to.
+    :attrs retry_after (int): ``Retry-After`` seconds sent with a ``503``.
+    :attrs deadlines (dict): parked socket -> time it is closed at, in
+                             parking order, which is also deadline order.
+    """
+
+    def __init__(self, pool, retry_after=DEFAULT_RETRY_AFTER):
+        self.pool = pool
+        self.retry_after = retry_after
+        self.selector = selectors.DefaultSelector()
+        self.deadlines = {}
+        self.pending = []
+        self.lock = threading.Lock()
+        # Parking from a worker wakes the selector up through this pair.
+        self.wakeup, self.notify = socket.socketpair()
+        self.wakeup.setblocking(False)
+        self.notify.setblocking(False)
+        self.selector.register(self.wakeup, selectors.EVENT_READ)
+
+    def start(self):
+        """Spawns the selector thread."""
+        threading.Thread(target=self._run, name="backend-idle", daemon=True).start()
+
+    def park(self, ip, port, conn, addr, routes, served):
+        """
+        Takes over a connection until its next request arrives. Called from
+        a worker, which must not touch ``conn`` afterwards.
+
+        :param served (int): requests already served on the connection.
+        """
+        with self.lock:
+            self.pending.append((ip, port, conn, addr, routes, served))
+        try:
+            self.notify.send(b"\0")
+        except BlockingIOError:
+            # The selector has wake-ups queued already.
+            pass
+
+    def _run(self):
+        timeout = None
+        while True:
+            for key, _ in self.selector.select(timeout):
+                if key.fileobj is self.wakeup:
+                    try:
+                        while self.wakeup.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                conn = key.fileobj
+                self.selector.unregister(conn)
+                del self.deadlines[conn]
+                task = key.data
+                if not self.pool.submit(*task):
+                    print("[Backend] pool saturated, rejecting {}".format(task[3]))
+                    reject_connection(conn, self.retry_after)
+
+            with self.lock:
+                pending, self.pending = self.pending, []
+            now = time.monotonic()
+            for task in pending:
+                conn = task[2]
+                try:
+                    self.selector.register(conn, selectors.EVENT_READ, task)
+                except (ValueError, OSError):
+                    conn.close()
+                    continue
+                self.deadlines[conn] = now + HttpAdapter.keepalive_timeout
+
+            # Deadlines are in parking order: expire from the front.
+            timeout = None
+            while self.deadlines:
+                conn, deadline = next(iter(self.deadlines.items()))
+                if deadline > now:
+                    timeout = deadline - now
+                    break
+                self.selector.unregister(conn)
+                del self.deadlines[conn]
+                conn.close()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+
+class WorkerPool:
+    """A fixed-size pool of worker threads fed by a bounded connection queue.
+
+    The accept loop calls :meth:`submit` for every new connection; one of the
+    ``size`` workers picks it up and runs :func:`handle_client`. At most
+    ``queue_size`` connections wait for a free worker, beyond that
+    :meth:`submit` refuses the connection so the caller can shed load.
+    Between two requests a keep-alive connection waits in :attr:`idle`,
+    not in a worker.
+
+    Usage::
+
+      >>> pool = WorkerPool(16, 64)
+      >>> pool.start()
+      >>> pool.submit(ip, port, conn, addr, routes)
+      True
+      >>> pool.stats()
+      {'workers': 16, 'busy': 1, 'idle': 15, 'queued': 0, ...}
+    """
+
+    def __init__(self, size, queue_size=DEFAULT_QUEUE_SIZE, retry_after=DEFAULT_RETRY_AFTER):
+        """
+        :param size (int): number of worker threads.
+        :param queue_size (int): maximum number of connections waiting for a worker.
+        :param retry_after (int): ``Retry-After`` seconds sent to a parked
+                                  connection that finds the queue full.
+        """
+        self.size = size
+        self.queue_size = queue_size
+        self.tasks = queue.Queue(maxsize=queue_size)
+        self.workers = []
+        self.busy = 0
+        self.accepted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self.idle = IdleConnections(self, retry_after)
+
+    def start(self):
+        """Spawns the worker threads and the idle connection selector."""
+        self.idle.start()
+        for i in range(self.size):
+            worker = threading.Thread(
+                target=self._run,
+                name="backend-worker-{}".format(i),
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, ip, port, conn, addr, routes, served=0):
+        """
+        Queues a connection for the next free worker.
+
+        :param served (int): requests already served on a parked connection.
+
+        :rtype bool: False if the queue is full and the connection was not taken.
+        """
+        try:
+            self.tasks.put_nowait((ip, port, conn, addr, routes, served))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.accepted += 1
+        return True
+
+    def _run(self):
+        # One adapter per worker, reset for every connection it serves.
+        adapter = None
+        while True:
+            ip, port, conn, addr, routes, served = self.tasks.get()
+            with self._lock:
+                self.busy += 1
+            try:
+                if adapter is None:
+                    adapter = HttpAdapter(ip, port, conn, addr, routes)
+                adapter.reset(ip, port, conn, addr, routes, served)
+                adapter.handle_client(conn, addr, routes, park=self.idle.park)
+            except Exception as e:
+                print("[Backend] worker error on {}: {}".format(addr, e))
+                try:
+                    conn.close()
+                except OSError:
+                    pass
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                self.tasks.task_done()
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool occupancy.
+
+        :rtype dict: workers, busy, idle, queued, queue_size, accepted,
+                     rejected, and parked keep-alive connections.
+        """
+        with self._lock:
+            busy = self.busy
+            accepted = self.accepted
+            rejected = self.rejected
+        return {
+            "workers": self.size,
+            "busy": busy,
+            "idle": self.size - busy,
+            "queued": self.tasks.qsize(),
+            "queue_size": self.queue_size,
+            "accepted": accepted,
+            "rejected": rejected,
+            "parked": len(self.idle),
+        }
+
+
+def pool_stats():
+    """
+    Returns the occupancy of the running worker pool.
+
+    :rtype dict: see :meth:`WorkerPool.stats`, or ``{"mode": "thread-per-connection"}``
+                 when no pool is configured.
+    """
+    if _pool is None:
+        return {"mode": "thread-per-connection"}
+    stats = _pool.stats()
+    stats.setdefault("mode", "pool")
+    return stats
+
+
+def reject_connection(conn, retry_after=DEFAULT_RETRY_AFTER):
+    """
+    Answers a connection the pool has no room for with ``503`` and closes it.
+
+    Closing a socket with unread bytes makes the kernel reset the
+    connection, which may discard the ``503`` before the client reads it.
+    The write side is therefore shut first and the request read and dropped
+    for at most :data:`REJECT_TIMEOUT` seconds, then the socket is closed.
+
+    :param conn (socket.socket): Client connection socket.
+    :param retry_after (int): seconds advertised in the ``Retry-After`` header.
+    """
+    body = b"503 Service Unavailable"
+    headers = {"Content-Type": "text/plain", "Retry-After": retry_after}
+    head = build_head("503 Service Unavailable", headers, len(body),
+                      tail=b"Connection: close\r\n")
+    try:
+        # Never let a slow client stall the accept loop.
+        conn.settimeout(REJECT_TIMEOUT)
+        send_buffers(conn, (head, body))
+        conn.shutdown(socket.SHUT_WR)
+        deadline = time.monotonic() + REJECT_TIMEOUT
+        while conn.recv(READ_SIZE):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            conn.settimeout(remaining)
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+
 def handle_client(ip, port, conn, addr, routes):
     """
     Initializes an HttpAdapter instance and delegates the client handling logic to it.
@@ -66,25 +358,45 @@ def handle_client(ip, port, conn, addr, routes):
     # Handle client
     daemon.handle_client(conn, addr, routes)
 
-def run_backend(ip, port, routes):
+def run_backend(ip, port, routes, pool_size=0, queue_size=DEFAULT_QUEUE_SIZE,
+                retry_after=DEFAULT_RETRY_AFTER, reuse_port=False):
     """
     Starts the backend server, binds to the specified IP and port, and listens for incoming
     connections. Each connection is handled in a separate thread. The backend accepts incoming
     connections and spawns a thread for each client.
 
+    When ``pool_size`` is positive the connections are handed to a bounded
+    :class:`WorkerPool <WorkerPool>` instead, and answered with ``503`` once
+    ``queue_size`` of them are already waiting.
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict): Dictionary of route handlers.
+    :param pool_size (int): number of worker threads, 0 for thread-per-connection.
+    :param queue_size (int): accept queue depth in front of the pool.
+    :param retry_after (int): ``Retry-After`` seconds sent with the 503.
+    :param reuse_port (bool): bind with ``SO_REUSEPORT`` so several worker
+                              processes can share the port.
     """
+    global _pool
+
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if reuse_port:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+    if pool_size > 0:
+        _pool = WorkerPool(pool_size, queue_size, retry_after)
+        _pool.start()
 
     try:
         server.bind((ip, port))
         server.listen(50)
         print("[Backend] Listening on port {}".format(port))
-        if routes != {}:
+        if routes:
             print("[Backend] route settings {}".format(routes))
+        routes = compile_routes(routes)
+        if _pool is not None:
+            print("[Backend] worker pool size={} queue={}".format(pool_size, queue_size))
 
         while True:
             conn, addr = server.accept()
@@ -95,6 +407,12 @@ def run_backend(ip, port, routes):
             #
             print(f"[Backend] Connection from {addr}")
 
+            if _pool is not None:
+                if not _pool.submit(ip, port, conn, addr, routes):
+                    print("[Backend] pool saturated, rejecting {}".format(addr))
+                    reject_connection(conn, retry_after)
+                continue
+
             # Tạo một thread mới để xử lý client này, chạy dưới dạng daemon
             client_thread = threading.Thread(
                 target=handle_client,
@@ -107,13 +425,88 @@ def run_backend(ip, port, routes):
     except socket.error as e:
       print("Socket error: {}".format(e))
 
-def create_backend(ip, port, routes={}):
+def _install_rescan_signal():
+    """Rescans the asset manifest on ``SIGHUP``. The scan runs in its own
+    thread so the handler returns at once, whatever the engine."""
+    if not hasattr(signal, "SIGHUP"):
+        return
+
+    def _rescan(signum, frame):
+        threading.Thread(target=assets.rescan, name="manifest-rescan", daemon=True).start()
+
+    try:
+        signal.signal(signal.SIGHUP, _rescan)
+    except ValueError:
+        # Not the main thread: the manifest stays as scanned at startup.
+        pass
+
+
+def create_backend(ip, port, routes={}, pool_size=0, queue_size=DEFAULT_QUEUE_SIZE,
+                   retry_after=DEFAULT_RETRY_AFTER, engine="threading",
+                   keepalive_timeout=None, max_keepalive_requests=None,
+                   max_pipeline_depth=None, max_body_size=None, reuse_port=False,
+                   cache_size=None, cache_revalidate=None, cache_control=None,
+                   compress_min_size=None, compress_level=None):
     """
     Entry point for creating and running the backend server.
 
+    ``engine="threading"`` serves every connection from a blocking socket in
+    its own (or a pooled) thread; ``engine="asyncio"`` serves all of them from
+    one event loop and only uses threads, ``pool_size`` of them when set, for
+    the request handlers.
+
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict, optional): Dictionary of route handlers. Defaults to empty dict.
+    :param pool_size (int, optional): worker threads, 0 keeps thread-per-connection.
+    :param queue_size (int, optional): connections allowed to wait for a worker.
+    :param retry_after (int, optional): ``Retry-After`` seconds on a 503.
+    :param engine (str, optional): ``"threading"`` (default) or ``"asyncio"``.
+    :param keepalive_timeout (float, optional): idle seconds before a persistent
+                                                connection is closed.
+    :param max_keepalive_requests (int, optional): requests served per connection.
+    :param max_pipeline_depth (int, optional): pipelined requests queued per connection.
+    :param max_body_size (int, optional): largest request body held in memory;
+                                          a larger one is answered with ``413``.
+    :param reuse_port (bool, optional): bind with ``SO_REUSEPORT``; set by the
+                                        pre-fork supervisor for every worker.
+    :param cache_size (int, optional): byte budget of the static file cache,
+                                       0 disables it.
+    :param cache_revalidate (float, optional): seconds before a cached file
+                                               is checked against the disk again.
+    :param cache_control (dict, optional): ``Cache-Control`` value per served
+                                           directory, e.g. ``{"static": "no-cache"}``,
+                                           merged into the defaults.
+    :param compress_min_size (int, optional): smallest response body compressed.
+    :param compress_level (int, optional): zlib level of the responses
+                                           compressed on the fly, 0 disables
+                                           compression.
+
+    :raises ValueError: If the engine is unknown.
     """
 
-    run_backend(ip, port, routes)
\ No newline at end of file
+    if keepalive_timeout is not None:
+        HttpAdapter.keepalive_timeout = keepalive_timeout
+    if max_keepalive_requests is not None:
+        HttpAdapter.max_keepalive_requests = max_keepalive_requests
+    if max_pipeline_depth is not None:
+        HttpAdapter.max_pipeline_depth = max_pipeline_depth
+    if max_body_size is not None:
+        HttpAdapter.max_body_size = max_body_size
+        # The pool must hand out the largest buffer a parser may ask for.
+        buffers.configure(max_size=max(buffers.max_size,
+                                       MAX_HEADER_SIZE + max_body_size + READ_SIZE))
+    static_cache.configure(max_bytes=cache_size, revalidate_interval=cache_revalidate,
+                           cache_control=cache_control)
+    encoder.configure(min_size=compress_min_size, level=compress_level)
+    assets.rescan()
+    _install_rescan_signal()
+
+    if engine == "asyncio":
+        from .aiobackend import run_aio_backend
+        run_aio_backend(ip, port, routes, max_workers=pool_size or None,
+                        reuse_port=reuse_port)
+    elif engine == "threading":
+        run_backend(ip, port, routes, pool_size, queue_size, retry_after, reuse_port)
+    else:
+        raise ValueError("Invalid backend engine: {}".format(engine))
\ No newline at end of file
@@ -0,0 +1,413 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.balancer
+~~~~~~~~~~~~~~~~~
+
+This module provides the load-balancing policies the proxy applies when a
+virtual host has several ``proxy_pass`` backends, selected by the host's
+``dist_policy``:
+
+- ``round-robin``: the backends in turn;
+- ``weighted-round-robin``: in turn, each backend as often as its
+  ``weight`` (``proxy_pass http://127.0.0.1:9001 weight=3;``), spread out
+  rather than in bursts;
+- ``least-outstanding``: the backend with the fewest requests in flight;
+- ``power-of-two``: the less loaded of two backends drawn at random, close
+  to ``least-outstanding`` without keeping the backends ordered.
+
+Every virtual host has its own :class:`Balancer`, built once from the
+routes. Choosing a backend takes constant time whatever the number of
+backends, under the balancer's lock. Only the backends marked healthy
+(:meth:`Balancer.set_healthy`, driven by :mod:`daemon.health`) are
+chosen; the policy's state is rebuilt over them when one changes, which
+is rare next to the requests. The caller hands the backend back
+with :meth:`Member.release` once the response is sent, which is how the
+in-flight counts are kept.
+
+Usage::
+
+  >>> balancer = balancers.lookup("app.local", routes)
+  >>> member = balancer.acquire()
+  >>> forward_request(member.host, member.port, request)
+  >>> member.release()
+"""
+
+import math
+import random
+import threading
+
+#: Policy of a host without ``dist_policy``.
+DEFAULT_POLICY = "round-robin"
+
+
+class Member:
+    """One backend of a virtual host.
+
+    :attrs address (str): ``host:port`` as written in ``proxy_pass``.
+    :attrs weight (int): share of the requests under ``weighted-round-robin``.
+    :attrs outstanding (int): requests forwarded and not yet answered.
+    :attrs picks (int): requests forwarded so far.
+    :attrs healthy (bool): False while health checks find the backend down.
+    :attrs balancer (Balancer): the balancer the member belongs to.
+    """
+
+    __slots__ = ("index", "address", "host", "port", "weight", "outstanding", "picks",
+                 "healthy", "balancer")
+
+    def __init__(self, index, address, weight=1):
+        host, _, port = address.rpartition(":")
+        if not host:
+            raise ValueError("proxy_pass {!r} has no port".format(address))
+        if weight < 1:
+            raise ValueError("proxy_pass {} has weight {}, must be 1 or more".format(address, weight))
+        self.index = index
+        self.address = address
+        self.host = host
+        self.port = int(port)
+        self.weight = weight
+        self.outstanding = 0
+        self.picks = 0
+        self.healthy = True
+        self.balancer = None
+
+    def release(self):
+        """Marks the request forwarded to this backend as answered."""
+        self.balancer.release(self)
+
+
+def parse_members(proxy_map):
+    """
+    Builds the members of a host from its ``routes`` entry.
+
+    :param proxy_map (str or list): ``"host:port"``, or a list of
+                                    ``"host:port"`` and ``("host:port", weight)``.
+
+    :rtype list: :class:`Member` objects, in configuration order.
+    """
+    if isinstance(proxy_map, str):
+        proxy_map = [proxy_map]
+    members = []
+    for entry in proxy_map:
+        address, weight = (entry, 1) if isinstance(entry, str) else entry
+        members.append(Member(len(members), address, int(weight)))
+    return members
+
+
+class Balancer:
+    """Base policy: the bookkeeping shared by all of them. Subclasses
+    implement :meth:`_choose` and :meth:`_rebuild`, called with the lock
+    held; :meth:`_choose` only while some member is healthy.
+
+    :attrs policy (str): ``dist_policy`` name.
+    :attrs members (list): the host's :class:`Member` objects.
+    :attrs active (list): the healthy ones, in configuration order.
+    """
+
+    policy = None
+
+    def __init__(self, members):
+        if not members:
+            raise ValueError("a balancer needs at least one backend")
+        self.members = members
+        for member in members:
+            member.balancer = self
+        self.active = [member for member in members if member.healthy]
+        self.lock = threading.Lock()
+        self._rebuild()
+
+    def acquire(self):
+        """
+        Chooses the backend of the next request and counts it as in flight.
+
+        :rtype Member: the backend, to be given back with :meth:`release`;
+                       None if no backend is healthy.
+        """
+        with self.lock:
+            if not self.active:
+                return None
+            member = self._choose()
+            self._started(member)
+            member.picks += 1
+            return member
+
+    def release(self, member):
+        """Marks the request forwarded to ``member`` as answered."""
+        with self.lock:
+            self._finished(member)
+
+    def set_healthy(self, member, healthy):
+        """
+        Marks ``member`` up or down; a member that is down is no longer
+        chosen, the requests already forwarded to it are still released.
+
+        :rtype bool: True if the state of the member changed.
+        """
+        with self.lock:
+            if member.healthy == healthy:
+                return False
+            member.healthy = healthy
+            self.active = [m for m in self.members if m.healthy]
+            self._rebuild()
+            return True
+
+    def _choose(self):
+        raise NotImplementedError
+
+    def _rebuild(self):
+        pass
+
+    def _started(self, member):
+        member.outstanding += 1
+
+    def _finished(self, member):
+        member.outstanding -= 1
+
+    def stats(self):
+        """
+        Returns the policy and per-backend counters.
+
+        :rtype dict: ``policy`` and, per backend address, its weight,
+                     requests in flight and requests forwarded.
+        """
+        with self.lock:
+            return {
+                "policy": self.policy,
+                "members": {
+                    m.address: {"weight": m.weight, "outstanding": m.outstanding,
+                                "picks": m.picks, "healthy": m.healthy}
+                    for m in self.members
+                },
+            }
+
+
+class RoundRobin(Balancer):
+    """The backends in configuration order, one request each."""
+
+    policy = "round-robin"
+
+    next = 0
+
+    def _rebuild(self):
+        if self.active:
+            self.next %= len(self.active)
+
+    def _choose(self):
+        index = self.next
+        self.next = (index + 1) % len(self.active)
+        return self.active[index]
+
+
+class WeightedRoundRobin(Balancer):
+    """Round-robin over a schedule in which every backend appears ``weight``
+    times (weights reduced by their common divisor).
+
+    The schedule is laid out once with the smooth weighted round-robin of
+    nginx, so weights 5, 1, 1 give ``a a b a c a a`` rather than five
+    requests in a row to the first backend; walking it costs one index
+    increment per request.
+    """
+
+    policy = "weighted-round-robin"
+
+    schedule = ()
+    next = 0
+
+    def _rebuild(self):
+        self.schedule = self._schedule(self.active)
+        self.next = 0
+
+    @staticmethod
+    def _schedule(members):
+        if not members:
+            return []
+        divisor = 0
+        for member in members:
+            divisor = math.gcd(divisor, member.weight)
+        weights = [member.weight // divisor for member in members]
+        total = sum(weights)
+        current = [0] * len(members)
+        schedule = []
+        for _ in range(total):
+            best = 0
+            for i, weight in enumerate(weights):
+                current[i] += weight
+                if current[i] > current[best]:
+                    best = i
+            current[best] -= total
+            schedule.append(members[best])
+        return schedule
+
+    def _choose(self):
+        index = self.next
+        self.next = (index + 1) % len(self.schedule)
+        return self.schedule[index]
+
+
+class LeastOutstanding(Balancer):
+    """The backend with the fewest requests in flight; ties go to the one
+    that has waited longest at that count.
+
+    The members are kept in buckets by in-flight count, each an insertion
+    ordered dict, with the lowest non-empty count tracked: starting or
+    finishing a request moves one member to the neighbouring bucket, so
+    choosing never scans the backends. A member that is down is left out
+    of the buckets.
+    """
+
+    policy = "least-outstanding"
+
+    def _rebuild(self):
+        self.buckets = {}
+        for member in self.active:
+            self.buckets.setdefault(member.outstanding, {})[member] = None
+        self.lowest = min(self.buckets, default=0)
+
+    def _move(self, member, count):
+        bucket = self.buckets[member.outstanding]
+        del bucket[member]
+        if not bucket:
+            del self.buckets[member.outstanding]
+        self.buckets.setdefault(count, {})[member] = None
+        member.outstanding = count
+
+    def _choose(self):
+        return next(iter(self.buckets[self.lowest]))
+
+    def _started(self, member):
+        self._move(member, member.outstanding + 1)
+        if self.lowest not in self.buckets:
+            self.lowest += 1
+
+    def _finished(self, member):
+        if not member.healthy:
+            member.outstanding -= 1
+            return
+        self._move(member, member.outstanding - 1)
+        if member.outstanding < self.lowest:
+            self.lowest = member.outstanding
+
+
+class PowerOfTwo(Balancer):
+    """The less loaded of two distinct backends drawn at random (the first
+    drawn on a tie): no shared ordering to maintain, and a backend that is
+    slow to answer quickly stops being chosen."""
+
+    policy = "power-of-two"
+
+    def _choose(self):
+        members = self.active
+        count = len(members)
+        if count == 1:
+            return members[0]
+        first = random.randrange(count)
+        second = random.randrange(count - 1)
+        if second >= first:
+            second += 1
+        a, b = members[first], members[second]
+        return b if b.outstanding < a.outstanding else a
+
+
+#: ``dist_policy`` names and their balancers.
+POLICIES = {
+    "round-robin": RoundRobin,
+    "weighted-round-robin": WeightedRoundRobin,
+    "least-outstanding": LeastOutstanding,
+    "power-of-two": PowerOfTwo,
+}
+
+#: Other spellings accepted in ``dist_policy``.
+ALIASES = {
+    "rr": "round-robin",
+    "weighted": "weighted-round-robin",
+    "wrr": "weighted-round-robin",
+    "least-conn": "least-outstanding",
+    "least-connections": "least-outstanding",
+    "p2c": "power-of-two",
+    "power-of-two-choices": "power-of-two",
+}
+
+
+def create_balancer(proxy_map, policy=None):
+    """
+    Builds the balancer of one virtual host.
+
+    :param proxy_map (str or list): the host's backends, see :func:`parse_members`.
+    :param policy (str): ``dist_policy`` name, case and ``_``/``-`` insensitive.
+
+    :rtype Balancer: the policy's balancer over the host's backends.
+
+    :raises ValueError: unknown policy, or invalid backend entry.
+    """
+    name = (policy or DEFAULT_POLICY).strip().lower().replace("_", "-")
+    name = ALIASES.get(name, name)
+    try:
+        cls = POLICIES[name]
+    except KeyError:
+        raise ValueError("unknown dist_policy {!r}, expected one of {}".format(
+            policy, ", ".join(POLICIES)))
+    return cls(parse_members(proxy_map))
+
+
+class BalancerRegistry:
+    """The balancer of every virtual host, keyed by host name."""
+
+    def __init__(self):
+        self.balancers = {}
+        self.lock = threading.Lock()
+
+    def configure(self, routes):
+        """
+        Builds the balancers of all ``routes`` up front, replacing any
+        built before, so a bad policy or address fails at startup. Hosts
+        without any ``proxy_pass`` get no balancer.
+
+        :param routes (dict): host name to ``(proxy_map, dist_policy)``.
+        """
+        balancers = {host: create_balancer(proxy_map, policy)
+                     for host, (proxy_map, policy) in routes.items() if proxy_map}
+        with self.lock:
+            self.balancers = balancers
+
+    def lookup(self, hostname, routes):
+        """
+        Returns the balancer of ``hostname``, built from its ``routes`` entry
+        on first use if :meth:`configure` did not.
+
+        :rtype Balancer: the host's balancer, None if ``routes`` has no
+                         backend for it.
+        """
+        balancer = self.balancers.get(hostname)
+        if balancer is not None or hostname not in routes:
+            return balancer
+        proxy_map, policy = routes[hostname]
+        if not proxy_map:
+            return None
+        with self.lock:
+            balancer = self.balancers.get(hostname)
+            if balancer is None:
+                balancer = create_balancer(proxy_map, policy)
+                self.balancers[hostname] = balancer
+            return balancer
+
+    def stats(self):
+        """
+        Returns the counters of every host's balancer.
+
+        :rtype dict: host name to :meth:`Balancer.stats`.
+        """
+        return {host: balancer.stats() for host, balancer in list(self.balancers.items())}
+
+
+#: Balancers shared by every proxy thread.
+balancers = BalancerRegistry()
@@ -0,0 +1,187 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.bufferpool
+~~~~~~~~~~~~~~~~~
+
+This module provides the pool of receive buffers shared by the connections
+of a process. Sockets are read with ``recv_into`` straight into a pooled
+``bytearray`` instead of allocating a fresh ``bytes`` object per ``recv``;
+a buffer goes back to the pool when the request it holds has been answered
+or its connection is closed, and is handed to the next connection as is.
+
+Buffers come in :data:`SIZE_CLASSES`: a small one that holds the head of a
+request without a body, and a large one for requests carrying a body. A
+request of a size above the largest class gets a plain ``bytearray`` of its
+own, which is not pooled, up to :attr:`BufferPool.max_size`. A pooled
+buffer keeps its length for its whole life: its users move bytes inside it
+but never resize it.
+
+The pool counts the buffers in use per class and their high-water mark,
+reported by ``GET /buffer-status``.
+
+Usage::
+
+  >>> buf = buffers.acquire(1024)
+  >>> len(buf)
+  16384
+  >>> n = conn.recv_into(buf)
+  >>> buffers.release(buf)
+"""
+
+import threading
+
+#: Length of the pooled buffers: request heads, then requests with a body.
+SIZE_CLASSES = (16 * 1024, 256 * 1024)
+
+#: Idle buffers kept per size class; more are left to the garbage collector.
+DEFAULT_MAX_FREE = 64
+
+#: Largest buffer handed out, pooled or not (bytes).
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class BufferPool:
+    """Free lists of preallocated ``bytearray`` buffers, one per size class.
+
+    Thread-safe: the threaded engine's workers and the asyncio engine's
+    loop and executor threads share one pool.
+
+    :attrs classes (tuple): buffer lengths, ascending.
+    :attrs max_free (int): idle buffers kept per class.
+    :attrs max_size (int): largest buffer handed out.
+    """
+
+    def __init__(self, classes=SIZE_CLASSES, max_free=DEFAULT_MAX_FREE,
+                 max_size=DEFAULT_MAX_SIZE):
+        self.classes = tuple(sorted(classes))
+        self.max_free = max_free
+        self.max_size = max_size
+        self.free = {size: [] for size in self.classes}
+        self.in_use = dict.fromkeys(self.classes, 0)
+        self.high_water = dict.fromkeys(self.classes, 0)
+        self.allocated = dict.fromkeys(self.classes, 0)
+        self.reused = dict.fromkeys(self.classes, 0)
+        self.oversize = 0
+        self.lock = threading.Lock()
+
+    def configure(self, max_size=None):
+        """
+        Changes the settings of the pool; None keeps a setting as is.
+
+        :param max_size (int): largest buffer handed out.
+        """
+        if max_size is not None:
+            self.max_size = max_size
+
+    def size_class(self, size):
+        """Returns the smallest class holding ``size`` bytes, None above the largest."""
+        for cls in self.classes:
+            if size <= cls:
+                return cls
+        return None
+
+    def acquire(self, size):
+        """
+        Takes a buffer of at least ``size`` bytes.
+
+        :param size (int): bytes the caller needs.
+
+        :rtype bytearray: a pooled buffer of the matching class (its old
+                          content is not cleared), or an unpooled one of
+                          exactly ``size`` bytes above the largest class.
+
+        :raises MemoryError: If ``size`` is above :attr:`max_size`.
+        """
+        cls = self.size_class(size)
+        if cls is None:
+            if size > self.max_size:
+                raise MemoryError("buffer of {} bytes requested, limit is {}".format(
+                    size, self.max_size))
+            with self.lock:
+                self.oversize += 1
+            return bytearray(size)
+        with self.lock:
+            free = self.free[cls]
+            buf = free.pop() if free else None
+            if buf is None:
+                self.allocated[cls] += 1
+            else:
+                self.reused[cls] += 1
+            in_use = self.in_use[cls] + 1
+            self.in_use[cls] = in_use
+            if in_use > self.high_water[cls]:
+                self.high_water[cls] = in_use
+        if buf is None:
+            buf = bytearray(cls)
+        return buf
+
+    def release(self, buf, reuse=True):
+        """
+        Gives a buffer back. A buffer that is not of a class size (unpooled,
+        or the empty placeholder of an idle parser) is ignored.
+
+        :param buf (bytearray): buffer taken with :meth:`acquire`.
+        :param reuse (bool): False if something may still read the buffer:
+                             it is then only accounted for, not recycled.
+        """
+        cls = len(buf)
+        if cls not in self.in_use:
+            return
+        with self.lock:
+            if self.in_use[cls]:
+                self.in_use[cls] -= 1
+            free = self.free[cls]
+            if reuse and len(free) < self.max_free:
+                free.append(buf)
+
+    def release_view(self, view):
+        """
+        Releases a ``memoryview`` handed out over a pooled buffer, then the
+        buffer itself. A view still exported elsewhere cannot be released;
+        its buffer is then left to its remaining users.
+
+        :param view (memoryview): view of a buffer from :meth:`acquire`.
+        """
+        buf = view.obj
+        try:
+            view.release()
+        except BufferError:
+            self.release(buf, reuse=False)
+            return
+        self.release(buf)
+
+    def stats(self):
+        """
+        Returns the pool counters for ``/buffer-status``.
+
+        :rtype dict: per size class: buffers in use, their high-water mark,
+                     idle, allocated and reused; plus the unpooled count.
+        """
+        with self.lock:
+            classes = {
+                str(cls): {
+                    "in_use": self.in_use[cls],
+                    "high_water": self.high_water[cls],
+                    "free": len(self.free[cls]),
+                    "allocated": self.allocated[cls],
+                    "reused": self.reused[cls],
+                }
+                for cls in self.classes
+            }
+            return {"classes": classes, "max_free": self.max_free,
+                    "max_size": self.max_size, "oversize": self.oversize}
+
+
+#: Receive buffers shared by every connection of the process.
+buffers = BufferPool()
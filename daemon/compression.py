@@ -0,0 +1,213 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.compression
+~~~~~~~~~~~~~~~~~
+
+This module provides the ``gzip`` / ``deflate`` content codings of the
+backend. :func:`negotiate` picks the coding from the request's
+``Accept-Encoding``; :class:`Encoder` compresses the responses of the
+handlers on the fly, whole bodies as well as streamed ones. Static files
+are not compressed here: :meth:`FileCache.encoded
+<daemon.filecache.FileCache.encoded>` builds their compressed variants once
+per file version and keeps them next to the identity content.
+
+Only textual types (:data:`COMPRESSIBLE_TYPES`) are compressed, and only
+above :attr:`Encoder.min_size` bytes. Every response of a compressible type
+carries ``Vary: Accept-Encoding``, whichever coding was chosen.
+
+All backend threads share the module-level :data:`encoder`.
+
+Usage::
+
+  >>> negotiate("deflate;q=0.5, gzip")
+  'gzip'
+  >>> headers, body = encoder.encode(req.headers, "200 OK",
+  ...                                {"Content-Type": "application/json"}, body)
+"""
+
+import zlib
+
+#: Content types worth compressing (prefixes of the ``Content-Type`` value).
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+#: ``wbits`` of :func:`zlib.compressobj` for each supported coding, in
+#: order of preference.
+CODINGS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+
+#: Smallest body compressed; below it the coding costs more than it saves.
+DEFAULT_MIN_SIZE = 1024
+
+#: zlib level of the responses compressed on the fly.
+DEFAULT_LEVEL = 6
+
+#: zlib level of the static variants, built once per file version.
+STATIC_LEVEL = 9
+
+#: Statuses whose bodies are never re-encoded.
+_SKIP_STATUS = ("204", "206", "304")
+
+
+def is_compressible(content_type):
+    """True if a body of ``content_type`` is worth compressing."""
+    content_type = (content_type or "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encoding):
+    """
+    Picks the content coding of a response (RFC 9110, section 12.5.3).
+
+    :param accept_encoding (str): ``Accept-Encoding`` request header, or None.
+
+    :rtype str: ``"gzip"`` or ``"deflate"``, None for the identity coding.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if coding == "x-gzip":
+            coding = "gzip"
+        weight = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in CODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(data, coding, level=DEFAULT_LEVEL):
+    """Compresses a whole body with ``coding``."""
+    co = zlib.compressobj(level, zlib.DEFLATED, CODINGS[coding])
+    return co.compress(data) + co.flush()
+
+
+def compress_stream(pieces, coding, level=DEFAULT_LEVEL):
+    """
+    Compresses a streamed body piece by piece. Every piece is flushed
+    (``Z_SYNC_FLUSH``) so the client gets it as soon as it is produced.
+
+    :param pieces (iterable): ``str`` or ``bytes`` pieces of the body.
+
+    :rtype generator: the compressed pieces.
+    """
+    co = zlib.compressobj(level, zlib.DEFLATED, CODINGS[coding])
+    try:
+        for piece in pieces:
+            if isinstance(piece, str):
+                piece = piece.encode("utf-8")
+            if piece:
+                yield co.compress(piece) + co.flush(zlib.Z_SYNC_FLUSH)
+        yield co.flush()
+    finally:
+        close = getattr(pieces, "close", None)
+        if close is not None:
+            close()
+
+
+class Encoder:
+    """On-the-fly compression of handler responses.
+
+    :attrs min_size (int): smallest body compressed, in bytes.
+    :attrs level (int): zlib level, 0 disables compression altogether
+                        (static variants included).
+    """
+
+    def __init__(self, min_size=DEFAULT_MIN_SIZE, level=DEFAULT_LEVEL):
+        self.min_size = min_size
+        self.level = level
+
+    def configure(self, min_size=None, level=None):
+        if min_size is not None:
+            self.min_size = min_size
+        if level is not None:
+            self.level = level
+
+    def encode(self, request_headers, status, headers, body):
+        """
+        Compresses a response if its type is compressible and the client
+        accepts a coding. A response already carrying ``Content-Encoding``
+        or ``Vary`` was negotiated by its handler and is left alone, as are
+        file bodies (``sendfile``) and bodies under :attr:`min_size`. A
+        streamed body is compressed as it is produced; its
+        ``Content-Length`` is dropped.
+
+        :param request_headers (dict): request headers, lower-case names.
+        :param status (str): response status line.
+        :param headers (dict): response headers, changed in place.
+        :param body (str, bytes or iterable): response body.
+
+        :rtype tuple: ``(headers, body)``.
+        """
+        if self.level <= 0 or status[:3] in _SKIP_STATUS:
+            return headers, body
+        if not isinstance(body, (str, bytes, bytearray, memoryview)) and not hasattr(body, "__next__"):
+            return headers, body
+        content_type = None
+        length_key = None
+        for key, value in headers.items():
+            name = key.lower()
+            if name in ("content-encoding", "vary"):
+                return headers, body
+            if name == "content-type":
+                content_type = value
+            elif name == "content-length":
+                length_key = key
+        if not is_compressible(content_type):
+            return headers, body
+
+        headers["Vary"] = "Accept-Encoding"
+        coding = negotiate(request_headers.get("accept-encoding"))
+        if coding is None:
+            return headers, body
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if hasattr(body, "__next__"):
+            body = compress_stream(body, coding, self.level)
+        else:
+            if len(body) < self.min_size:
+                return headers, body
+            data = compress(body, coding, self.level)
+            if len(data) >= len(body):
+                return headers, body
+            body = data
+
+        if length_key is not None:
+            del headers[length_key]
+        headers["Content-Encoding"] = coding
+        return headers, body
+
+
+#: Encoder shared by every connection.
+encoder = Encoder()
@@ -0,0 +1,489 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.endpoints
+~~~~~~~~~~~~~~~~~
+
+This module provides the built-in endpoints of the backend (login pages,
+the peer tracker and the chat relay). Every endpoint is a plain function
+taking the prepared :class:`Request <Request>` and returning a
+``(status, headers, body)`` tuple, the same convention as
+:mod:`daemon.handler_login`. They are registered in :data:`BUILTIN_ROUTES`,
+keyed by ``(method, path)`` like the WeApRous routes they are merged with.
+"""
+
+import json
+import os
+import socket
+import urllib.parse
+
+from .response import Response, FileBody, MultipartBody, SENDFILE_MIN_SIZE, parse_range
+from .filecache import static_cache
+from .compression import negotiate
+from .manifest import assets
+from .bufferpool import buffers
+from .session_store import get_user_from_session
+
+_global_list = []
+peer_list = {}
+
+#: ``/get-list`` answers with more entries than this are streamed.
+LIST_STREAM_MIN = 256
+
+#: Body of every ``500`` answer; the error itself only goes to the log.
+SERVER_ERROR_BODY = "<h1>500 Internal Server Error</h1>"
+
+#: Directory the static fallback serves in full.
+STATIC_DIR = "static/"
+
+#: Directory of the HTML pages; the fallback only serves :data:`PUBLIC_PAGES`
+#: from it, the others go through their routes (``index.html`` needs login).
+PAGES_DIR = "www/"
+
+#: Pages of :data:`PAGES_DIR` served without a route.
+PUBLIC_PAGES = frozenset(("/login.html", "/submit-info.html"))
+
+#: Accounts used when ``www/users.json`` is missing or unreadable.
+DEFAULT_USERS = {
+    "admin": "password",
+    "client1": "123",
+    "client2": "123"
+}
+
+
+def _server_error(e):
+    """Logs ``e`` and answers ``500``; the client gets no detail of the error."""
+    print(f"[HttpAdapter] internal error: {e}")
+    return "500 Internal Server Error", {"Content-Type": "text/html"}, SERVER_ERROR_BODY
+
+
+def _public(path, base_dir):
+    """True if the static fallback may serve ``path`` from ``base_dir``;
+    ``apps/`` and the rest of ``www/`` are never served."""
+    if base_dir == STATIC_DIR:
+        return True
+    return base_dir == PAGES_DIR and path in PUBLIC_PAGES
+
+
+def _not_modified(req, entry):
+    """The bodyless ``304`` answer to a GET whose validators match ``entry``, else None."""
+    if req is not None and req.method == "GET" and entry.not_modified(req.headers):
+        return "304 Not Modified", dict(entry.validators), b""
+    return None
+
+
+def _partial(value, entry, filepath, headers):
+    """
+    Answers a ``Range`` request for the file of ``entry``: ``206`` with one
+    range or a ``multipart/byteranges`` body, ``416`` if no range is
+    satisfiable, None if the header is to be ignored. Ranges of a file kept
+    in the cache are sliced from memory, the others go out with sendfile.
+    """
+    ranges = parse_range(value, entry.size)
+    if ranges is None:
+        return None
+    headers.pop("Content-Length", None)
+    if not ranges:
+        hdrs = {"Content-Type": "text/html", "Content-Range": "bytes */{}".format(entry.size)}
+        return "416 Range Not Satisfiable", hdrs, "<h1>416 Range Not Satisfiable</h1>"
+
+    def data(first, count):
+        if entry.content is not None:
+            return entry.content[first:first + count]
+        return FileBody(filepath, first, count)
+
+    if len(ranges) == 1:
+        first, last = ranges[0]
+        headers["Content-Range"] = "bytes {}-{}/{}".format(first, last, entry.size)
+        return "206 Partial Content", headers, data(first, last - first + 1)
+    body = MultipartBody(ranges, entry.size, headers["Content-Type"], data)
+    headers["Content-Type"] = body.content_type
+    return "206 Partial Content", headers, body
+
+
+def _negotiated(req, entry):
+    """The variant of ``entry`` in the coding the request accepts best."""
+    if req is None or entry.content is None:
+        return entry
+    return static_cache.encoded(entry, negotiate(req.headers.get("accept-encoding")))
+
+
+def _page(name, headers=None, req=None):
+    """
+    Serves ``www/<name>``. With ``req`` the page is compressed as the client
+    accepts and a conditional GET may get a ``304``.
+    """
+    try:
+        entry = _negotiated(req, static_cache.get(os.path.join("www", name), "text/html"))
+        cached = _not_modified(req, entry)
+        if cached is not None:
+            return cached
+        body = entry.content
+        if body is None:
+            with open(os.path.join("www", name), "rb") as fh:
+                body = fh.read()
+    except Exception as e:
+        return _server_error(e)
+    hdrs = dict(entry.headers)
+    if headers:
+        hdrs.update(headers)
+    return "200 OK", hdrs, body
+
+
+def cache_status(req):
+    """GET /cache-status: counters of the static file cache."""
+    return "200 OK", {"Content-Type": "application/json"}, json.dumps(static_cache.stats())
+
+
+def buffer_status(req):
+    """GET /buffer-status: receive buffers in use, high-water marks and reuse."""
+    return "200 OK", {"Content-Type": "application/json"}, json.dumps(buffers.stats())
+
+
+def manifest_status(req):
+    """GET /manifest-status: summary of the asset manifest."""
+    return "200 OK", {"Content-Type": "application/json"}, json.dumps(assets.stats())
+
+
+def login_page(req):
+    """GET /login: the login form."""
+    return _page("login.html", req=req)
+
+
+def login(req):
+    """POST /login: checks the form credentials against ``www/users.json``."""
+    body = req.text()
+    print(f"[HttpAdapter] POST /login received: content_len={len(req.body)} body_len={len(body)}")
+    form = urllib.parse.parse_qs(body)
+    username = form.get("username", [""])[0]
+    password = form.get("password", [""])[0]
+
+    if username and password:
+        print(f"[HttpAdapter] POST /login parsed username={username}")
+    else:
+        print(f"[HttpAdapter] POST /login parsed empty credentials")
+    users_file = os.path.join("www", "users.json")
+    try:
+        if os.path.exists(users_file):
+            with open(users_file, "r", encoding="utf-8") as f:
+                users = json.load(f)
+        else:
+            print("[HttpAdapter] users.json not found, using default users.")
+            users = dict(DEFAULT_USERS)
+    except Exception as e:
+        print(f"[HttpAdapter] Error reading users.json: {e}")
+        users = dict(DEFAULT_USERS)
+
+    if username in users and users[username] == password:
+        return _page("index.html", {"Set-Cookie": "auth=true; Path=/; HttpOnly"}, req)
+    body = "<h1>401 Unauthorized</h1><p>Invalid credentials.</p>"
+    return "401 Unauthorized", {"Content-Type": "text/html"}, body
+
+
+def pool_status(req):
+    """GET /pool-status: occupancy of the connection engine."""
+    from . import backend
+    return "200 OK", {"Content-Type": "application/json"}, json.dumps(backend.pool_stats())
+
+
+def protected(req):
+    """GET /protected."""
+    body = "<h1>Protected Resource</h1><p>You are logged in!</p>"
+    return "200 OK", {"Content-Type": "text/html"}, body
+
+
+def index(req):
+    """GET /, /index, /index.html: the chat page, only with the ``auth`` cookie."""
+    auth_val = req.cookies.get("auth", "")
+    if isinstance(auth_val, str):
+        auth_val = auth_val.lower()
+
+    if auth_val == "true":
+        return _page("index.html", req=req)
+    body = "<h1>401 Unauthorized</h1><p>Login required. <a href=\"/login\">Login</a></p>"
+    return "401 Unauthorized", {"Content-Type": "text/html"}, body
+
+
+def submit_info_page(req):
+    """GET /submit-info: the registration form."""
+    return _page("submit-info.html", req=req)
+
+
+def submit_info(req):
+    """POST /submit-info: registers a new account in ``www/users.json``."""
+    body = req.text()
+    print(f"[HttpAdapter] POST /submit-info received: content_len={len(req.body)} body_len={len(body)}")
+
+    # Parse dữ liệu form
+    form = urllib.parse.parse_qs(body)
+    username = form.get("username", [""])[0]
+    password = form.get("password", [""])[0]
+
+    if not username or not password:
+        body = "<h1>400 Bad Request</h1><p>Missing username or password.</p>"
+        return "400 Bad Request", {"Content-Type": "text/html"}, body
+
+    print(f"[HttpAdapter] Register attempt via /submit-info: {username}")
+
+    # Đọc danh sách người dùng từ file
+    users_file = os.path.join("www", "users.json")
+    users = {}
+    try:
+        if os.path.exists(users_file):
+            with open(users_file, "r", encoding="utf-8") as f:
+                users = json.load(f)
+    except Exception as e:
+        print(f"[HttpAdapter] Warning: cannot read users.json: {e}")
+        users = {}
+
+    # Kiểm tra trùng tên
+    if username in users:
+        body = f"<h1>409 Conflict</h1><p>Username '{username}' already exists.</p>"
+        return "409 Conflict", {"Content-Type": "text/html"}, body
+
+    # Lưu tài khoản mới
+    users[username] = password
+    try:
+        with open(users_file, "w", encoding="utf-8") as f:
+            json.dump(users, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        return _server_error(f"Cannot save user: {e}")
+
+    # Gửi phản hồi thành công
+    return _page("index.html", {"Set-Cookie": "auth=true; Path=/; HttpOnly"}, req)
+
+
+def add_list(req):
+    """POST /add-list: registers a peer (user, item, host, port) with the tracker."""
+    try:
+        data = json.loads(req.text())
+        item = data.get("item")
+        if not item:
+            raise ValueError("Missing 'item'")
+    except Exception as e:
+        return "400 Bad Request", {"Content-Type": "text/plain"}, str(e)
+
+    # --- add item vào danh sách ---
+    _global_list.append({
+        "user": data.get("user"),      # tên user
+        "item": item,          # item thêm
+        "host": data.get("host", "127.0.0.1"),   # host client
+        "port": data.get("port")                 # port client
+    })
+    resp = {"message": "Item added", "item": item}
+    return "200 OK", {"Content-Type": "application/json"}, json.dumps(resp)
+
+
+def get_list(req):
+    """GET /get-list: the peers known to the tracker."""
+    sessionid = req.cookies.get("sessionid")
+    user = get_user_from_session(sessionid) if sessionid else None
+
+    # if not user:
+    #     body_html = '<h1>401 Unauthorized</h1><p>Login required. <a href="/login">Login</a></p>'
+    #     return "401 Unauthorized", {"Content-Type": "text/html; charset=utf-8"}, body_html
+    # Lấy danh sách trực tiếp từ _global_list
+    entries = list(_global_list)
+    if len(entries) <= LIST_STREAM_MIN:
+        resp = {"count": len(entries), "list": entries}
+        return "200 OK", {"Content-Type": "application/json"}, json.dumps(resp)
+    return "200 OK", {"Content-Type": "application/json"}, _stream_list(entries)
+
+
+def _stream_list(entries, batch=LIST_STREAM_MIN):
+    """Encodes the /get-list answer a batch of entries at a time."""
+    yield '{"count": %d, "list": [' % len(entries)
+    for i in range(0, len(entries), batch):
+        part = ", ".join(json.dumps(entry) for entry in entries[i:i + batch])
+        yield part if i == 0 else ", " + part
+    yield "]}"
+
+
+def connect_peer(req):
+    """POST /connect-peer: looks a peer up and remembers it for /send-peer."""
+    try:
+        data = json.loads(req.text())
+        # Ví dụ: lấy "peer" từ JSON
+        peer_user = data.get("peer")
+        if not peer_user:
+            raise ValueError("Missing 'peer'")
+    except Exception as e:
+        return "400 Bad Request", {"Content-Type": "text/plain"}, str(e)
+
+    # --- xử lý connect peer ---
+    peer_info = next((entry for entry in _global_list
+                      if entry.get("user") == peer_user and "port" in entry), None)
+
+    if not peer_info:
+        resp = {"message": "Peer not online"}
+    else:
+        # Trả thông tin port và host để client connect
+        peer_name = peer_info["user"]
+        peer_host = peer_info.get("host", "127.0.0.1")
+        peer_port = peer_info["port"]
+        resp = {
+            "message": "Peer connected",
+            "peer_user": peer_name,
+            "host": peer_host,
+            "port": peer_port
+        }
+        peer_list[peer_name] = (peer_host, peer_port)
+
+    return "200 OK", {"Content-Type": "application/json"}, json.dumps(resp)
+
+
+def broadcast_peer(req):
+    """POST /broadcast-peer: relays a message to every connected peer."""
+    data = json.loads(str(req.body, "utf-8", errors="ignore"))
+    sender = data.get("from")
+    message = data.get("message")
+
+    if not sender or not message:
+        raise ValueError("Missing 'from' or 'message'")
+
+    success = 0
+    for peer_name, (ip, port) in list(peer_list.items()):
+        if peer_name == sender:
+            continue
+        try:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.connect((ip, port))
+            s.sendall(f"[Broadcast] {sender}: {message}".encode("utf-8"))
+            s.close()
+            success += 1
+        except Exception as e:
+            print(f"[Broadcast] Không gửi được tới {peer_name}: {e}")
+
+    body = f"<h1>Broadcast sent</h1><p>Message delivered to {success} peers.</p>"
+    return "200 OK", {"Content-Type": "text/html"}, body
+
+
+def send_peer(req):
+    """POST /send-peer: relays a private message to one peer."""
+    data = json.loads(str(req.body, "utf-8", errors="ignore"))
+    sender = data.get("from")
+    target = data.get("to")
+    message = data.get("message")
+
+    if not sender or not target or not message:
+        raise ValueError("Missing required fields")
+
+    if target not in peer_list:
+        return "404 Not Found", {"Content-Type": "text/plain"}, "Peer not found"
+
+    ip, port = peer_list[target]
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.connect((ip, port))
+        s.sendall(f"[Private] {sender}: {message}".encode("utf-8"))
+        s.close()
+    except Exception as e:
+        raise RuntimeError(f"Send failed: {e}")
+    body = f"<h1>Message sent</h1><p>{sender} to {target}</p>"
+    return "200 OK", {"Content-Type": "text/html"}, body
+
+
+def bad_request(req):
+    return "400 Bad Request", {"Content-Type": "text/html"}, "<h1>400 Bad Request</h1>"
+
+
+def not_found(req):
+    return "404 Not Found", {"Content-Type": "text/html"}, "<h1>404 Not Found</h1>"
+
+
+def method_not_allowed(req):
+    headers = {"Content-Type": "text/html", "Allow": req.allow}
+    return "405 Method Not Allowed", headers, "<h1>405 Method Not Allowed</h1>"
+
+
+def serve_static(req):
+    """
+    Fallback for a GET without a route: serves the file from the directory
+    :meth:`Response.prepare_content_type` picks for its MIME type. Small
+    files come from :data:`static_cache`, the others are sent with sendfile;
+    both carry the validators of the cache entry and a conditional GET
+    matching them gets a ``304``. A ``Range`` (with a matching ``If-Range``,
+    if any) gets a ``206``; without one, compressible cached files are sent
+    in the coding the client accepts.
+
+    Only ``static/`` and the :data:`PUBLIC_PAGES` of ``www/`` are served.
+    Files of the scanned directories are found in the asset manifest; a
+    path missing from it there is a ``404`` without any disk access.
+    """
+    path = req.path
+    asset = assets.lookup(path)
+    if asset is not None:
+        if not _public(path, asset.root):
+            return not_found(req)
+        filepath, content_type = asset.path, asset.content_type
+    else:
+        resp = Response()
+        try:
+            base_dir = resp.prepare_content_type(resp.get_mime_type(path))
+        except ValueError:
+            return not_found(req)
+        if not _public(path, base_dir) or assets.covers(base_dir):
+            return not_found(req)
+
+        # Refuse anything that resolves outside of the base directory.
+        root = os.path.abspath(base_dir)
+        filepath = os.path.abspath(os.path.join(root, path.lstrip('/')))
+        if not filepath.startswith(root + os.sep) or not os.path.isfile(filepath):
+            return not_found(req)
+        content_type = resp.headers["Content-Type"]
+
+    try:
+        entry = static_cache.get(filepath, content_type, max_content=SENDFILE_MIN_SIZE)
+    except OSError:
+        return not_found(req)
+    # Ranges are served from the identity content, never compressed.
+    value = req.headers.get("range") if req.method == "GET" else None
+    rep = entry if value is not None else _negotiated(req, entry)
+    cached = _not_modified(req, rep)
+    if cached is not None:
+        return cached
+
+    headers = dict(rep.headers)
+    headers["Accept-Ranges"] = "bytes"
+    if value is not None:
+        if_range = req.headers.get("if-range")
+        if if_range is None or entry.if_range(if_range):
+            partial = _partial(value, entry, filepath, headers)
+            if partial is not None:
+                return partial
+
+    if rep.content is not None:
+        return "200 OK", headers, rep.content
+    # Large: let the kernel copy it to the socket.
+    return "200 OK", headers, FileBody(filepath, 0, entry.size)
+
+
+#: Built-in endpoints, keyed like the WeApRous route table.
+BUILTIN_ROUTES = {
+    ("GET", "/login"): login_page,
+    ("POST", "/login"): login,
+    ("GET", "/pool-status"): pool_status,
+    ("GET", "/cache-status"): cache_status,
+    ("GET", "/buffer-status"): buffer_status,
+    ("GET", "/manifest-status"): manifest_status,
+    ("GET", "/protected"): protected,
+    ("GET", "/index.html"): index,
+    ("GET", "/index"): index,
+    ("GET", "/submit-info"): submit_info_page,
+    ("POST", "/submit-info"): submit_info,
+    ("POST", "/add-list"): add_list,
+    ("GET", "/get-list"): get_list,
+    ("POST", "/connect-peer"): connect_peer,
+    ("POST", "/broadcast-peer"): broadcast_peer,
+    ("POST", "/send-peer"): send_peer,
+}
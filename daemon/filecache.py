@@ -0,0 +1,421 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.filecache
+~~~~~~~~~~~~~~~~~
+
+This module provides the in-memory cache of the files served from ``www/``
+and ``static/``. Contents are kept with their prebuilt headers, keyed by
+resolved path, in least-recently-used order under a total byte budget. An
+entry is trusted for :attr:`FileCache.revalidate_interval` seconds; after
+that the next hit compares the file's mtime and size with the cached ones
+(one ``stat``) and reloads it if it changed.
+
+Every entry also carries the validators of its file version, a strong
+``ETag`` built from the mtime and size and the ``Last-Modified`` date, and
+the ``Cache-Control`` policy of the directory it lives in
+(:data:`DEFAULT_CACHE_CONTROL`). They are formatted once, when the version
+is loaded, and :meth:`CachedFile.not_modified` checks the conditional
+headers of a request against them. Files too large to keep in memory get an
+entry without content, so their validators are cached too.
+
+Compressible files also keep their ``gzip`` / ``deflate`` variants
+(:class:`EncodedFile`), built by :meth:`FileCache.encoded` the first time a
+client accepts that coding and charged to the same byte budget.
+
+All backend threads share the module-level :data:`static_cache`.
+
+Usage::
+
+  >>> entry = static_cache.get("www/login.html", "text/html")
+  >>> entry.content, entry.headers["ETag"]
+  (b'<!DOCTYPE html>...', '"1862a9c4e1f3b2a0-70d"')
+  >>> entry.not_modified({"if-none-match": entry.etag})
+  True
+  >>> static_cache.stats()["misses"]
+  1
+"""
+
+import email.utils
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .compression import encoder, compress, is_compressible, STATIC_LEVEL
+
+#: Total bytes of file content kept in memory.
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+#: Largest file whose content is kept; bigger files get an entry without it
+#: and are sent from disk.
+DEFAULT_MAX_ENTRY_BYTES = 256 * 1024
+
+#: Seconds an entry is served before its mtime and size are checked again.
+DEFAULT_REVALIDATE_INTERVAL = 2.0
+
+#: ``Cache-Control`` of the files under each directory. Static assets may be
+#: reused for a day; pages are stored but revalidated on every use.
+DEFAULT_CACHE_CONTROL = {
+    "static": "public, max-age=86400",
+    "www": "no-cache",
+}
+
+#: ``Cache-Control`` of files outside the configured directories.
+FALLBACK_CACHE_CONTROL = "no-cache"
+
+#: Budget charged for an entry kept without its content.
+METADATA_COST = 256
+
+
+def make_etag(st):
+    """Strong entity tag of a file version, from its ``os.stat`` result."""
+    return '"{:x}-{:x}"'.format(st.st_mtime_ns, st.st_size)
+
+
+def http_date(timestamp):
+    """Formats a POSIX timestamp as an HTTP date (RFC 9110, IMF-fixdate)."""
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+class _Representation:
+    """Validator checks shared by a cached file and its encoded variants."""
+
+    __slots__ = ()
+
+    def if_range(self, value):
+        """
+        Tells whether an ``If-Range`` value names this version, so that the
+        ``Range`` of the request applies. Entity tags are compared strongly,
+        dates must equal ``Last-Modified``.
+
+        :param value (str): ``If-Range`` header value.
+
+        :rtype bool: True to honor the ``Range``, False to send the whole file.
+        """
+        value = value.strip()
+        if value.startswith('"') or value.startswith("W/"):
+            return value == self.etag
+        return value == self.validators["Last-Modified"]
+
+    def not_modified(self, headers):
+        """
+        Evaluates the conditional headers of a GET against this version.
+        ``If-None-Match`` takes precedence over ``If-Modified-Since``, which
+        is ignored when it cannot be parsed.
+
+        :param headers (dict): request headers, lower-case names.
+
+        :rtype bool: True if the client's copy is current (answer ``304``).
+        """
+        inm = headers.get("if-none-match")
+        if inm is not None:
+            if inm.strip() == "*":
+                return True
+            for tag in inm.split(","):
+                tag = tag.strip()
+                if tag.startswith("W/"):
+                    tag = tag[2:]
+                if tag == self.etag:
+                    return True
+            return False
+        ims = headers.get("if-modified-since")
+        if ims:
+            try:
+                since = email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError, IndexError):
+                return False
+            return self.mtime // 1000000000 <= since
+        return False
+
+
+class CachedFile(_Representation):
+    """One file version held in the cache.
+
+    :attrs key (str): resolved path, the cache key.
+    :attrs content (bytes): file content, None if the file is too large to
+                            keep (send it from disk).
+    :attrs headers (dict): prebuilt response headers; copy before changing.
+    :attrs validators (dict): ``ETag``, ``Last-Modified`` and
+                              ``Cache-Control`` (plus ``Vary`` for a
+                              compressible type), the headers of a ``304``.
+    :attrs etag (str): strong entity tag, quotes included.
+    :attrs size (int): file size when loaded.
+    :attrs mtime (int): modification time (ns) when loaded.
+    :attrs cost (int): bytes charged against the cache budget.
+    :attrs checked (float): monotonic time of the last validation.
+    :attrs compressible (bool): True if encoded variants may be built.
+    :attrs variants (dict): coding -> :class:`EncodedFile`, or None when
+                            the coding does not make the file smaller.
+    """
+
+    __slots__ = ("key", "content", "headers", "validators", "etag", "size", "mtime",
+                 "cost", "checked", "compressible", "variants")
+
+    def __init__(self, key, content, content_type, cache_control, st, checked):
+        self.key = key
+        self.content = content
+        self.size = st.st_size
+        self.mtime = st.st_mtime_ns
+        self.etag = make_etag(st)
+        self.validators = {
+            "ETag": self.etag,
+            "Last-Modified": http_date(st.st_mtime),
+            "Cache-Control": cache_control,
+        }
+        self.compressible = content is not None and is_compressible(content_type)
+        if self.compressible:
+            self.validators["Vary"] = "Accept-Encoding"
+        self.headers = {"Content-Type": content_type}
+        if content is not None:
+            self.headers["Content-Length"] = str(len(content))
+        self.headers.update(self.validators)
+        self.cost = len(content) if content is not None else METADATA_COST
+        self.checked = checked
+        self.variants = {}
+
+
+class EncodedFile(_Representation):
+    """A compressed variant of a :class:`CachedFile`, with its own strong
+    ``ETag`` (the identity tag suffixed with the coding).
+
+    :attrs content (bytes): compressed content.
+    :attrs headers (dict): prebuilt response headers; copy before changing.
+    :attrs validators (dict): the headers of a ``304``.
+    :attrs etag (str): strong entity tag, quotes included.
+    :attrs mtime (int): modification time (ns) of the file version.
+    """
+
+    __slots__ = ("content", "headers", "validators", "etag", "mtime")
+
+    def __init__(self, entry, coding, content):
+        self.content = content
+        self.mtime = entry.mtime
+        self.etag = '{}-{}"'.format(entry.etag[:-1], coding)
+        self.validators = dict(entry.validators, ETag=self.etag)
+        self.headers = dict(entry.headers, ETag=self.etag)
+        self.headers["Content-Length"] = str(len(content))
+        self.headers["Content-Encoding"] = coding
+
+
+class FileCache:
+    """Byte-budgeted LRU cache of file contents, shared between threads.
+
+    :attrs max_bytes (int): total content budget, 0 disables caching.
+    :attrs max_entry_bytes (int): largest file whose content is kept.
+    :attrs revalidate_interval (float): seconds between two validations of an entry.
+    :attrs cache_control (dict): directory -> ``Cache-Control`` value.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES,
+                 max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES,
+                 revalidate_interval=DEFAULT_REVALIDATE_INTERVAL,
+                 cache_control=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.revalidate_interval = revalidate_interval
+        self.cache_control = dict(DEFAULT_CACHE_CONTROL if cache_control is None else cache_control)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self.encodings = 0
+
+    def configure(self, max_bytes=None, max_entry_bytes=None, revalidate_interval=None,
+                  cache_control=None):
+        """
+        Changes the limits; entries over the new budget are evicted.
+        ``cache_control`` entries are merged into the directory policies and
+        the cache is emptied so every file picks its new policy up.
+        """
+        with self.lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if max_entry_bytes is not None:
+                self.max_entry_bytes = max_entry_bytes
+            if revalidate_interval is not None:
+                self.revalidate_interval = revalidate_interval
+            if cache_control:
+                self.cache_control.update(cache_control)
+                self.entries.clear()
+                self.size = 0
+            self._evict(0)
+
+    def policy(self, key):
+        """
+        Returns the ``Cache-Control`` value for a resolved file path: the one
+        of the innermost configured directory containing it.
+
+        :param key (str): resolved file path.
+
+        :rtype str: the ``Cache-Control`` header value.
+        """
+        best, value = "", FALLBACK_CACHE_CONTROL
+        for directory, control in self.cache_control.items():
+            root = os.path.realpath(directory)
+            if key.startswith(root + os.sep) and len(root) > len(best):
+                best, value = root, control
+        return value
+
+    def get(self, path, content_type="application/octet-stream", max_content=None):
+        """
+        Returns the cached file at ``path``, loading or reloading it if needed.
+
+        :param path (str): file path, resolved before use as the key.
+        :param content_type (str): ``Content-Type`` of the prebuilt headers.
+        :param max_content (int): keep the content only below this size
+                                  (and :attr:`max_entry_bytes`).
+
+        :rtype CachedFile: the entry; its ``content`` is None if the file is
+                           too large to keep (serve it from disk).
+
+        :raises OSError: If the file does not exist or cannot be read.
+        """
+        key = os.path.realpath(path)
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now - entry.checked < self.revalidate_interval:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                self.revalidations += 1
+
+        try:
+            st = os.stat(key)
+        except OSError:
+            if entry is not None:
+                self._drop(key, entry)
+            raise
+
+        if entry is not None:
+            if st.st_mtime_ns == entry.mtime and st.st_size == entry.size:
+                with self.lock:
+                    entry.checked = now
+                    if key in self.entries:
+                        self.entries.move_to_end(key)
+                    self.hits += 1
+                return entry
+            with self.lock:
+                self.invalidations += 1
+            self._drop(key, entry)
+
+        with self.lock:
+            self.misses += 1
+        limit = self.max_entry_bytes
+        if max_content is not None:
+            limit = min(limit, max_content - 1)
+
+        if st.st_size > limit:
+            content = None
+        else:
+            with open(key, "rb") as fh:
+                # The validators must describe the bytes actually read.
+                st = os.fstat(fh.fileno())
+                content = fh.read()
+        entry = CachedFile(key, content, content_type, self.policy(key), st, now)
+        self._store(key, entry)
+        return entry
+
+    def encoded(self, entry, coding):
+        """
+        Returns the representation of ``entry`` to send with ``coding``,
+        compressing it on the first request for that coding. The variant is
+        kept in the entry, charged to the cache budget, and dropped with it
+        when the file changes.
+
+        :param entry (CachedFile): entry returned by :meth:`get`.
+        :param coding (str): ``"gzip"``, ``"deflate"`` or None.
+
+        :rtype CachedFile or EncodedFile: the variant, or ``entry`` itself
+            if it is not compressible, too small, or does not shrink.
+        """
+        if (coding is None or not entry.compressible or encoder.level <= 0
+                or entry.size < encoder.min_size):
+            return entry
+        try:
+            variant = entry.variants[coding]
+        except KeyError:
+            data = compress(entry.content, coding, STATIC_LEVEL)
+            variant = EncodedFile(entry, coding, data) if len(data) < entry.size else None
+            with self.lock:
+                self.encodings += 1
+                if coding not in entry.variants:
+                    entry.variants[coding] = variant
+                    if variant is not None and self.entries.get(entry.key) is entry:
+                        entry.cost += len(data)
+                        self.size += len(data)
+                        self._evict(0)
+        return entry if variant is None else variant
+
+    def _store(self, key, entry):
+        with self.lock:
+            if entry.cost > self.max_bytes:
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old.cost
+            self._evict(entry.cost)
+            self.entries[key] = entry
+            self.size += entry.cost
+
+    def _drop(self, key, entry):
+        with self.lock:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+                self.size -= entry.cost
+
+    def _evict(self, incoming):
+        """Drops least recently used entries until ``incoming`` bytes fit."""
+        while self.entries and self.size + incoming > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.size -= old.cost
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Returns the cache counters for ``/cache-status``.
+
+        :rtype dict: entries, bytes, budget and the hit, miss, eviction,
+                     revalidation and invalidation counters.
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "max_entry_bytes": self.max_entry_bytes,
+                "revalidate_interval": self.revalidate_interval,
+                "cache_control": dict(self.cache_control),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "revalidations": self.revalidations,
+                "invalidations": self.invalidations,
+                "encodings": self.encodings,
+            }
+
+
+#: Cache shared by the endpoints and :class:`Response <Response>`.
+static_cache = FileCache()
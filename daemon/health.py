@@ -0,0 +1,256 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.health
+~~~~~~~~~~~~~~~~~
+
+This module provides the active health checks of the proxy's backends. A
+host block of ``config/proxy.conf`` turns them on with ``health_check``::
+
+  host "app.local" {
+      proxy_pass http://127.0.0.1:9001;
+      proxy_pass http://127.0.0.1:9002;
+      health_check /login;
+      health_interval 5;
+      health_fails 2;
+      health_passes 2;
+  }
+
+Every backend of the host is then probed in a background thread: a ``GET``
+of the probe path, with the host's name in ``Host``, on a connection of
+its own, every ``health_interval`` seconds. The backend is up when it
+answers with a status below 500 within ``health_timeout`` seconds.
+``health_fails`` failed probes in a row mark it down, ``health_passes``
+good ones in a row mark it up again; the first probe decides at once, so
+a backend found dead at startup gets no request at all.
+
+A backend marked down is skipped by its host's balancer (see
+:meth:`Balancer.set_healthy <daemon.balancer.Balancer.set_healthy>`), so
+client requests do not wait for connections to it to fail. Hosts without
+``health_check`` keep all their backends.
+"""
+
+import socket
+import threading
+import time
+
+#: Seconds between two probes of a backend.
+DEFAULT_HEALTH_INTERVAL = 5.0
+
+#: Seconds a probe may take, connection included.
+DEFAULT_HEALTH_TIMEOUT = 2.0
+
+#: Failed probes in a row that mark a backend down.
+DEFAULT_HEALTH_FAILS = 2
+
+#: Good probes in a row that mark a backend up again.
+DEFAULT_HEALTH_PASSES = 2
+
+
+class HealthCheck:
+    """Probe settings of one virtual host.
+
+    :attrs path (str): path requested by the probes.
+    :attrs interval (float): seconds between two probes of a backend.
+    :attrs timeout (float): seconds a probe may take.
+    :attrs fails (int): failed probes in a row that mark a backend down.
+    :attrs passes (int): good probes in a row that mark it up again.
+    """
+
+    __slots__ = ("path", "interval", "timeout", "fails", "passes")
+
+    def __init__(self, path="/", interval=DEFAULT_HEALTH_INTERVAL,
+                 timeout=DEFAULT_HEALTH_TIMEOUT, fails=DEFAULT_HEALTH_FAILS,
+                 passes=DEFAULT_HEALTH_PASSES):
+        if not path.startswith("/"):
+            raise ValueError("health_check path {!r} must start with /".format(path))
+        if interval <= 0 or timeout <= 0:
+            raise ValueError("health_interval and health_timeout must be positive")
+        if fails < 1 or passes < 1:
+            raise ValueError("health_fails and health_passes must be 1 or more")
+        self.path = path
+        self.interval = interval
+        self.timeout = min(timeout, interval)
+        self.fails = fails
+        self.passes = passes
+
+
+def probe(host, port, hostname, path, timeout):
+    """
+    Sends one health probe to a backend.
+
+    :param host (str): backend address.
+    :param port (int): backend port.
+    :param hostname (str): virtual host name sent in ``Host``.
+    :param path (str): path requested.
+    :param timeout (float): seconds the probe may take.
+
+    :rtype int: status code of the answer.
+
+    :raises OSError: the backend cannot be reached, does not answer in time
+                     or answers something that is not HTTP.
+    """
+    request = ("GET {} HTTP/1.1\r\nHost: {}\r\nUser-Agent: WeApRous-health\r\n"
+               "Connection: close\r\n\r\n").format(path, hostname).encode("latin-1")
+    deadline = time.monotonic() + timeout
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(request)
+        data = b""
+        # The status line is all a probe needs.
+        while b"\r\n" not in data:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("probe timed out")
+            sock.settimeout(remaining)
+            chunk = sock.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+    parts = data.split(b"\r\n", 1)[0].split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith(b"HTTP/") or not parts[1].isdigit():
+        raise OSError("invalid status line: {!r}".format(data[:64]))
+    return int(parts[1])
+
+
+class MemberHealth:
+    """Probe state of one backend.
+
+    :attrs hostname (str): virtual host the backend serves.
+    :attrs member (Member): the backend probed.
+    :attrs check (HealthCheck): the host's probe settings.
+    :attrs failures (int): failed probes in a row.
+    :attrs successes (int): good probes in a row.
+    :attrs checks (int): probes sent.
+    :attrs last (str): status code or error of the last probe.
+    """
+
+    __slots__ = ("hostname", "member", "check", "failures", "successes", "checks", "last")
+
+    def __init__(self, hostname, member, check):
+        self.hostname = hostname
+        self.member = member
+        self.check = check
+        self.failures = 0
+        self.successes = 0
+        self.checks = 0
+        self.last = None
+
+    def record(self, up, last):
+        """
+        Counts a probe result and marks the member up or down when a
+        threshold is reached (or on the first probe).
+
+        :rtype bool: True if the member changed state.
+        """
+        first = self.checks == 0
+        self.checks += 1
+        self.last = last
+        if up:
+            self.successes += 1
+            self.failures = 0
+            if first or self.successes >= self.check.passes:
+                return self.member.balancer.set_healthy(self.member, True)
+        else:
+            self.failures += 1
+            self.successes = 0
+            if first or self.failures >= self.check.fails:
+                return self.member.balancer.set_healthy(self.member, False)
+        return False
+
+    def run_once(self):
+        """Probes the member and records the result."""
+        member, check = self.member, self.check
+        try:
+            status = probe(member.host, member.port, self.hostname, check.path, check.timeout)
+        except OSError as e:
+            up, last = False, "{}: {}".format(type(e).__name__, e)
+        else:
+            up, last = status < 500, str(status)
+        if self.record(up, last):
+            print("[Health] {} backend {} is {} ({})".format(
+                self.hostname, member.address, "up" if up else "down", last))
+
+
+class HealthChecker:
+    """Background probes of the backends of every host with a ``health_check``."""
+
+    def __init__(self):
+        self.targets = []
+        self.threads = []
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def start(self, balancers, checks):
+        """
+        Starts one probe thread per backend of the hosts in ``checks``,
+        after stopping the ones of a previous call.
+
+        :param balancers (BalancerRegistry): the hosts' balancers.
+        :param checks (dict): host name to :class:`HealthCheck`.
+        """
+        self.stop()
+        targets = []
+        for hostname, check in checks.items():
+            balancer = balancers.balancers.get(hostname)
+            if balancer is None:
+                continue
+            targets.extend(MemberHealth(hostname, member, check) for member in balancer.members)
+        stop_event = threading.Event()
+        threads = [threading.Thread(target=self._run, args=(target, stop_event),
+                                    name="health-" + target.member.address, daemon=True)
+                   for target in targets]
+        with self.lock:
+            self.targets = targets
+            self.threads = threads
+            self.stop_event = stop_event
+        for thread in threads:
+            thread.start()
+
+    def stop(self):
+        """Stops the probe threads."""
+        with self.lock:
+            self.stop_event.set()
+            threads, self.threads = self.threads, []
+        for thread in threads:
+            thread.join()
+
+    @staticmethod
+    def _run(target, stop_event):
+        while not stop_event.is_set():
+            target.run_once()
+            stop_event.wait(target.check.interval)
+
+    def stats(self):
+        """
+        Returns the probe state of every checked backend.
+
+        :rtype dict: host name to, per backend address, whether it is
+                     healthy, the probes sent, the failed / good probes in
+                     a row and the last result.
+        """
+        result = {}
+        with self.lock:
+            targets = list(self.targets)
+        for target in targets:
+            result.setdefault(target.hostname, {})[target.member.address] = {
+                "healthy": target.member.healthy,
+                "checks": target.checks,
+                "failures": target.failures,
+                "successes": target.successes,
+                "last": target.last,
+            }
+        return result
+
+
+#: Health checks of the proxy's backends.
+health_checker = HealthChecker()
@@ -20,12 +20,31 @@ raw URL paths and RESTful route definitions, and integrates with
 Request and Response objects to handle client-server communication.
 """
 
+from collections import deque
+
 from .request import Request
-from .response import Response
+from .response import Response, FileBody, MultipartBody, build_head
 from .dictionary import CaseInsensitiveDict
+from .httpparser import RequestParser, HttpParseError, BodyStream, MAX_BODY_SIZE
+from .router import compile_routes
+from .compression import encoder
+from .sockio import send_buffers
+from .endpoints import (serve_static, not_found, method_not_allowed, SERVER_ERROR_BODY,
+                        _global_list, peer_list)
+
+#: Seconds an idle keep-alive connection waits for its next request.
+KEEPALIVE_TIMEOUT = 5.0
+
+#: Requests served on one connection before the server closes it.
+MAX_KEEPALIVE_REQUESTS = 100
+
+#: Pipelined requests parsed ahead of the one being answered.
+MAX_PIPELINE_DEPTH = 16
+
+#: Status codes whose responses never carry a body.
+BODYLESS_STATUS = ("204", "304")
+
 
-_global_list = []
-peer_list = {}
 class HttpAdapter:
     """
     A mutable :class:`HTTP adapter <HTTP adapter>` for managing client connections
@@ -36,6 +55,18 @@ class HttpAdapter:
     It supports RESTful routing via hooks and integrates with :class:`Request <Request>` 
     and :class:`Response <Response>` objects for full request lifecycle management.
 
+    Connections are persistent (HTTP/1.1 keep-alive): several requests are
+    served on one socket until the client asks to close, stays idle for
+    :attr:`keepalive_timeout` seconds, or reaches :attr:`max_keepalive_requests`.
+    Requests are read with an incremental :class:`RequestParser
+    <RequestParser>`; pipelined requests are answered in order and at most
+    :attr:`max_pipeline_depth` of them are parsed ahead, the rest stays
+    unread in the socket until the queue drains.
+
+    The attributes live in ``__slots__``; the response, the parser and the
+    pipeline are only created when first used, and :meth:`reset` readies
+    the adapter for another connection.
+
     Attributes:
         ip (str): IP address of the client.
         port (int): Port number of the client.
@@ -44,636 +75,490 @@ class HttpAdapter:
         routes (dict): Mapping of route paths to handler functions.
         request (Request): Request object for parsing incoming data.
         response (Response): Response object for building and sending replies.
+        keep_alive (bool): whether the connection stays open after the current response.
+        served (int): number of requests served on the connection.
+        parser (RequestParser): incremental parser holding the receive buffer.
+        pipeline (deque): complete requests waiting for their response.
     """
 
-    __attrs__ = [
+    __slots__ = (
         "ip",
         "port",
         "conn",
         "connaddr",
         "routes",
         "request",
-        "response",
-    ]
+        "keep_alive",
+        "allow_keep_alive",
+        "served",
+        "closing",
+        "_response",
+        "_parser",
+        "_pipeline",
+    )
+
+    #: Idle timeout between two requests on one connection (seconds).
+    keepalive_timeout = KEEPALIVE_TIMEOUT
+    #: Maximum number of requests served on one connection.
+    max_keepalive_requests = MAX_KEEPALIVE_REQUESTS
+    #: Maximum number of pipelined requests waiting on one connection.
+    max_pipeline_depth = MAX_PIPELINE_DEPTH
+    #: Largest request body held in memory, larger ones get ``413``.
+    max_body_size = MAX_BODY_SIZE
 
     def __init__(self, ip, port, conn, connaddr, routes):
+        self.request = Request()
+        self._response = None
+        self.reset(ip, port, conn, connaddr, routes)
+
+    def reset(self, ip, port, conn, connaddr, routes, served=0):
+        """
+        Prepares the adapter for a new connection, so a worker thread can
+        serve connection after connection with one adapter and one
+        :class:`Request`. The parser and the pipeline of the previous
+        connection are dropped.
+
+        :param ip (str): IP address of the server.
+        :param port (int): Port number the server is listening on.
+        :param conn (socket.socket): Client connection socket.
+        :param connaddr (tuple): client address (IP, port).
+        :param routes (dict): Dictionary of route handlers.
+        :param served (int): requests already served on a connection taken
+                             back from the idle connections of the pool.
+        """
         self.ip = ip
         self.port = port
         self.conn = conn
         self.connaddr = connaddr
         self.routes = routes
-        self.request = Request()
-        self.response = Response()
+        self.keep_alive = False
+        self.allow_keep_alive = False
+        self.served = served
+        self.closing = False
+        self._parser = None
+        self._pipeline = None
+
+    @property
+    def response(self):
+        """The :class:`Response` of the connection, created on first use."""
+        if self._response is None:
+            self._response = Response()
+        return self._response
+
+    @property
+    def parser(self):
+        """The :class:`RequestParser` of a blocking socket, created on first
+        use (the asyncio engine parses with its own)."""
+        if self._parser is None:
+            routes = self.routes
+            self._parser = RequestParser(
+                stream_body=compile_routes(routes).streams if routes is not None else None,
+                max_body_size=self.max_body_size)
+        return self._parser
+
+    @property
+    def pipeline(self):
+        """Complete requests waiting for their response, created on first use."""
+        if self._pipeline is None:
+            self._pipeline = deque()
+        return self._pipeline
+
+    def handle_client(self, conn, addr, routes, park=None):
+        """
+        Serves requests from the client socket until the connection is no
+        longer kept alive, then closes it. Each request's receive buffer
+        goes back to the pool once it is answered.
+
+        With ``park`` (worker pool mode) a connection whose received
+        requests are all answered is handed to ``park`` instead of being
+        waited on here, so the worker is free until the next request comes.
+
+        :param conn (socket.socket): Client connection socket.
+        :param addr (tuple): client address (IP, port).
+        :param routes (dict): Dictionary of route handlers.
+        :param park (callable): ``park(ip, port, conn, addr, routes, served)``,
+                                which takes the idle connection over.
+        """
+        self.conn = conn
+        self.connaddr = addr
 
-    def handle_client(self, conn, addr, routes):
-        from . import backend
+        # A connection taken back from ``park`` has a request to read first.
+        answered = parked = False
+        try:
+            while True:
+                if not self.pipeline:
+                    if park is not None and answered and not self.parser.pending():
+                        park(self.ip, self.port, conn, addr, routes, self.served)
+                        parked = True
+                        break
+                    idle_timeout = self.keepalive_timeout if self.served else 2.0
+                    self.read_requests(conn, idle_timeout)
+                    if not self.pipeline:
+                        break
+                msg = self.pipeline.popleft()
+                if isinstance(msg, HttpParseError):
+                    self.reject(conn, msg)
+                    break
+                self.next_request()
+                if isinstance(msg.body, BodyStream):
+                    msg.body.fill = self.body_reader(conn)
+                try:
+                    self.dispatch(conn, msg, routes)
+                finally:
+                    msg.release()
+                answered = True
+                if not self.keep_alive:
+                    break
+        except OSError as e:
+            print("[HttpAdapter] connection error on {}: {}".format(addr, e))
+        finally:
+            if not parked:
+                conn.close()
+            self.release_buffers()
+
+    def release_buffers(self):
+        """Returns the receive buffers of the connection to the pool: the
+        parser's and those of the requests left unanswered."""
+        if self._pipeline:
+            for msg in self._pipeline:
+                if not isinstance(msg, HttpParseError):
+                    msg.release()
+            self._pipeline.clear()
+        if self._parser is not None:
+            self._parser.release()
+
+    def next_request(self):
+        """Accounts one more request on the connection before dispatching it."""
+        self.served += 1
+        self.allow_keep_alive = (not (self.closing and not self._pipeline)
+                                 and self.served < self.max_keepalive_requests)
+
+    def read_requests(self, conn, idle_timeout=2.0):
+        """
+        Reads from a blocking socket until at least one complete request is
+        parsed, then moves up to :attr:`max_pipeline_depth` complete
+        requests into :attr:`pipeline`. Bytes of a following, incomplete
+        request stay in the parser for the next call.
+
+        A malformed request, or a client that closes or stalls in the
+        middle of one, queues an :class:`HttpParseError` answered with
+        ``400`` before the connection is closed.
+
+        :param conn (socket.socket): Client connection socket.
+        :param idle_timeout (float): seconds to wait for the first byte.
+        """
         import socket
-        import os
         import time
-        import urllib.parse
-    
-        import json
-        from . import handler_login
-        from .session_store import get_user_from_session
 
-        self.conn = conn
-        self.connaddr = addr
-        req = self.request
-        resp = self.response
+        parser = self.parser
+        self.split_requests()
+        if self.pipeline:
+            return
+
+        if not parser.pending():
+            conn.settimeout(idle_timeout)
+            try:
+                nbytes = conn.recv_into(parser.writable())
+            except (socket.timeout, OSError):
+                return
+            if not nbytes:
+                return
+            parser.commit(nbytes)
+            self.split_requests()
+            if self.pipeline:
+                return
 
-        msg = b""
         conn.settimeout(0.5)
         deadline = time.time() + 2.0
-        raw_req = ""
-
-        handled = False
 
         while True:
             try:
-                chunk = conn.recv(4096)
-                if not chunk:
+                nbytes = conn.recv_into(parser.writable())
+                if not nbytes:
                     break
-                msg += chunk
+                parser.commit(nbytes)
+                deadline = max(deadline, time.time() + 2.0)
             except socket.timeout:
                 if time.time() > deadline:
                     break
                 continue
 
-            try:
-                raw_req = msg.decode(errors="ignore")
-            except Exception:
-                raw_req = ""
-
-            header_end = raw_req.find("\r\n\r\n")
-            if header_end == -1:
-                if time.time() > deadline:
-                    break
-                else:
-                    continue
-
-            headers_part = raw_req[:header_end]
-            content_len = 0
-            for line in headers_part.split("\r\n"):
-                if line.lower().startswith("content-length:"):
-                    try:
-                        content_len = int(line.split(":", 1)[1].strip())
-                    except Exception:
-                        content_len = 0
-                    break
-
-            body_bytes_len = len(msg) - (header_end + 4)
-            if content_len == 0 or body_bytes_len >= content_len:
-                break
+            self.split_requests()
+            if self.pipeline:
+                return
 
-            if time.time() > deadline:
-                break
-            deadline = max(deadline, time.time() + 2.0)
-            continue
+        # Client closed or stalled mid-request.
+        self.closing = True
+        self.pipeline.append(HttpParseError("incomplete request"))
 
-        try:
-            raw_req = msg.decode(errors="ignore")
-        except Exception:
-            raw_req = ""
+    def body_reader(self, conn):
+        """
+        Returns the ``fill`` callable of a :class:`BodyStream` reading from
+        a blocking socket, straight into the parser buffer.
 
-        try:
-            first_line = raw_req.splitlines()[0] if raw_req else ""
-        except Exception:
-            first_line = ""
+        :param conn (socket.socket): Client connection socket.
 
-        if first_line.startswith("POST /login"):
-            print(f"[HttpAdapter] recv bytes={len(msg)} header_end={raw_req.find('\\r\\n\\r\\n')}")
+        :rtype callable: ``fill() -> int``, 0 once the client has closed.
+        """
+        import socket
 
-        req.prepare(raw_req, routes)
+        parser = self.parser
 
-        if req.method == "GET" and req.path == "/login":
+        def fill():
+            conn.settimeout(2.0)
             try:
-                with open(os.path.join("www", "login.html"), "r", encoding="utf-8") as fh:
-                    body = fh.read()
-                headers = "HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n"
-                conn.sendall(headers.encode() + body.encode())
-            except Exception as e:
-                body = f"<h1>500 Internal Server Error</h1><p>{e}</p>"
-                conn.sendall(b"HTTP/1.1 500 Internal Server Error\r\n\r\n" + body.encode())
-            conn.close()
+                nbytes = conn.recv_into(parser.writable())
+            except socket.timeout:
+                raise HttpParseError("request body timed out")
+            parser.commit(nbytes)
+            return nbytes
+        return fill
+
+    def split_requests(self):
+        """Moves complete requests from the parser into :attr:`pipeline`."""
+        if self.closing:
             return
-
-        if req.method == "POST" and req.path == "/login":
+        while len(self.pipeline) < self.max_pipeline_depth:
             try:
-                header_end = raw_req.find("\r\n\r\n")
-                content_len = 0
-                if header_end != -1:
-                    headers_part = raw_req[:header_end]
-                    for line in headers_part.split("\r\n"):
-                        if line.lower().startswith("content-length:"):
-                            try:
-                                content_len = int(line.split(":", 1)[1].strip())
-                            except Exception:
-                                content_len = 0
-                            break
-
-                body = ""
-                if header_end != -1 and content_len > 0:
-                    start = header_end + 4
-                    body_bytes = msg[start:start + content_len]
-                    try:
-                        body = body_bytes.decode("utf-8")
-                    except Exception:
-                        body = body_bytes.decode("latin-1", errors="ignore")
+                msg = self.parser.next_request()
+            except HttpParseError as e:
+                self.closing = True
+                self.pipeline.append(e)
+                break
+            if msg is None:
+                break
+            self.pipeline.append(msg)
+
+    def reject(self, conn, error):
+        """
+        Answers a request that could not be parsed with the error's status
+        (``400``, or ``413`` for a body too large) and marks the connection
+        for closing.
+
+        :param conn (socket.socket): connection (or sink) the response is written to.
+        :param error (HttpParseError): the parse failure.
+        """
+        print("[HttpAdapter] bad request from {}: {}".format(self.connaddr, error))
+        self.keep_alive = False
+        self.send_response(conn, error.status, {"Content-Type": "text/plain"}, error.status)
+
+    def wants_keep_alive(self, req):
+        """
+        Applies the HTTP/1.0 and HTTP/1.1 ``Connection`` semantics.
+
+        :param req (Request): the parsed request.
+
+        :rtype bool: True if the client accepts a persistent connection.
+        """
+        tokens = [t.strip().lower()
+                  for t in (req.headers or {}).get("connection", "").split(",")]
+        if "close" in tokens:
+            return False
+        if req.version == "HTTP/1.0":
+            return "keep-alive" in tokens
+        return True
+
+    def send_response(self, conn, status, headers, body):
+        """
+        Writes one response with a ``Connection`` header matching
+        :attr:`keep_alive`. The header block comes from :func:`build_head
+        <daemon.response.build_head>`.
+
+        A ``str`` or ``bytes`` body is sent with its ``Content-Length``, in
+        one :func:`send_buffers <daemon.sockio.send_buffers>` call with the
+        header block and without copying the body. Any
+        other iterable is sent piece by piece as it is produced, each piece
+        waiting for the previous one to be accepted by the connection: with
+        the ``Content-Length`` given by the handler if there is one, else
+        with ``Transfer-Encoding: chunked``, or delimited by closing the
+        connection for an HTTP/1.0 client. A :class:`FileBody` goes out
+        with :meth:`send_file`, a :class:`MultipartBody` with
+        :meth:`send_parts`. ``204`` and ``304`` responses are sent
+        without body and without ``Content-Length``.
+
+        :param conn (socket.socket): connection (or sink) the response is written to.
+        :param status (str): status code and reason, e.g. ``"200 OK"``.
+        :param headers (dict): additional response headers.
+        :param body (str, bytes or iterable): response body.
+        """
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        bodyless = status[:3] in BODYLESS_STATUS
+        if bodyless:
+            body = b""
+        streaming = not isinstance(body, (bytes, bytearray, memoryview))
+
+        length = None
+        chunked = False
+        if bodyless:
+            pass
+        elif not streaming:
+            length = len(body)
+        elif isinstance(body, (FileBody, MultipartBody)):
+            length = body.count
+        else:
+            for key, value in headers.items():
+                if key.lower() == "content-length":
+                    length = int(value)
+            if length is None:
+                if self.request.version == "HTTP/1.1":
+                    chunked = True
                 else:
-                    body = ""
-            except Exception:
-                body = ""
+                    self.keep_alive = False
 
-            print(f"[HttpAdapter] POST /login received: content_len={content_len} body_len={len(body)}")
-            form = urllib.parse.parse_qs(body)
-            username = form.get("username", [""])[0]
-            password = form.get("password", [""])[0]
+        if self.keep_alive:
+            tail = b"Connection: keep-alive\r\nKeep-Alive: timeout=%d, max=%d\r\n" % (
+                self.keepalive_timeout, self.max_keepalive_requests - self.served)
+        else:
+            tail = b"Connection: close\r\n"
 
-            if username and password:
-                print(f"[HttpAdapter] POST /login parsed username={username}")
-            else:
-                print(f"[HttpAdapter] POST /login parsed empty credentials")
-            users_file = os.path.join("www", "users.json")
-            users = {}
-            try:
-                if os.path.exists(users_file):
-                    with open(users_file, "r", encoding="utf-8") as f:
-                        users = json.load(f)
-                else:
-                    print("[HttpAdapter] users.json not found, using default users.")
-                    users = {
-                        "admin": "password",
-                        "client1": "123",
-                        "client2": "123"
-                    }
-            except Exception as e:
-                print(f"[HttpAdapter] Error reading users.json: {e}")
-                users = {
-                    "admin": "password",
-                    "client1": "123",
-                    "client2": "123"
-                }
-            if username in users and users[username] == password:
-                try:
-                    with open(os.path.join("www", "index.html"), "r", encoding="utf-8") as fh:
-                        body = fh.read()
-                    headers = ("HTTP/1.1 200 OK\r\n"
-                               "Content-Type: text/html\r\n"
-                               "Set-Cookie: auth=true; Path=/; HttpOnly\r\n"
-                               "\r\n")
-                    conn.sendall(headers.encode() + body.encode())
-                except Exception as e:
-                    body = f"<h1>500 Internal Server Error</h1><p>{e}</p>"
-                    conn.sendall(b"HTTP/1.1 500 Internal Server Error\r\n\r\n" + body.encode())
-            else:
-                try:
-                    body = "<h1>401 Unauthorized</h1><p>Invalid credentials.</p>"
-                    headers = ("HTTP/1.1 401 Unauthorized\r\n"
-                               "Content-Type: text/html\r\n"
-                               "Content-Length: {}\r\n"
-                               "Connection: close\r\n"
-                               "\r\n").format(len(body))
-                    conn.sendall(headers.encode() + body.encode())
-                except Exception:
-                    conn.sendall(b"HTTP/1.1 401 Unauthorized\r\n\r\n<h1>401 Unauthorized</h1>")
-            conn.close()
-            return
-
-        if req.method == "GET" and req.path == "/protected":
-            conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n<h1>Protected Resource</h1><p>You are logged in!</p>")
-            conn.close()
+        head = build_head(status, headers, length, chunked, tail)
+        if not streaming:
+            send_buffers(conn, (head, body))
             return
 
-        if req.method == "GET" and req.path in ("/", "/index", "/index.html"):
-            auth_val = ""
-            try:
-                auth_val = req.cookies.get("auth", "")
-                if isinstance(auth_val, str):
-                    auth_val = auth_val.lower()
-            except Exception:
-                auth_val = ""
-
-            if auth_val == "true":
-                try:
-                    with open(os.path.join("www", "index.html"), "r", encoding="utf-8") as fh:
-                        body = fh.read()
-                    headers = "HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n"
-                    conn.sendall(headers.encode() + body.encode())
-                except Exception as e:
-                    body = f"<h1>500 Internal Server Error</h1><p>{e}</p>"
-                    conn.sendall(b"HTTP/1.1 500 Internal Server Error\r\n\r\n" + body.encode())
-                conn.close()
-                return
+        if isinstance(body, (FileBody, MultipartBody)) and hasattr(conn, "sendfile"):
+            conn.sendall(head)
+            if isinstance(body, FileBody):
+                self.send_file(conn, body)
             else:
-                body = "<h1>401 Unauthorized</h1><p>Login required. <a href=\"/login\">Login</a></p>"
-                headers = ("HTTP/1.1 401 Unauthorized\r\n"
-                           "Content-Type: text/html\r\n"
-                           "Content-Length: {}\r\n"
-                           "Connection: close\r\n"
-                           "\r\n").format(len(body))
-                conn.sendall(headers.encode() + body.encode())
-                conn.close()
-                return
-        if req.method == "GET" and req.path == "/submit-info":
-            try:
-                with open(os.path.join("www", "submit-info.html"), "r", encoding="utf-8") as fh:
-                    body = fh.read()
-                headers = "HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n"
-                conn.sendall(headers.encode() + body.encode())
-            except Exception as e:
-                body = f"<h1>500 Internal Server Error</h1><p>{e}</p>"
-                conn.sendall(b"HTTP/1.1 500 Internal Server Error\r\n\r\n" + body.encode())
-            conn.close()
-            return
-        
-        if req.method == "POST" and req.path == "/submit-info":
-            try:
-                header_end = raw_req.find("\r\n\r\n")
-                content_len = 0
-                if header_end != -1:
-                    headers_part = raw_req[:header_end]
-                    for line in headers_part.split("\r\n"):
-                        if line.lower().startswith("content-length:"):
-                            try:
-                                content_len = int(line.split(":", 1)[1].strip())
-                            except Exception:
-                                content_len = 0
-                            break
-
-                body = ""
-                if header_end != -1 and content_len > 0:
-                    start = header_end + 4
-                    body_bytes = msg[start:start + content_len]
-                    try:
-                        body = body_bytes.decode("utf-8")
-                    except Exception:
-                        body = body_bytes.decode("latin-1", errors="ignore")
-                else:
-                    body = ""
-            except Exception:
-                body = ""
-
-            print(f"[HttpAdapter] POST /submit-info received: content_len={content_len} body_len={len(body)}")
-
-            # Parse dữ liệu form
-            form = urllib.parse.parse_qs(body)
-            username = form.get("username", [""])[0]
-            password = form.get("password", [""])[0]
-
-            if not username or not password:
-                body = "<h1>400 Bad Request</h1><p>Missing username or password.</p>"
-                headers = ("HTTP/1.1 400 Bad Request\r\n"
-                        "Content-Type: text/html\r\n"
-                        "Content-Length: {}\r\n"
-                        "Connection: close\r\n\r\n").format(len(body))
-                conn.sendall(headers.encode() + body.encode())
-                conn.close()
-                return
-
-            print(f"[HttpAdapter] Register attempt via /submit-info: {username}")
-
-            # Đọc danh sách người dùng từ file
-            users_file = os.path.join("www", "users.json")
-            users = {}
-            try:
-                if os.path.exists(users_file):
-                    with open(users_file, "r", encoding="utf-8") as f:
-                        users = json.load(f)
-            except Exception as e:
-                print(f"[HttpAdapter] Warning: cannot read users.json: {e}")
-                users = {}
-
-            # Kiểm tra trùng tên
-            if username in users:
-                body = f"<h1>409 Conflict</h1><p>Username '{username}' already exists.</p>"
-                headers = ("HTTP/1.1 409 Conflict\r\n"
-                        "Content-Type: text/html\r\n"
-                        "Content-Length: {}\r\n"
-                        "Connection: close\r\n\r\n").format(len(body))
-                conn.sendall(headers.encode() + body.encode())
-                conn.close()
-                return
-
-            # Lưu tài khoản mới
-            users[username] = password
-            try:
-                with open(users_file, "w", encoding="utf-8") as f:
-                    json.dump(users, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                body = f"<h1>500 Internal Server Error</h1><p>Cannot save user: {e}</p>"
-                conn.sendall(b"HTTP/1.1 500 Internal Server Error\r\n\r\n" + body.encode())
-                conn.close()
-                return
-
-            # Gửi phản hồi thành công
-            try:
-                with open(os.path.join("www", "index.html"), "r", encoding="utf-8") as fh:
-                    body = fh.read()
-                    headers = ("HTTP/1.1 200 OK\r\n"
-                               "Content-Type: text/html\r\n"
-                               "Set-Cookie: auth=true; Path=/; HttpOnly\r\n"
-                               "\r\n")
-                    conn.sendall(headers.encode() + body.encode())
-            except Exception as e:
-                body = f"<h1>500 Internal Server Error</h1><p>{e}</p>"
-                conn.sendall(b"HTTP/1.1 500 Internal Server Error\r\n\r\n" + body.encode())
-
-            conn.close()
+                self.send_parts(conn, body)
             return
 
-        # --- Handle /add-list ---
-        # server_routes.py
-        # httpadapter.py
-
-##############################################################################
-        # --- /add-list ---
-        if req.method == "POST" and req.path == "/add-list":
-            try:
-                # --- lấy content-length ---
-                header_end = raw_req.find("\r\n\r\n")
-                content_len = 0
-                if header_end != -1:
-                    headers_part = raw_req[:header_end]
-                    for line in headers_part.split("\r\n"):
-                        if line.lower().startswith("content-length:"):
-                            try:
-                                content_len = int(line.split(":", 1)[1].strip())
-                            except Exception:
-                                content_len = 0
-                            break
-
-                # --- đọc body bytes ---
-                body = ""
-                if header_end != -1 and content_len > 0:
-                    start = header_end + 4
-                    body_bytes = msg[start:start + content_len]
-                    try:
-                        body = body_bytes.decode("utf-8")
-                    except Exception:
-                        body = body_bytes.decode("latin-1", errors="ignore")
-                else:
-                    body = ""
-
-                # --- parse JSON ---
-                import json
-                try:
-                    data = json.loads(body)
-                    item = data.get("item")
-                    if not item:
-                        raise ValueError("Missing 'item'")
-                except Exception as e:
-                    headers = {"Content-Type": "text/plain"}
-                    resp_body = str(e)
-                    response = f"HTTP/1.1 400 Bad Request\r\nContent-Type: text/plain\r\nContent-Length: {len(resp_body)}\r\nConnection: close\r\n\r\n{resp_body}"
-                    conn.sendall(response.encode())
-                    conn.close()
-                    return
-
-                # --- add item vào danh sách ---
-                _global_list.append({
-                    "user": data.get("user"),      # tên user
-                    "item": item,          # item thêm
-                    "host": data.get("host", "127.0.0.1"),   # host client
-                    "port": data.get("port")                 # port client
-                })
-                resp = {"message": "Item added", "item": item}
-                body_resp = json.dumps(resp)
-                headers = f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {len(body_resp)}\r\nConnection: close\r\n\r\n"
-                conn.sendall(headers.encode() + body_resp.encode())
-
-            except Exception as e:
-                body_bytes = f"<h1>500 Internal Server Error</h1><p>{e}</p>".encode()
-                headers = ("HTTP/1.1 500 Internal Server Error\r\n"
-                        f"Content-Type: text/html\r\n"
-                        f"Content-Length: {len(body_bytes)}\r\n"
-                        "Connection: close\r\n"
-                        "\r\n").encode()
-                conn.sendall(headers + body_bytes)
-            finally:
-                conn.close()
-
-        # #################################################
-        # --- /get-list ---
-        if req.method == "GET" and req.path == "/get-list":
-            try:
-                sessionid = req.cookies.get("sessionid")
-                user = get_user_from_session(sessionid) if sessionid else None
-
-                # if not user:
-                #     body_html = '<h1>401 Unauthorized</h1><p>Login required. <a href="/login">Login</a></p>'
-                #     headers = f"HTTP/1.1 401 Unauthorized\r\nContent-Type: text/html; charset=utf-8\r\nContent-Length: {len(body_html)}\r\nConnection: close\r\n\r\n"
-                #     conn.sendall(headers.encode() + body_html.encode())
-                # else:
-                    # Lấy danh sách trực tiếp từ _global_list
-                resp = {"count": len(_global_list), "list": _global_list}
-                body_resp = json.dumps(resp)
-                headers = f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {len(body_resp)}\r\nConnection: close\r\n\r\n"
-                conn.sendall(headers.encode() + body_resp.encode())
-                handled = True
-                return
-            except Exception as e:
-                body_bytes = f"<h1>500 Internal Server Error</h1><p>{e}</p>".encode()
-                headers = f"HTTP/1.1 500 Internal Server Error\r\nContent-Type: text/html\r\nContent-Length: {len(body_bytes)}\r\nConnection: close\r\n\r\n"
-                conn.sendall(headers + body_bytes)
-                handled = True
-                conn.close()
-                return
-
-##########################################################
-        # --- /connect-peer ---
-        if req.method == "POST" and req.path == "/connect-peer":
-            try:
-                # --- lấy content-length ---
-                header_end = raw_req.find("\r\n\r\n")
-                content_len = 0
-                if header_end != -1:
-                    headers_part = raw_req[:header_end]
-                    for line in headers_part.split("\r\n"):
-                        if line.lower().startswith("content-length:"):
-                            try:
-                                content_len = int(line.split(":", 1)[1].strip())
-                            except Exception:
-                                content_len = 0
-                            break
-
-                # --- đọc body bytes ---
-                body = ""
-                if header_end != -1 and content_len > 0:
-                    start = header_end + 4
-                    body_bytes = msg[start:start + content_len]
-                    try:
-                        body = body_bytes.decode("utf-8")
-                    except Exception:
-                        body = body_bytes.decode("latin-1", errors="ignore")
-                else:
-                    body = ""
-
-                # --- parse JSON ---
-                import json
-                try:
-                    data = json.loads(body)
-                    # Ví dụ: lấy "peer" từ JSON
-                    peer_user = data.get("peer")
-                    if not peer_user:
-                        raise ValueError("Missing 'peer'")
-                except Exception as e:
-                    resp_body = str(e)
-                    response = f"HTTP/1.1 400 Bad Request\r\nContent-Type: text/plain\r\nContent-Length: {len(resp_body)}\r\nConnection: close\r\n\r\n{resp_body}"
-                    conn.sendall(response.encode())
-                    conn.close()
-                    return
-
-                # --- xử lý connect peer ---
-                # Gọi handler nếu cần, hoặc chỉ echo peer:
-                peer_info = next((entry for entry in _global_list if entry.get("user") == peer_user and "port" in entry), None)
-
-                if not peer_info:
-                    resp = {"message": "Peer not online"}
+        # The header block waits for the first piece so both leave in one
+        # write; pieces go out with their chunk framing, uncopied.
+        lead = head
+        sent = 0
+        try:
+            for piece in body:
+                if isinstance(piece, str):
+                    piece = piece.encode("utf-8")
+                if not piece:
+                    continue
+                if chunked:
+                    send_buffers(conn, (lead, b"%x\r\n" % len(piece), piece, b"\r\n"))
                 else:
-                    # Trả thông tin port và host để client connect
-                    peer_name = peer_info["user"]
-                    peer_host = peer_info.get("host", "127.0.0.1")
-                    peer_port = peer_info["port"]
-                    resp = {
-                    "message": "Peer connected",
-                    "peer_user": peer_name,
-                    "host": peer_host,
-                    "port": peer_port
-                     }  
-                    peer_list[peer_name] = (peer_host, peer_port)
-                
-                body_resp = json.dumps(resp)
-                headers = f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {len(body_resp)}\r\nConnection: close\r\n\r\n"
-                conn.sendall(headers.encode() + body_resp.encode())
-
-            except Exception as e:
-                body_bytes = f"<h1>500 Internal Server Error</h1><p>{e}</p>".encode()
-                headers = f"HTTP/1.1 500 Internal Server Error\r\nContent-Type: text/html\r\nContent-Length: {len(body_bytes)}\r\nConnection: close\r\n\r\n"
-                conn.sendall(headers + body_bytes)
-            finally:
-                conn.close()
-
-
-        import socket
-
-# --------------------------------------
-# /broadcast-peer
-# --------------------------------------
-        if req.method == "POST" and req.path == "/broadcast-peer":
-            try:
-                # --- đọc body JSON ---
-                header_end = raw_req.find("\r\n\r\n")
-                content_len = 0
-                if header_end != -1:
-                    headers_part = raw_req[:header_end]
-                    for line in headers_part.split("\r\n"):
-                        if line.lower().startswith("content-length:"):
-                            try:
-                                content_len = int(line.split(":", 1)[1].strip())
-                            except:
-                                content_len = 0
-                            break
-
-                body = ""
-                if header_end != -1 and content_len > 0:
-                    start = header_end + 4
-                    body_bytes = msg[start:start + content_len]
-                    body = body_bytes.decode("utf-8", errors="ignore")
-
-                data = json.loads(body)
-                sender = data.get("from")
-                message = data.get("message")
-
-                if not sender or not message:
-                    raise ValueError("Missing 'from' or 'message'")
-
-                success = 0
-                for peer_name, (ip, port) in peer_list.items():
-                    if peer_name == sender:
-                        continue
-                    try:
-                        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        s.connect((ip, port))
-                        s.sendall(f"[Broadcast] {sender}: {message}".encode("utf-8"))
-                        s.close()
-                        success += 1
-                    except Exception as e:
-                        print(f"[Broadcast] Không gửi được tới {peer_name}: {e}")
-
-                body = f"<h1>Broadcast sent</h1><p>Message delivered to {success} peers.</p>"
-                headers = ("HTTP/1.1 200 OK\r\n"
-                        "Content-Type: text/html\r\n"
-                        f"Content-Length: {len(body)}\r\n\r\n")
-                conn.sendall(headers.encode() + body.encode())
-
-            except Exception as e:
-                err = f"<h1>500 Internal Server Error</h1><p>{e}</p>"
-                conn.sendall(f"HTTP/1.1 500 Internal Server Error\r\nContent-Type: text/html\r\nContent-Length: {len(err)}\r\n\r\n".encode() + err.encode())
-            finally:
-                conn.close()
+                    send_buffers(conn, (lead, piece))
+                lead = b""
+                sent += len(piece)
+        except OSError:
+            raise
+        except Exception as e:
+            # Part of the response may be gone already: all that is left is
+            # to cut it short so the client sees it is incomplete.
+            print("[HttpAdapter] response body of {} failed: {}".format(self.request.path, e))
+            self.keep_alive = False
+            return
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+        if chunked:
+            send_buffers(conn, (lead, b"0\r\n\r\n"))
+        else:
+            send_buffers(conn, (lead,))
+            if length is not None and sent != length:
+                print("[HttpAdapter] response body of {} is {} bytes, announced {}".format(
+                    self.request.path, sent, length))
+                self.keep_alive = False
+
+    def send_file(self, conn, body):
+        """
+        Sends a :class:`FileBody` with the connection's ``sendfile``: the
+        kernel copies the file to the socket, no byte of it is read into
+        Python. ``socket.sendfile`` itself falls back to ``send`` where
+        ``os.sendfile`` is missing.
+
+        :param conn (socket.socket): connection (or sink) the body is written to.
+        :param body (FileBody): file range to send.
+        """
+        with open(body.path, "rb") as fh:
+            sent = conn.sendfile(fh, body.offset, body.count)
+        if sent != body.count:
+            # The file shrank while it was being sent.
+            print("[HttpAdapter] sent {} of {} bytes of {}".format(sent, body.count, body.path))
+            self.keep_alive = False
+
+    def send_parts(self, conn, body):
+        """
+        Sends a :class:`MultipartBody`: the part headers with ``sendall``,
+        the file ranges with ``sendfile``, all from one open file.
+
+        :param conn (socket.socket): connection (or sink) the body is written to.
+        :param body (MultipartBody): ranges to send.
+        """
+        fh = None
+        try:
+            for part in body.parts:
+                if not isinstance(part, FileBody):
+                    conn.sendall(part)
+                    continue
+                if fh is None:
+                    fh = open(part.path, "rb")
+                sent = conn.sendfile(fh, part.offset, part.count)
+                if sent != part.count:
+                    # The file shrank: the rest of the body would be misframed.
+                    print("[HttpAdapter] sent {} of {} bytes of {}".format(sent, part.count, part.path))
+                    self.keep_alive = False
+                    break
+        finally:
+            if fh is not None:
+                fh.close()
+
+    def dispatch(self, conn, msg, routes):
+        """
+        Answers one parsed request.
+
+        The handler is found by matching ``(method, path)`` against
+        the table built by :func:`compile_routes <daemon.router.compile_routes>`,
+        which holds the built-in endpoints and the WeApRous routes alike. A
+        path routed only for other methods is answered with ``405``, a GET
+        without a route falls back to the static files, anything else is
+        ``404``; an exception in the handler is answered with ``500``.
+        Textual responses are compressed by :data:`encoder
+        <daemon.compression.encoder>` when the client accepts it.
+
+        A streamed request body must have its :attr:`BodyStream.fill` set by
+        the caller; whatever the handler does not read is drained here.
+
+        ``conn`` only needs ``sendall``, so the same dispatch serves a real
+        socket (threaded engine) and a buffering sink (asyncio engine). The
+        caller owns the connection: after the response :attr:`keep_alive`
+        tells whether to read the next request or close it.
+
+        :param conn (socket.socket): connection (or sink) the response is written to.
+        :param msg (ParsedRequest): request produced by :class:`RequestParser`.
+        :param routes (dict): Dictionary of route handlers.
+        """
+        req = self.request
 
+        req.prepare_parsed(msg.method, msg.target, msg.version, msg.headers,
+                           msg.body, compile_routes(routes))
+        self.keep_alive = self.allow_keep_alive and self.wants_keep_alive(req)
 
-# --------------------------------------
-# /send-peer
-# --------------------------------------
-        if req.method == "POST" and req.path == "/send-peer":
-            try:
-                # --- đọc body JSON ---
-                header_end = raw_req.find("\r\n\r\n")
-                content_len = 0
-                if header_end != -1:
-                    headers_part = raw_req[:header_end]
-                    for line in headers_part.split("\r\n"):
-                        if line.lower().startswith("content-length:"):
-                            try:
-                                content_len = int(line.split(":", 1)[1].strip())
-                            except:
-                                content_len = 0
-                            break
-
-                body = ""
-                if header_end != -1 and content_len > 0:
-                    start = header_end + 4
-                    body_bytes = msg[start:start + content_len]
-                    body = body_bytes.decode("utf-8", errors="ignore")
-
-                data = json.loads(body)
-                sender = data.get("from")
-                target = data.get("to")
-                message = data.get("message")
-
-                if not sender or not target or not message:
-                    raise ValueError("Missing required fields")
-
-                if target not in peer_list:
-                    conn.sendall(b"HTTP/1.1 404 Not Found\r\n\r\nPeer not found")
-                    conn.close()
-                    return
-
-                ip, port = peer_list[target]
-                try:
-                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    s.connect((ip, port))
-                    s.sendall(f"[Private] {sender}: {message}".encode("utf-8"))
-                    s.close()
-                    body = f"<h1>Message sent</h1><p>{sender} to {target}</p>"
-                    headers = ("HTTP/1.1 200 OK\r\n"
-                            "Content-Type: text/html\r\n"
-                            f"Content-Length: {len(body)}\r\n\r\n")
-                    conn.sendall(headers.encode() + body.encode())
-                except Exception as e:
-                    raise RuntimeError(f"Send failed: {e}")
-
-            except Exception as e:
-                err = f"<h1>500 Internal Server Error</h1><p>{e}</p>"
-                conn.sendall(f"HTTP/1.1 500 Internal Server Error\r\nContent-Type: text/html\r\nContent-Length: {len(err)}\r\n\r\n".encode() + err.encode())
-            finally:
-                conn.close()
-        # --- 404 Not Found ---
+        handler = req.hook
+        if handler is None:
+            if req.allow:
+                handler = method_not_allowed
+            elif req.method == "GET":
+                handler = serve_static
+            else:
+                handler = not_found
         try:
-            if not handled:
-                conn.sendall(b"HTTP/1.1 404 Not Found\r\n\r\n<h1>404 Not Found</h1>")
-        except Exception:
-            pass
-        finally:
-            conn.close()
+            status, headers, body = handler(req)
+        except Exception as e:
+            print("[HttpAdapter] {} {} failed: {}".format(req.method, req.path, e))
+            status = "500 Internal Server Error"
+            headers = {"Content-Type": "text/html"}
+            body = SERVER_ERROR_BODY
+
+        # A streamed body the handler left unread still sits in front of
+        # the next request: skip it, or give up on the connection.
+        if isinstance(msg.body, BodyStream) and not msg.body.done:
+            try:
+                msg.body.drain()
+            except (HttpParseError, OSError):
+                self.keep_alive = False
+                self.closing = True
+        headers, body = encoder.encode(req.headers, status, headers, body)
+        self.send_response(conn, status, headers, body)
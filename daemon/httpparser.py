@@ -0,0 +1,512 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.httpparser
+~~~~~~~~~~~~~~~~~
+
+This module provides an incremental HTTP/1.x request parser shared by the
+threaded and asyncio engines. It does no I/O itself: received bytes are
+written straight into a ``bytearray`` from the shared :data:`buffers
+<daemon.bufferpool.buffers>` pool (``recv_into`` a
+:meth:`RequestParser.writable` view, or :meth:`RequestParser.feed`), only the
+newly arrived bytes are scanned for the end of the header block, the header
+block is parsed once, and the body is handed out as a ``memoryview`` of the
+receive buffer without being copied. The buffer grows with the bytes that
+actually arrive, never ahead of them on the word of ``Content-Length``, and
+a buffered body larger than ``max_body_size`` is refused with ``413``.
+
+Bodies framed with ``Transfer-Encoding: chunked`` are decoded incrementally,
+in place in the same buffer. A request whose route wants to stream its body
+(see ``stream_body``) is returned as soon as its head is parsed, with a
+:class:`BodyStream` as body: the body is then decoded piece by piece as it
+is read, so the buffer never holds more than one read of it.
+
+A request takes the buffer its body sits in along; once answered, its
+buffer goes back to the pool with :meth:`ParsedRequest.release`, and
+:meth:`RequestParser.release` returns the parser's own buffer when the
+connection ends. A handler that keeps the body past its response must copy it.
+
+Usage::
+
+  >>> parser = RequestParser()
+  >>> n = conn.recv_into(parser.writable())
+  >>> parser.commit(n)
+  >>> req = parser.next_request()
+  >>> req.method, req.target, bytes(req.body)
+  ('POST', '/login', b'username=admin&password=password')
+"""
+
+#: Largest accepted request line plus header block (bytes).
+MAX_HEADER_SIZE = 64 * 1024
+
+#: Bytes offered to the socket per read when the body size is not known.
+READ_SIZE = 16 * 1024
+
+#: Least free space offered to a read; a buffer with less is swapped for a
+#: larger one.
+MIN_READ = 2 * 1024
+
+#: Longest accepted chunk-size or trailer line of a chunked body (bytes).
+MAX_CHUNK_LINE = 4096
+
+#: Largest request body held in memory (bytes); a streamed body is not limited.
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+from .bufferpool import buffers
+
+# States of the chunked body decoder.
+_SIZE, _DATA, _CRLF, _TRAILER, _DONE = range(5)
+
+
+class HttpParseError(ValueError):
+    """Raised for a malformed, oversized or truncated request.
+
+    :attrs status (str): status line of the answer.
+    """
+
+    status = "400 Bad Request"
+
+
+class BodyTooLarge(HttpParseError):
+    """Raised for a body above the parser's ``max_body_size``."""
+
+    status = "413 Content Too Large"
+
+
+class ParsedRequest:
+    """One complete request as produced by :class:`RequestParser`.
+
+    :attrs method (str): HTTP verb.
+    :attrs target (str): request target as sent (path and query string).
+    :attrs version (str): protocol version, e.g. ``"HTTP/1.1"``.
+    :attrs headers (dict): header fields keyed by lower-case name.
+    :attrs body (memoryview or BodyStream): request body, a view of the
+        receive buffer, or a :class:`BodyStream` for a streamed body.
+    """
+
+    __slots__ = ("method", "target", "version", "headers", "body")
+
+    def __init__(self, method, target, version, headers, body):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    def release(self):
+        """Returns the receive buffer holding the body to the pool; the
+        body is unusable afterwards. A streamed body has nothing to return."""
+        if isinstance(self.body, memoryview):
+            buffers.release_view(self.body)
+
+
+class BodyStream:
+    """Iterator over the body of a streamed request, in decoded pieces.
+
+    The engine serving the connection sets :attr:`fill`, a callable that
+    receives more bytes into the parser and returns their number (0 once
+    the client has closed). Unread body bytes must be consumed (see
+    :meth:`drain`) before the next request on the connection is parsed.
+
+    Usage::
+
+      >>> for piece in req.body:
+      ...     out.write(piece)
+
+    :attrs done (bool): True once the whole body has been read.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.fill = None
+        self.done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.done:
+            raise StopIteration
+        while True:
+            data = self.parser.read_body()
+            if data is None:
+                if not self.fill():
+                    raise HttpParseError("incomplete request body")
+                continue
+            if not data:
+                self.done = True
+                raise StopIteration
+            return data
+
+    def read(self):
+        """Returns the rest of the body as bytes."""
+        return b"".join(self)
+
+    def drain(self):
+        """Reads and discards the rest of the body."""
+        for _ in self:
+            pass
+
+
+class RequestParser:
+    """Incremental parser for the requests arriving on one connection.
+
+    :attrs buffer (bytearray): receive buffer from the pool, the current
+        request starts at 0; an empty placeholder until bytes arrive.
+    :attrs end (int): number of received bytes in :attr:`buffer`.
+    :attrs stream_body (callable): ``stream_body(method, target)`` tells
+        whether a request should get a :class:`BodyStream` instead of a
+        buffered body. None buffers every body.
+    :attrs max_body_size (int): largest buffered body, decoded.
+    :attrs max_buffer (int): largest receive buffer the parser asks for.
+    """
+
+    __slots__ = (
+        "max_header_size", "max_body_size", "max_buffer", "stream_body", "buffer",
+        "end", "scanned", "head", "body_start", "length", "rpos", "wpos",
+        "chunk_state", "chunk_left", "streaming",
+    )
+
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, stream_body=None,
+                 max_body_size=MAX_BODY_SIZE):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        # A head, a body and one read of the following request.
+        self.max_buffer = max_header_size + max_body_size + READ_SIZE
+        self.stream_body = stream_body
+        self.buffer = bytearray()
+        self.end = 0
+        #: Offset where the next search for the header terminator starts.
+        self.scanned = 0
+        #: (method, target, version, headers) once the header block of
+        #: the current request is parsed.
+        self.head = None
+        #: Offset of the body in :attr:`buffer`.
+        self.body_start = 0
+        #: Content-Length of the body, None for a chunked body.
+        self.length = 0
+        #: Offset of the next undecoded body byte.
+        self.rpos = 0
+        #: End of the decoded body (chunked bodies are decoded in place).
+        self.wpos = 0
+        #: Decoder state and bytes left in the current chunk.
+        self.chunk_state = _SIZE
+        self.chunk_left = 0
+        #: True while a :class:`BodyStream` is reading the current body.
+        self.streaming = False
+
+    def pending(self):
+        """
+        :rtype bool: True if part of a request has been received.
+        """
+        return self.end > 0
+
+    def writable(self, size=MIN_READ):
+        """
+        Returns free space at the end of the buffer for ``recv_into``.
+
+        The first read takes a head-sized buffer from the pool. While a
+        ``Content-Length`` body arrives at least one read of it is offered,
+        and a full buffer is swapped for one twice as large, up to the size
+        of the whole request: a large upload is copied a few times, but
+        memory is only taken for bytes the client actually sent. A streamed
+        body is read through the free space of the buffer instead. The view
+        must be released (not stored) before the next call.
+
+        :param size (int): minimum number of bytes to offer.
+
+        :rtype memoryview: writable view of the free space.
+        """
+        need = size
+        if self.head is not None and self.length is not None and not self.streaming:
+            need = max(size, min(self.body_start + self.length - self.end, READ_SIZE))
+        if len(self.buffer) - self.end < need:
+            self._grow(self.end + need)
+        return memoryview(self.buffer)[self.end:]
+
+    def _grow(self, size):
+        """Moves the received bytes to a buffer of at least ``size`` bytes
+        and gives the old one back. The buffer at least doubles, but not
+        past the end of a request of known length nor :attr:`max_buffer`."""
+        old = self.buffer
+        limit = self.max_buffer
+        if self.head is not None and self.length is not None and not self.streaming:
+            limit = min(limit, self.body_start + self.length)
+        buf = buffers.acquire(max(size, min(2 * len(old), limit)))
+        if self.end:
+            with memoryview(old) as view:
+                buf[:self.end] = view[:self.end]
+        self.buffer = buf
+        buffers.release(old)
+
+    def _shift(self, n):
+        """Drops the first ``n`` received bytes, moving the rest down in
+        place; a pooled buffer is never resized."""
+        end = self.end
+        with memoryview(self.buffer) as view:
+            view[:end - n] = view[n:end]
+        self.end = end - n
+
+    def release(self):
+        """Gives the buffer back to the pool when the connection ends."""
+        buf = self.buffer
+        self.buffer = bytearray()
+        self.end = 0
+        buffers.release(buf)
+
+    def commit(self, nbytes):
+        """Marks ``nbytes`` written into the last :meth:`writable` view as received."""
+        self.end += nbytes
+
+    def feed(self, data):
+        """Appends received bytes (for callers that do not ``recv_into``)."""
+        size = len(data)
+        with self.writable(size) as view:
+            view[:size] = data
+        self.end += size
+
+    def next_request(self):
+        """
+        Returns the next complete request, if the buffer holds one.
+
+        A request whose body is streamed is returned as soon as its head is
+        parsed; no further request is returned until its :class:`BodyStream`
+        has been read to the end.
+
+        :rtype ParsedRequest: the request, or None if more bytes are needed.
+
+        :raises HttpParseError: If the request head is malformed or too large.
+        """
+        if self.streaming:
+            return None
+        if self.head is None:
+            if not self._parse_head():
+                return None
+            if self.stream_body is not None and self.stream_body(*self.head[:2]):
+                self.streaming = True
+                method, target, version, headers = self.head
+                return ParsedRequest(method, target, version, headers, BodyStream(self))
+
+        if self.length is None:
+            done = self._decode_chunks(self._move_down)
+            if self.wpos - self.body_start > self.max_body_size:
+                raise BodyTooLarge("request body too large")
+            if not done:
+                self._compact()
+                return None
+            body_end, total = self.wpos, self.rpos
+        else:
+            if self.length > self.max_body_size:
+                raise BodyTooLarge("request body too large")
+            total = body_end = self.body_start + self.length
+            if self.end < total:
+                return None
+
+        # Hand the whole buffer to the request so its body needs no copy;
+        # only bytes of a following pipelined request move to a new buffer.
+        method, target, version, headers = self.head
+        buf = self.buffer
+        leftover = self.end - total
+        if leftover:
+            self.buffer = buffers.acquire(max(leftover, MIN_READ))
+            with memoryview(buf) as view:
+                self.buffer[:leftover] = view[total:self.end]
+        else:
+            self.buffer = bytearray()
+        self.end = leftover
+        self.scanned = 0
+        self.head = None
+
+        return ParsedRequest(method, target, version, headers,
+                             memoryview(buf)[self.body_start:body_end])
+
+    def read_body(self):
+        """
+        Returns the next decoded piece of a streamed body.
+
+        Decoded bytes are removed from the buffer, so it only ever holds
+        what has been received but not read yet.
+
+        :rtype bytes: body bytes, ``b""`` at the end of the body, or None
+            if more bytes must be received first.
+
+        :raises HttpParseError: If the chunked framing is malformed.
+        """
+        buf = self.buffer
+        if self.length is not None:
+            if self.length == 0:
+                return self._end_stream()
+            n = min(self.length, self.end - self.rpos)
+            if not n:
+                return None
+            data = bytes(buf[self.rpos:self.rpos + n])
+            self.rpos += n
+            self.length -= n
+        else:
+            if self.chunk_state == _DONE:
+                return self._end_stream()
+            pieces = []
+            self._decode_chunks(lambda start, stop: pieces.append(buf[start:stop]))
+            if not pieces:
+                if self.chunk_state == _DONE:
+                    return self._end_stream()
+                self._discard()
+                return None
+            data = bytes(b"".join(pieces))
+        self._discard()
+        return data
+
+    def _end_stream(self):
+        self._discard()
+        self.streaming = False
+        self.scanned = 0
+        self.head = None
+        return b""
+
+    def _discard(self):
+        """Drops the bytes before :attr:`rpos` from the buffer."""
+        if self.rpos:
+            self._shift(self.rpos)
+            self.rpos = 0
+
+    def _compact(self):
+        """Moves the undecoded bytes of a chunked body down to the end of
+        the decoded ones, so the buffer never holds the chunk framing."""
+        gap = self.rpos - self.wpos
+        if gap:
+            end = self.end
+            with memoryview(self.buffer) as view:
+                view[self.wpos:end - gap] = view[self.rpos:end]
+            self.end = end - gap
+            self.rpos = self.wpos
+
+    def _move_down(self, start, stop):
+        """Appends decoded chunk data at :attr:`wpos`, in place."""
+        n = stop - start
+        if self.wpos != start:
+            self.buffer[self.wpos:self.wpos + n] = self.buffer[start:stop]
+        self.wpos += n
+
+    def _decode_chunks(self, emit):
+        """
+        Decodes as much of a chunked body as has been received, passing
+        each run of data bytes to ``emit(start, stop)``.
+
+        :rtype bool: True once the last chunk and the trailers are consumed.
+        """
+        buf = self.buffer
+        while True:
+            state = self.chunk_state
+            if state == _DONE:
+                return True
+            if state == _DATA:
+                n = min(self.chunk_left, self.end - self.rpos)
+                if n:
+                    emit(self.rpos, self.rpos + n)
+                    self.rpos += n
+                    self.chunk_left -= n
+                if self.chunk_left:
+                    return False
+                self.chunk_state = _CRLF
+                continue
+            if state == _CRLF:
+                if self.end - self.rpos < 2:
+                    return False
+                if buf[self.rpos:self.rpos + 2] != b"\r\n":
+                    raise HttpParseError("missing CRLF after chunk data")
+                self.rpos += 2
+                self.chunk_state = _SIZE
+                continue
+
+            idx = buf.find(b"\r\n", self.rpos, self.end)
+            if idx == -1:
+                if self.end - self.rpos > MAX_CHUNK_LINE:
+                    raise HttpParseError("chunk line too long")
+                return False
+            if idx - self.rpos > MAX_CHUNK_LINE:
+                raise HttpParseError("chunk line too long")
+            line = bytes(buf[self.rpos:idx])
+            self.rpos = idx + 2
+
+            if state == _SIZE:
+                size = line.split(b";", 1)[0].strip()
+                try:
+                    if not size or len(size) > 16 or size.startswith((b"-", b"+")):
+                        raise ValueError(size)
+                    self.chunk_left = int(size, 16)
+                except ValueError:
+                    raise HttpParseError("invalid chunk size")
+                self.chunk_state = _DATA if self.chunk_left else _TRAILER
+            elif not line:
+                # Trailer fields are read past and ignored.
+                self.chunk_state = _DONE
+
+    def _parse_head(self):
+        buf = self.buffer
+
+        # Tolerate empty lines before a request line (RFC 9112, 2.2).
+        skip = 0
+        while self.end - skip >= 2 and buf[skip:skip + 2] == b"\r\n":
+            skip += 2
+        if skip:
+            self._shift(skip)
+            self.scanned = max(self.scanned - skip, 0)
+
+        # Only look at bytes that arrived since the last scan.
+        idx = buf.find(b"\r\n\r\n", max(self.scanned - 3, 0), self.end)
+        if idx == -1:
+            self.scanned = self.end
+            if self.end > self.max_header_size:
+                raise HttpParseError("request header block too large")
+            return False
+        if idx > self.max_header_size:
+            raise HttpParseError("request header block too large")
+
+        lines = buf[:idx].decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        if len(parts) == 3:
+            method, target, version = parts
+        elif len(parts) == 2:
+            method, target = parts
+            version = "HTTP/1.1"
+        else:
+            raise HttpParseError("invalid request line: {!r}".format(lines[0]))
+
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        length = 0
+        if "transfer-encoding" in headers:
+            # Transfer-Encoding overrides Content-Length (RFC 9112, 6.3).
+            codings = headers["transfer-encoding"].lower().split(",")
+            if codings[-1].strip() != "chunked":
+                raise HttpParseError("unsupported Transfer-Encoding")
+            length = None
+            headers.pop("content-length", None)
+        elif "content-length" in headers:
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                raise HttpParseError("invalid Content-Length")
+            if length < 0:
+                raise HttpParseError("invalid Content-Length")
+
+        self.head = (method, target, version, headers)
+        self.body_start = self.rpos = self.wpos = idx + 4
+        self.length = length
+        self.chunk_state = _SIZE
+        self.chunk_left = 0
+        return True
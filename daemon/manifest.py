@@ -0,0 +1,191 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.manifest
+~~~~~~~~~~~~~~~~~
+
+This module provides the asset manifest of the backend: a snapshot of the
+files under ``www/`` and ``static/`` taken at startup, keyed by the URL path
+they are served at. Each :class:`Asset` records the resolved file path, the
+MIME type, size and the directory it was found in, so the static fallback
+finds a file with one dict lookup and answers an unknown URL under those
+directories with ``404`` without touching the disk.
+
+A :class:`Manifest` is immutable. :meth:`AssetIndex.rescan` builds a new one
+and swaps it in with a single reference assignment, so a request sees
+either the old manifest or the new one, never a mix. Rescans are triggered
+with ``SIGHUP``, which the pre-fork supervisor forwards to its workers;
+no HTTP endpoint triggers them.
+
+Contents and validators (``ETag``, ``Last-Modified``, ``Content-Length``)
+of the files themselves come from :data:`static_cache
+<daemon.filecache.static_cache>`, which revalidates them on disk, so a
+file changed between two rescans is never served with stale ones; the
+manifest only decides which files exist.
+
+Usage::
+
+  >>> assets.rescan()
+  >>> assets.lookup("/css/chat.css")
+  Asset(url='/css/chat.css', path='/srv/app/static/css/chat.css',
+        content_type='text/css', size=3044, root='static/')
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from .response import Response
+
+#: Directories scanned into the manifest, relative to the working directory.
+SCAN_ROOTS = ("www", "static")
+
+#: One file of the manifest.
+Asset = namedtuple("Asset", "url path content_type size root")
+
+
+class Manifest:
+    """Immutable ``URL path -> Asset`` snapshot of the scanned directories.
+
+    :attrs assets (mappingproxy): URL path -> :class:`Asset`.
+    :attrs roots (frozenset): scanned directories, as returned by
+                              :meth:`Response.prepare_content_type` (``"www/"``).
+    :attrs bytes (int): total size of the assets.
+    :attrs scanned_at (float): wall clock time of the scan.
+    :attrs scan_time (float): seconds the scan took.
+    """
+
+    __slots__ = ("assets", "roots", "bytes", "scanned_at", "scan_time")
+
+    def __init__(self, assets, roots, scan_time=0.0):
+        self.assets = MappingProxyType(assets)
+        self.roots = frozenset(root.rstrip("/") + "/" for root in roots)
+        self.bytes = sum(asset.size for asset in assets.values())
+        self.scanned_at = time.time()
+        self.scan_time = scan_time
+
+    @classmethod
+    def scan(cls, roots=SCAN_ROOTS):
+        """
+        Walks ``roots`` and lists every file that the static fallback would
+        serve from there: a file is kept only if its MIME type maps back to
+        the directory it was found in, and only if it resolves inside it.
+
+        :param roots (tuple): directories to scan.
+
+        :rtype Manifest: the new snapshot.
+        """
+        started = time.monotonic()
+        resp = Response()
+        base_dirs = {}
+        assets = {}
+        for root in roots:
+            top = os.path.realpath(root)
+            for dirpath, _, filenames in os.walk(top):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    url = "/" + os.path.relpath(path, top).replace(os.sep, "/")
+                    mime_type = resp.get_mime_type(url)
+                    if mime_type not in base_dirs:
+                        try:
+                            base_dir = resp.prepare_content_type(mime_type)
+                            base_dirs[mime_type] = (base_dir, resp.headers["Content-Type"])
+                        except ValueError:
+                            base_dirs[mime_type] = (None, None)
+                    base_dir, content_type = base_dirs[mime_type]
+                    if base_dir is None or base_dir.rstrip("/") != root.rstrip("/"):
+                        continue
+                    real = os.path.realpath(path)
+                    if not real.startswith(top + os.sep):
+                        continue
+                    try:
+                        st = os.stat(real)
+                    except OSError:
+                        continue
+                    assets[url] = Asset(url, real, content_type, st.st_size, base_dir)
+        return cls(assets, roots, time.monotonic() - started)
+
+    def lookup(self, path):
+        """Returns the :class:`Asset` served at ``path``, or None. The path
+        is matched as is: requests come normalized by :func:`normalize_path
+        <daemon.router.normalize_path>`, dot segments are never resolved."""
+        return self.assets.get(path)
+
+    def covers(self, base_dir):
+        """True if ``base_dir`` was scanned, so a miss there is a ``404``."""
+        return base_dir in self.roots
+
+
+class AssetIndex:
+    """Holder of the current :class:`Manifest`, shared between threads.
+
+    :attrs roots (tuple): directories scanned.
+    :attrs current (Manifest): the snapshot in use, None before the first scan.
+    :attrs rescans (int): scans done since startup.
+    """
+
+    def __init__(self, roots=SCAN_ROOTS):
+        self.roots = roots
+        self.current = None
+        self.rescans = 0
+        self.lock = threading.Lock()
+
+    def rescan(self):
+        """
+        Scans the directories again and swaps the new manifest in. Concurrent
+        rescans are serialized; lookups are never blocked.
+
+        :rtype Manifest: the manifest now in use.
+        """
+        with self.lock:
+            manifest = Manifest.scan(self.roots)
+            self.current = manifest
+            self.rescans += 1
+        print("[Manifest] {} assets, {} bytes, scanned in {:.1f} ms".format(
+            len(manifest.assets), manifest.bytes, manifest.scan_time * 1000))
+        return manifest
+
+    def lookup(self, path):
+        """Returns the :class:`Asset` served at ``path``, or None (also
+        before the first scan)."""
+        manifest = self.current
+        return None if manifest is None else manifest.lookup(path)
+
+    def covers(self, base_dir):
+        """True if a manifest is in use and ``base_dir`` is one of its roots."""
+        manifest = self.current
+        return manifest is not None and manifest.covers(base_dir)
+
+    def stats(self):
+        """
+        Returns the manifest summary for ``/manifest-status``.
+
+        :rtype dict: roots, assets, bytes, scan time and rescan count.
+        """
+        manifest = self.current
+        if manifest is None:
+            return {"roots": list(self.roots), "assets": 0, "scanned": False}
+        return {
+            "roots": sorted(manifest.roots),
+            "assets": len(manifest.assets),
+            "bytes": manifest.bytes,
+            "scanned_at": manifest.scanned_at,
+            "scan_ms": round(manifest.scan_time * 1000, 3),
+            "rescans": self.rescans,
+        }
+
+
+#: Manifest used by the static fallback.
+assets = AssetIndex()
@@ -27,51 +27,273 @@ Requirement:
 - dictionary: :class: `CaseInsensitiveDict <CaseInsensitiveDict>` for managing headers and cookies.
 
 """
+import json
 import socket
 import threading
 from .response import *
 from .httpadapter import HttpAdapter
 from .dictionary import CaseInsensitiveDict
+from .bufferpool import buffers
+from .httpparser import MIN_READ, MAX_HEADER_SIZE
+from .httpadapter import KEEPALIVE_TIMEOUT, MAX_KEEPALIVE_REQUESTS
+from .upstream import upstreams, upstream_head, Framing, StaleConnection, ClientError
+from .balancer import balancers
+from .health import health_checker
+
+#: Seconds a client may stay silent while sending its request.
+CLIENT_TIMEOUT = 30.0
+
+#: Host name the proxy answers itself instead of forwarding: its
+#: :data:`STATUS_PATH` gives loopback clients the proxy's own state.
+STATUS_HOST = "proxy.status"
+
+#: Path of the proxy's state under :data:`STATUS_HOST`.
+STATUS_PATH = "/proxy-status"
 
 #: A dictionary mapping hostnames to backend IP and port tuples.
 #: Used to determine routing targets for incoming requests.
 
 
 
-def forward_request(host, port, request):
+class ClientRequest:
+    """A client request whose head has been read. Its body is not read
+    ahead: :meth:`body` hands it out piece by piece, straight from the
+    client socket, while it is relayed to the backend.
+
+    The head is read into a pooled buffer, which the body pieces then
+    reuse; :meth:`release` gives it back, or the next request on the
+    connection takes it over with the bytes that followed the body
+    (pipelined requests). Nothing is decoded but the head, so the body
+    goes through byte for byte.
+
+    :attrs method (str): request method.
+    :attrs target (str): request target.
+    :attrs headers (dict): header fields, names in lower case.
+    :attrs upstream_head (bytes): the head to send to the backend.
+    :attrs replayable (bool): whether the whole body arrived with the head,
+                              so the request can be sent again.
+    :attrs rest (tuple): ``(start, end)`` in the buffer of the bytes read
+                         past the body, once it has been relayed.
     """
-    Forwards an HTTP request to a backend server and retrieves the response.
+
+    __slots__ = ("conn", "buf", "pos", "end", "body_end", "method", "target",
+                 "version", "headers", "upstream_head", "framing", "streamed", "rest")
+
+    def __init__(self, conn, buf, head_end, end):
+        self.conn = conn
+        self.buf = buf
+        self.pos = head_end + 4
+        self.end = end
+        head = bytes(buf[:head_end])
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        if len(parts) != 3:
+            raise ValueError("invalid request line")
+        self.method, self.target, self.version = parts
+        self.headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                self.headers[name.strip().lower()] = value.strip()
+        self.upstream_head = upstream_head(head)
+        self.framing = Framing.request(self.headers)
+        self.body_end = self.framing.consume(buf, self.pos, end)
+        self.streamed = False
+        self.rest = (self.body_end, end) if self.body_end >= 0 else None
+
+    @classmethod
+    def read(cls, conn, previous=None, idle_timeout=None):
+        """
+        Reads a request head from ``conn``, and whatever body bytes come
+        with it.
+
+        :param previous (ClientRequest): the request answered before on the
+                                         connection, whose buffer and
+                                         pipelined bytes are taken over.
+        :param idle_timeout (float): seconds to wait for the first byte,
+                                     :data:`CLIENT_TIMEOUT` after it.
+
+        :rtype ClientRequest: the request, None if the client closed the
+                              connection, or let it idle out, without
+                              sending anything.
+
+        :raises ValueError: malformed or oversized head.
+        :raises OSError: the connection failed.
+        """
+        size = 0
+        if previous is not None:
+            buf, previous.buf = previous.buf, bytearray()
+            if previous.rest is not None:
+                start, end = previous.rest
+                size = end - start
+                buf[:size] = buf[start:end]
+        else:
+            buf = buffers.acquire(MIN_READ)
+        scanned = 0
+        try:
+            if idle_timeout is not None and not size:
+                conn.settimeout(idle_timeout)
+            while True:
+                idx = buf.find(b"\r\n\r\n", scanned, size)
+                if idx >= 0:
+                    return cls(conn, buf, idx, size)
+                scanned = max(size - 3, 0)
+                if size >= MAX_HEADER_SIZE:
+                    raise ValueError("request head too large")
+                if size == len(buf):
+                    bigger = buffers.acquire(2 * size)
+                    bigger[:size] = buf
+                    buffers.release(buf)
+                    buf = bigger
+                try:
+                    with memoryview(buf) as view:
+                        nbytes = conn.recv_into(view[size:])
+                except socket.timeout:
+                    if size:
+                        raise
+                    nbytes = 0
+                if not nbytes:
+                    if size:
+                        raise ValueError("connection closed in the request head")
+                    buffers.release(buf)
+                    return None
+                if not size and idle_timeout is not None:
+                    conn.settimeout(CLIENT_TIMEOUT)
+                size += nbytes
+        except BaseException:
+            buffers.release(buf)
+            raise
+
+    def wants_keep_alive(self):
+        """
+        Applies the HTTP/1.0 and HTTP/1.1 ``Connection`` semantics.
+
+        :rtype bool: True if the client accepts a persistent connection.
+        """
+        tokens = [t.strip().lower() for t in self.headers.get("connection", "").split(",")]
+        if "close" in tokens:
+            return False
+        if self.version == "HTTP/1.0":
+            return "keep-alive" in tokens
+        return True
+
+    @property
+    def replayable(self):
+        return self.body_end >= 0
+
+    def body(self):
+        """
+        Yields the request body as it arrives, as views of the request's
+        buffer, each valid until the next one is asked for.
+
+        :raises ClientError: the client failed or closed the connection
+                             before the end of the body, or sent malformed
+                             chunked framing.
+        """
+        buf = self.buf
+        with memoryview(buf) as view:
+            if self.body_end >= 0:
+                if self.body_end > self.pos:
+                    yield view[self.pos:self.body_end]
+                return
+            if self.streamed:
+                raise ClientError("request body already relayed")
+            self.streamed = True
+            if self.end > self.pos:
+                yield view[self.pos:self.end]
+            framing = self.framing
+            while True:
+                try:
+                    nbytes = self.conn.recv_into(view)
+                except OSError as e:
+                    raise ClientError("client read failed: {}".format(e))
+                if not nbytes:
+                    raise ClientError("client closed the connection in the request body")
+                try:
+                    end = framing.consume(buf, 0, nbytes)
+                except ValueError as e:
+                    raise ClientError(str(e))
+                if end >= 0:
+                    self.rest = (end, nbytes)
+                    yield view[:end]
+                    return
+                yield view[:nbytes]
+
+    def release(self):
+        """Gives the request's buffer back to the pool."""
+        buffers.release(self.buf)
+        self.buf = bytearray()
+
+
+def forward_request(host, port, request, conn, keep_alive=None):
+    """
+    Forwards an HTTP request to a backend server and relays the response
+    to the client.
+
+    The request goes out on a persistent connection from :data:`upstreams
+    <daemon.upstream.upstreams>`. Its body is read from the client as it is
+    sent, and the response is sent to the client as it arrives (see
+    :meth:`UpstreamConnection.relay <daemon.upstream.UpstreamConnection.relay>`),
+    up to the end its ``Content-Length`` or chunked framing gives, so the
+    connection can be reused by the next request to the same backend. A
+    request that fails on a reused connection before any response byte
+    arrived (the backend closed it while idle) is sent again, once, on a
+    new connection, if its body is still at hand.
 
     :params host (str): IP address of the backend server.
     :params port (int): port number of the backend server.
-    :params request (str): incoming HTTP request.
-
-    :rtype bytes: Raw HTTP response from the backend server. If the connection
-                  fails, returns a 404 Not Found response.
+    :params request (ClientRequest): incoming HTTP request.
+    :params conn (socket.socket): client connection socket.
+    :params keep_alive (bytes): ``Connection`` / ``Keep-Alive`` lines sent to
+                                the client to keep its connection open, None
+                                for ``Connection: close``.
+
+    :rtype bool: True if the client got the backend's response and its
+                 connection can carry another request. If the connection
+                 to the backend fails before the response, the client gets
+                 a 502 Bad Gateway response; if it fails during the response,
+                 the client connection is closed in the middle of it.
     """
 
-    backend = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
+    error = None
+    for attempt in range(2):
+        try:
+            backend = upstreams.acquire(host, port)
+        except OSError as e:
+            error = e
+            break
+        try:
+            reusable = backend.relay(request, conn, keep_alive)
+        except ClientError as e:
+            upstreams.release(backend, False)
+            print("[Proxy] Client error: {}".format(e))
+            return False
+        except OSError as e:
+            upstreams.release(backend, False)
+            error = e
+            if backend.answered:
+                print("Socket error: {}".format(error))
+                return False
+            if isinstance(e, StaleConnection) and attempt == 0:
+                upstreams.count_retry()
+                continue
+            break
+        upstreams.release(backend, reusable)
+        return backend.keeps_client
+
+    print("Socket error: {}".format(error))
     try:
-        backend.connect((host, port))
-        backend.sendall(request.encode())
-        response = b""
-        while True:
-            chunk = backend.recv(4096)
-            if not chunk:
-                break
-            response += chunk
-        return response
-    except socket.error as e:
-      print("Socket error: {}".format(e))
-      return (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
+        conn.sendall((
+                "HTTP/1.1 502 Bad Gateway\r\n"
+                "Content-Type: text/plain\r\n"
+                "Content-Length: 11\r\n"
+                "Connection: close\r\n"
+                "\r\n"
+                "Bad Gateway"
+            ).encode('utf-8'))
+    except OSError:
+        pass
+    return False
 
 
 def resolve_routing_policy(hostname, routes):
@@ -79,9 +301,17 @@ def resolve_routing_policy(hostname, routes):
     Handles an routing policy to return the matching proxy_pass.
     It determines the target backend to forward the request to.
 
-    :params host (str): IP address of the request target server.
-    :params port (int): port number of the request target server.
+    A host with several ``proxy_pass`` backends is balanced by its
+    ``dist_policy`` (see :mod:`daemon.balancer`). The chosen backend counts
+    the request as in flight until the caller calls its ``release``.
+
+    :params hostname (str): host name of the request.
     :params routes (dict): dictionary mapping hostnames and location.
+
+    :rtype tuple: ``(proxy_host, proxy_port, member)``; ``member`` is the
+                  :class:`Member <daemon.balancer.Member>` to release once
+                  the response is sent, None for the default backend. All
+                  three are None when every backend of the host is down.
     """
 
     print(hostname)
@@ -89,34 +319,71 @@ def resolve_routing_policy(hostname, routes):
     print (proxy_map)
     print (policy)
 
-    proxy_host = ''
-    proxy_port = '9000'
-    if isinstance(proxy_map, list):
-        if len(proxy_map) == 0:
+    balancer = balancers.lookup(hostname, routes)
+    if balancer is None:
+        if isinstance(proxy_map, list):
             print("[Proxy] Emtpy resolved routing of hostname {}".format(hostname))
-            print ("Empty proxy_map result")
-            # TODO: implement the error handling for non mapped host
-            #       the policy is design by team, but it can be 
-            #       basic default host in your self-defined system
             # Use a dummy host to raise an invalid connection
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
-        elif len(proxy_map) == 1:
-            proxy_host, proxy_port = proxy_map[0].split(":", 2)
-        #elif: # apply the policy handling 
-        #   proxy_map
-        #   policy
-        else:
-            # Out-of-handle mapped host
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
-    else:
+            return '127.0.0.1', '9000', None
         print("[Proxy] resolve route of hostname {} is a singulair to".format(hostname))
-        proxy_host, proxy_port = proxy_map.split(":", 2)
+        proxy_host, proxy_port = proxy_map.rsplit(":", 1)
+        return proxy_host, proxy_port, None
+
+    member = balancer.acquire()
+    if member is None:
+        return None, None, None
+    return member.host, member.port, member
+
+def proxy_status():
+    """
+    Returns the proxy's state for ``/proxy-status``.
+
+    :rtype dict: the upstream connection pool, per-host balancer and
+                 health check statistics.
+    """
+    return {"upstreams": upstreams.stats(), "balancers": balancers.stats(),
+            "health": health_checker.stats()}
 
-    return proxy_host, proxy_port
 
-def handle_client(ip, port, conn, addr, routes):
+def answer_status(conn, addr, request, keep_alive=None):
+    """
+    Answers a request to the status host: ``GET /proxy-status`` from a
+    loopback client gets :func:`proxy_status` as JSON, anything else
+    ``404 Not Found``. Nothing is forwarded.
+
+    :params conn (socket.socket): client connection socket.
+    :params addr (tuple): client address (IP, port).
+    :params request (ClientRequest): the request, head read.
+    :params keep_alive (bytes): header lines keeping the client connection
+                                open, None to close it.
+
+    :rtype bool: True if the client connection can carry another request.
+    """
+    try:
+        for _ in request.body():
+            pass
+    except ClientError as e:
+        print("[Proxy] Client error: {}".format(e))
+        return False
+    if (request.method == "GET" and request.target.split("?", 1)[0] == STATUS_PATH
+            and addr[0] in ("127.0.0.1", "::1")):
+        status, content_type = b"200 OK", b"application/json"
+        body = json.dumps(proxy_status()).encode("utf-8")
+    else:
+        status, content_type, body = b"404 Not Found", b"text/plain", b"404 Not Found"
+    head = (b"HTTP/1.1 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n"
+            % (status, content_type, len(body)))
+    head += keep_alive or b"Connection: close\r\n"
+    try:
+        conn.sendall(head + b"\r\n" + body)
+    except OSError as e:
+        print("Socket error: {}".format(e))
+        return False
+    return keep_alive is not None
+
+
+def handle_client(ip, port, conn, addr, routes, keepalive_timeout=KEEPALIVE_TIMEOUT,
+                  max_keepalive_requests=MAX_KEEPALIVE_REQUESTS, status_host=STATUS_HOST):
     """
     Handles an individual client connection by parsing the request,
     determining the target backend, and forwarding the request.
@@ -125,62 +392,121 @@ def handle_client(ip, port, conn, addr, routes):
     matches the hostname against known routes. In the matching
     condition,it forwards the request to the appropriate backend.
 
-    The handler sends the backend response back to the client or
-    returns 404 if the hostname is unreachable or is not recognized.
+    The handler sends the backend response back to the client. It
+    returns 502 if the backend cannot be reached, 503 if every backend of
+    the host is down, and 404 if the hostname is not recognized.
+
+    A request is forwarded as soon as its head is read, its body relayed
+    as it arrives. The connection then stays open for the client's next
+    request (HTTP/1.1 keep-alive, HTTP/1.0 with ``Connection:
+    keep-alive``), including requests it already pipelined, until it idles
+    ``keepalive_timeout`` seconds or has sent ``max_keepalive_requests``.
 
     :params ip (str): IP address of the proxy server.
     :params port (int): port number of the proxy server.
     :params conn (socket.socket): client connection socket.
     :params addr (tuple): client address (IP, port).
     :params routes (dict): dictionary mapping hostnames and location.
+    :params keepalive_timeout (float): idle seconds before closing a
+                                       persistent client connection.
+    :params max_keepalive_requests (int): requests served per client connection.
+    :params status_host (str): host name answered by :func:`answer_status`,
+                               None to forward every host.
     """
 
-    #request = conn.recv(1024).decode()
-    #XUAN added code
-    request = b""
-    conn.settimeout(0.5)  # tránh treo khi client không gửi thêm
+    conn.settimeout(CLIENT_TIMEOUT)
+    request = None
+    served = 0
     try:
         while True:
-            chunk = conn.recv(4096)
-            if not chunk:
-                break
-            request += chunk
-    except socket.timeout:
-        pass
-    request = request.decode(errors="ignore")
-    #END XUAN added code
+            # Only the head is read here; the body is relayed while it arrives.
+            try:
+                request = ClientRequest.read(conn, request,
+                                             keepalive_timeout if served else None)
+            except ValueError as e:
+                print("[Proxy] Error: {}".format(e))
+                try:
+                    conn.sendall(b"HTTP/1.1 400 Bad Request\r\n"
+                                 b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+                except OSError:
+                    pass
+                return
+            except OSError as e:
+                print("Socket error: {}".format(e))
+                return
+            if request is None:
+                return
+
+            served += 1
+            keep_alive = None
+            if request.wants_keep_alive() and served < max_keepalive_requests:
+                keep_alive = b"Connection: keep-alive\r\nKeep-Alive: timeout=%d, max=%d\r\n" % (
+                    keepalive_timeout, max_keepalive_requests - served)
+            if not relay_request(port, conn, addr, routes, request, keep_alive, status_host):
+                return
+    finally:
+        if request is not None:
+            request.release()
+        conn.close()
+
+
+def relay_request(port, conn, addr, routes, request, keep_alive=None, status_host=STATUS_HOST):
+    """
+    Routes one client request to its backend by its Host header.
+
+    :params port (int): port number of the proxy server.
+    :params conn (socket.socket): client connection socket.
+    :params addr (tuple): client address (IP, port).
+    :params routes (dict): dictionary mapping hostnames and location.
+    :params request (ClientRequest): the request, head read.
+    :params keep_alive (bytes): header lines keeping the client connection
+                                open, None to close it.
+    :params status_host (str): host name answered by :func:`answer_status`,
+                               None to forward every host.
+
+    :rtype bool: True if the client connection can carry another request.
+    """
 
     # Extract hostname
-    hostname = None
-    for line in request.splitlines():
-        if line.lower().startswith('host:'):
-            hostname = line.split(':', 1)[1].strip()
-            if hostname:
-                parts = hostname.split(':')
-              
-                if len(parts) == 2:
-                    host_part = parts[0]
-                    port_part = parts[1]
-                    if port_part == str(port) or port_part == '80':
-                        hostname = host_part
-                
-                if hostname not in routes and f'{hostname}:{port}' in routes:
-                     hostname = f'{hostname}:{port}'
-         
-            break 
+    hostname = request.headers.get('host')
+    if hostname:
+        parts = hostname.split(':')
+
+        if len(parts) == 2:
+            host_part = parts[0]
+            port_part = parts[1]
+            if port_part == str(port) or port_part == '80':
+                hostname = host_part
+
+        if hostname not in routes and f'{hostname}:{port}' in routes:
+             hostname = f'{hostname}:{port}'
     if hostname is None:
-      
+
         print("[Proxy] Error: Missing Host header")
         response = b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n"
         conn.sendall(response)
-        conn.close()
-        return
+        return False
+
+    if status_host and hostname == status_host:
+        return answer_status(conn, addr, request, keep_alive)
 
     print("[Proxy] {} at Host: {}".format(addr, hostname))
 
     # Resolve the matching destination in routes and need conver port
     # to integer value
-    resolved_host, resolved_port = resolve_routing_policy(hostname, routes)
+    resolved_host, resolved_port, member = resolve_routing_policy(hostname, routes)
+    if resolved_host is None:
+        print("[Proxy] No healthy backend for host {}".format(hostname))
+        response = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            "Content-Type: text/plain\r\n"
+            "Content-Length: 19\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "Service Unavailable"
+        ).encode('utf-8')
+        conn.sendall(response)
+        return False
     try:
         resolved_port = int(resolved_port)
     except ValueError:
@@ -188,7 +514,11 @@ def handle_client(ip, port, conn, addr, routes):
 
     if resolved_host:
         print("[Proxy] Host name {} is forwarded to {}:{}".format(hostname,resolved_host, resolved_port))
-        response = forward_request(resolved_host, resolved_port, request)        
+        try:
+            return forward_request(resolved_host, resolved_port, request, conn, keep_alive)
+        finally:
+            if member is not None:
+                member.release()
     else:
         response = (
             "HTTP/1.1 404 Not Found\r\n"
@@ -198,10 +528,10 @@ def handle_client(ip, port, conn, addr, routes):
             "\r\n"
             "404 Not Found"
         ).encode('utf-8')
-    conn.sendall(response)
-    conn.close()
+        conn.sendall(response)
 
-def run_proxy(ip, port, routes):
+def run_proxy(ip, port, routes, keepalive_timeout=KEEPALIVE_TIMEOUT,
+              max_keepalive_requests=MAX_KEEPALIVE_REQUESTS, status_host=STATUS_HOST):
     """
     Starts the proxy server and listens for incoming connections. 
 
@@ -213,6 +543,11 @@ def run_proxy(ip, port, routes):
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params keepalive_timeout (float): idle seconds before closing a
+                                       persistent client connection.
+    :params max_keepalive_requests (int): requests served per client connection.
+    :params status_host (str): host name whose ``/proxy-status`` the proxy
+                               answers itself, None to forward every host.
 
     """
 
@@ -229,19 +564,50 @@ def run_proxy(ip, port, routes):
             #        provided handle_client routine
             #
             conn, addr = proxy.accept()
-            t = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes))
+            t = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes,
+                                                             keepalive_timeout,
+                                                             max_keepalive_requests,
+                                                             status_host))
             t.daemon = True
             t.start()
     except socket.error as e:
       print("Socket error: {}".format(e))
 
-def create_proxy(ip, port, routes):
+def create_proxy(ip, port, routes, upstream_max_idle=None, upstream_max_total=None,
+                 upstream_idle_timeout=None, health_checks=None,
+                 keepalive_timeout=None, max_keepalive_requests=None, status_host=STATUS_HOST):
     """
     Entry point for launching the proxy server.
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params upstream_max_idle (int, optional): idle connections kept per backend.
+    :params upstream_max_total (int, optional): connections open at once per backend.
+    :params upstream_idle_timeout (float, optional): seconds an idle backend
+                                                     connection is kept.
+    :params health_checks (dict, optional): host name to :class:`HealthCheck
+                                            <daemon.health.HealthCheck>`.
+    :params keepalive_timeout (float, optional): idle seconds before closing a
+                                                 persistent client connection.
+    :params max_keepalive_requests (int, optional): requests served per client
+                                                    connection.
+    :params status_host (str, optional): host name whose ``/proxy-status`` the
+                                         proxy answers itself instead of
+                                         forwarding, None or ``""`` to
+                                         forward every host.
+
+    :raises ValueError: If ``status_host`` is also a virtual host of ``routes``.
     """
 
-    run_proxy(ip, port, routes)
+    if status_host and status_host in routes:
+        raise ValueError("status host {!r} is also a virtual host".format(status_host))
+
+    upstreams.configure(max_idle=upstream_max_idle, max_total=upstream_max_total,
+                        idle_timeout=upstream_idle_timeout)
+    balancers.configure(routes)
+    health_checker.start(balancers, health_checks or {})
+    run_proxy(ip, port, routes,
+              KEEPALIVE_TIMEOUT if keepalive_timeout is None else keepalive_timeout,
+              MAX_KEEPALIVE_REQUESTS if max_keepalive_requests is None else max_keepalive_requests,
+              status_host or None)
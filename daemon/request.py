@@ -17,11 +17,19 @@ daemon.request
 This module provides a Request object to manage and persist 
 request settings (cookies, auth, proxies).
 """
+import urllib.parse
+from types import MappingProxyType
+
 from .dictionary import CaseInsensitiveDict
+from .router import compile_routes, normalize_path
+from .endpoints import bad_request
 from .session_store import get_user_from_session  # added import
 
 DEBUG = True  # set True only when debugging
 
+#: Read-only empty mapping shared by the requests not prepared yet.
+EMPTY = MappingProxyType({})
+
 class Request():
     """The fully mutable "class" `Request <Request>` object,
     containing the exact bytes that will be sent to the server.
@@ -38,20 +46,28 @@ class Request():
       >>> r = req.prepare(incoming_msg)
       >>> r
       <Request>
+
+    The attributes live in ``__slots__``. An :class:`HttpAdapter
+    <daemon.httpadapter.HttpAdapter>` keeps one instance per connection
+    and prepares it again for every keep-alive request; :meth:`prepare_parsed`
+    sets every field, so nothing leaks from one request to the next.
     """
-    __attrs__ = [
+    __slots__ = (
         "method",
         "url",
+        "path",
+        "version",
         "headers",
         "body",
-        "reason",
         "cookies",
-        "body",
         "routes",
         "hook",
+        "params",
+        "allow",
+        "query",
         "auth",    # added
         "user",    # added
-    ]
+    )
 
     def __init__(self):
         #: HTTP verb to send to the server.
@@ -61,15 +77,23 @@ class Request():
         #: dictionary of HTTP headers.
         self.headers = None
         #: HTTP path
-        self.path = None        
+        self.path = None
+        #: Protocol version, e.g. "HTTP/1.1"
+        self.version = None
         # The cookies set used to create Cookie header
         self.cookies = None
         #: request body to send to the server.
         self.body = None
         #: Routes
-        self.routes = {}
+        self.routes = None
         #: Hook point for routed mapped-path
         self.hook = None
+        #: Path parameters captured by the matched route
+        self.params = EMPTY
+        #: Methods allowed on the path when the method did not match (405)
+        self.allow = None
+        #: Query string arguments, as from urllib.parse.parse_qs
+        self.query = EMPTY
         # Authentication/user info (set by prepare if session cookie present)
         self.user = None
         self.auth = False
@@ -95,6 +119,8 @@ class Request():
                 print("[Request] Invalid request line format.")
                 return "GET", "/index.html", "HTTP/1.1"
 
+            # The query string is not part of the routed path.
+            path = path.split('?', 1)[0]
             if path == '/':
                 path = '/index.html'
 
@@ -119,7 +145,31 @@ class Request():
         """Prepares the entire request with the given parameters."""
 
         # Prepare the request line from the request header
-        self.method, self.path, self.version = self.extract_request_line(request)
+        method, path, version = self.extract_request_line(request)
+        headers = self.prepare_headers(request)
+        self.prepare_parsed(method, path, version, headers, b"", routes)
+        return
+
+    def prepare_parsed(self, method, path, version, headers, body, routes=None):
+        """Prepares the request from an already parsed request head.
+
+        :param method (str): HTTP verb.
+        :param path (str): request target, the query string is split off
+                           and the path normalized (see :func:`normalize_path
+                           <daemon.router.normalize_path>`).
+        :param version (str): protocol version.
+        :param headers (dict): header fields keyed by lower-case name.
+        :param body (memoryview or bytes): request body, kept without copying.
+        :param routes (dict): WeApRous route table.
+        """
+
+        self.url = path
+        path, _, query = path.partition('?')
+        # Routes and static files are looked up on the same decoded path;
+        # one with dot segments is refused rather than resolved.
+        normalized = normalize_path(path)
+        self.query = urllib.parse.parse_qs(query) if query else {}
+        self.method, self.path, self.version = method, normalized or path, version
         if DEBUG:
             print(f"[Request] {self.method} path {self.path} version {self.version}")
 
@@ -127,18 +177,26 @@ class Request():
         # @bksysnet Preapring the webapp hook with WeApRous instance
         # The default behaviour with HTTP server is empty routed
         #
-        # TODO manage the webapp hook in this mounting point
+        # The hook is the handler of the compiled route table
+        # (daemon.router), called by HttpAdapter.dispatch.
         #
-        
-        if not routes == {}:
-            self.routes = routes
-            self.hook = routes.get((self.method, self.path))
-            #
-            # self.hook manipulation goes here
-            # ...
-            #
-
-        self.headers = self.prepare_headers(request)
+        self.routes = routes
+        if normalized is None:
+            self.hook, self.params, self.allow = bad_request, {}, None
+        elif routes:
+            table = compile_routes(routes)
+            self.hook, self.params, self.allow = table.match(self.method, self.path)
+            # "/" is the index page unless a route claims it.
+            if self.hook is None and self.allow is None and self.path == '/':
+                self.path = '/index.html'
+                self.hook, self.params, self.allow = table.match(self.method, self.path)
+        else:
+            if self.path == '/':
+                self.path = '/index.html'
+            self.hook, self.params, self.allow = None, {}, None
+
+        self.headers = headers
+        self.body = body
         cookies = self.headers.get('cookie', '')
         #
         #  TODO: implement the cookie function here
@@ -176,6 +234,15 @@ class Request():
 
         return
 
+    def text(self):
+        """Returns the body decoded as UTF-8, or as latin-1 if it is not valid UTF-8."""
+        if not self.body:
+            return ""
+        try:
+            return str(self.body, "utf-8")
+        except UnicodeDecodeError:
+            return str(self.body, "latin-1")
+
     def prepare_body(self, body, files=None, json=None):
         # set body and content-length properly
         self.body = body
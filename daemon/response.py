@@ -18,15 +18,242 @@ This module provides a :class: `Response <Response>` object to manage and persis
 response settings (cookies, auth, proxies), and to construct HTTP responses
 based on incoming requests. 
 
-The current version supports MIME type detection, content loading and header formatting
+The current version supports MIME type detection, content loading and header formatting.
+Header blocks are assembled by :func:`build_head` from per-status,
+per-content-type byte templates and a ``Date`` line refreshed at most once
+per second.
 """
 import datetime
+import email.utils
 import os
 import mimetypes
+import time
 from .dictionary import CaseInsensitiveDict
+from .filecache import static_cache
+from .sockio import send_buffers
 
 BASE_DIR = ""
 
+#: Bytes read from a file per piece when its content is streamed.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+#: Static files of at least this size are sent with sendfile (zero-copy).
+SENDFILE_MIN_SIZE = 64 * 1024
+
+#: Ranges accepted in one ``Range`` header; a longer list is ignored.
+MAX_RANGES = 16
+
+
+class FileBody:
+    """A response body sent straight from a file.
+
+    :meth:`HttpAdapter.send_response` hands it to the connection's
+    ``sendfile`` so the kernel copies the file to the socket without the
+    bytes passing through Python. Iterating it reads the file in pieces,
+    the fallback for connections without ``sendfile``.
+
+    :attrs path (str): file to send.
+    :attrs offset (int): first byte to send.
+    :attrs count (int): number of bytes to send.
+    """
+
+    __slots__ = ("path", "offset", "count")
+
+    def __init__(self, path, offset=0, count=None):
+        self.path = path
+        self.offset = offset
+        if count is None:
+            count = os.path.getsize(path) - offset
+        self.count = count
+
+    def __iter__(self):
+        with open(self.path, 'rb') as fh:
+            fh.seek(self.offset)
+            left = self.count
+            while left > 0:
+                piece = fh.read(min(left, STREAM_CHUNK_SIZE))
+                if not piece:
+                    return
+                left -= len(piece)
+                yield piece
+
+
+class MultipartBody:
+    """A ``multipart/byteranges`` body made of several ranges of one file.
+
+    :attrs parts (list): the body in order, ``bytes`` for the boundaries and
+                         part headers, :class:`FileBody` or ``bytes`` for
+                         the ranges themselves.
+    :attrs count (int): total number of bytes.
+    :attrs boundary (str): multipart boundary, without the leading dashes.
+    """
+
+    __slots__ = ("parts", "count", "boundary")
+
+    def __init__(self, ranges, size, content_type, data):
+        """
+        :param ranges (list): ``(first, last)`` byte positions, inclusive.
+        :param size (int): complete length of the file.
+        :param content_type (str): ``Content-Type`` of every part.
+        :param data (callable): ``data(first, count)`` returns the bytes or
+                                the :class:`FileBody` of one range.
+        """
+        self.boundary = os.urandom(12).hex()
+        self.parts = []
+        for first, last in ranges:
+            self.parts.append((
+                "\r\n--{}\r\n"
+                "Content-Type: {}\r\n"
+                "Content-Range: bytes {}-{}/{}\r\n\r\n"
+            ).format(self.boundary, content_type, first, last, size).encode("latin-1"))
+            self.parts.append(data(first, last - first + 1))
+        self.parts.append("\r\n--{}--\r\n".format(self.boundary).encode("latin-1"))
+        self.count = sum(len(p) if isinstance(p, bytes) else p.count for p in self.parts)
+
+    @property
+    def content_type(self):
+        return "multipart/byteranges; boundary={}".format(self.boundary)
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part
+
+
+def parse_range(value, size, max_ranges=MAX_RANGES):
+    """
+    Parses a ``Range`` request header against a file of ``size`` bytes
+    (RFC 9110, section 14.1.2).
+
+    :param value (str): header value, e.g. ``"bytes=0-99,-500"``.
+    :param size (int): complete length of the representation.
+    :param max_ranges (int): more ranges than this are ignored as a whole.
+
+    :rtype list: the satisfiable ``(first, last)`` positions in request
+                 order, ``[]`` if none is satisfiable (answer ``416``), or
+                 None if the header must be ignored (answer ``200``): other
+                 unit, bad syntax or too many ranges.
+    """
+    unit, sep, specs = value.partition("=")
+    if not sep or unit.strip().lower() != "bytes":
+        return None
+    specs = [spec.strip() for spec in specs.split(",") if spec.strip()]
+    if not specs or len(specs) > max_ranges:
+        return None
+
+    ranges = []
+    for spec in specs:
+        first, sep, last = spec.partition("-")
+        first, last = first.strip(), last.strip()
+        if not sep or not (first.isdigit() or first == "") or not (last.isdigit() or last == ""):
+            return None
+        if first == "":
+            if last == "":
+                return None
+            suffix = int(last)
+            if suffix > 0 and size > 0:
+                ranges.append((max(0, size - suffix), size - 1))
+            continue
+        first = int(first)
+        if last != "" and int(last) < first:
+            return None
+        if first < size:
+            ranges.append((first, size - 1 if last == "" else min(int(last), size - 1)))
+    return ranges
+
+
+#: Header templates kept by :func:`head_template`; further combinations
+#: are built on every call instead of growing the table.
+MAX_TEMPLATES = 256
+
+#: Headers computed by :func:`build_head` itself, dropped from the handler's.
+_COMPUTED = frozenset(("content-type", "content-length", "transfer-encoding",
+                       "date", "connection", "keep-alive"))
+
+_templates = {}
+_date = (0, b"")
+
+
+def date_line():
+    """
+    Returns the ``Date`` header line of the current second. It is formatted
+    once per second and shared by every response sent within it.
+
+    :rtype bytes: ``b"Date: <IMF-fixdate>\\r\\n"``.
+    """
+    global _date
+    now = int(time.time())
+    cached = _date
+    if cached[0] != now:
+        line = "Date: {}\r\n".format(email.utils.formatdate(now, usegmt=True))
+        cached = _date = (now, line.encode("latin-1"))
+    return cached[1]
+
+
+def head_template(status, content_type=None):
+    """
+    Returns the status line and ``Content-Type`` of a response as bytes,
+    built once per ``(status, content_type)``.
+
+    :param status (str): status code and reason, e.g. ``"200 OK"``.
+    :param content_type (str): ``Content-Type`` value, None for none.
+
+    :rtype bytes: the first lines of the header block.
+    """
+    key = (status, content_type)
+    template = _templates.get(key)
+    if template is None:
+        text = "HTTP/1.1 {}\r\n".format(status)
+        if content_type is not None:
+            text += "Content-Type: {}\r\n".format(content_type)
+        template = text.encode("utf-8")
+        if len(_templates) < MAX_TEMPLATES:
+            _templates[key] = template
+    return template
+
+
+def build_head(status, headers, length=None, chunked=False, tail=b""):
+    """
+    Assembles the header block of a response.
+
+    ``Content-Type`` comes from ``headers``; ``Content-Length``,
+    ``Transfer-Encoding``, ``Date`` and the connection headers are the
+    caller's and the function's business, so their ``headers`` entries are
+    ignored. The other entries are copied as they are.
+
+    :param status (str): status code and reason, e.g. ``"200 OK"``.
+    :param headers (dict): response headers of the handler.
+    :param length (int): ``Content-Length``, None to leave it out.
+    :param chunked (bool): add ``Transfer-Encoding: chunked``.
+    :param tail (bytes): preformatted lines added last, e.g. ``Connection``.
+
+    :rtype bytes: the header block, blank line included.
+    """
+    content_type = None
+    text = ""
+    for key, value in headers.items():
+        name = key.lower()
+        if name in _COMPUTED:
+            if name == "content-type":
+                content_type = value
+            continue
+        text += "%s: %s\r\n" % (key, value)
+
+    # Both lookups inlined: they are the common case of every response.
+    head = _templates.get((status, content_type)) or head_template(status, content_type)
+    date = _date
+    head += date[1] if date[0] == int(time.time()) else date_line()
+    if text:
+        head += text.encode("utf-8")
+    if length is not None:
+        head += b"Content-Length: %d\r\n" % length
+    if chunked:
+        head += b"Transfer-Encoding: chunked\r\n"
+    return head + tail + b"\r\n"
+
+
 class Response():   
     """The :class:`Response <Response>` object, which contains a
     server's response to an HTTP request.
@@ -54,38 +281,36 @@ class Response():
       >>> import Response
       >>> resp = Response()
       >>> resp.build_response(req)
+      >>> resp.send(conn, req)
       >>> resp
       <Response>
     """
 
-    __attrs__ = [
+    __slots__ = (
         "_content",
         "_header",
         "status_code",
-        "method",
         "headers",
         "url",
-        "history",
         "encoding",
         "reason",
-        "cookies",
-        "elapsed",
         "request",
-        "body",
-        "reason",
-    ]
+        "_cookies",
+        "_history",
+        "_elapsed",
+    )
 
 
     def __init__(self, request=None):
         """
-        Initializes a new :class:`Response <Response>` object.
+        Initializes a new :class:`Response <Response>` object. The
+        cookies, history and elapsed time are only created when first used.
 
         : params request : The originating request object.
         """
 
         self._content = False
-        self._content_consumed = False
-        self._next = None
+        self._header = None
 
         #: Integer Code of responded HTTP Status, e.g. 404 or 200.
         self.status_code = None
@@ -101,23 +326,53 @@ class Response():
         #: Encoding to decode with when accessing response text.
         self.encoding = None
 
-        #: A list of :class:`Response <Response>` objects from
-        #: the history of the Request.
-        self.history = []
-
         #: Textual reason of responded HTTP Status, e.g. "Not Found" or "OK".
         self.reason = None
 
-        #: A of Cookies the response headers.
-        self.cookies = CaseInsensitiveDict()
-
-        #: The amount of time elapsed between sending the request
-        self.elapsed = datetime.timedelta(0)
-
         #: The :class:`PreparedRequest <PreparedRequest>` object to which this
         #: is a response.
         self.request = None
 
+        self._cookies = None
+        self._history = None
+        self._elapsed = None
+
+
+    @property
+    def cookies(self):
+        """A of Cookies the response headers (:class:`CaseInsensitiveDict`)."""
+        if self._cookies is None:
+            self._cookies = CaseInsensitiveDict()
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, value):
+        self._cookies = value
+
+    @property
+    def history(self):
+        """A list of :class:`Response <Response>` objects from
+        the history of the Request."""
+        if self._history is None:
+            self._history = []
+        return self._history
+
+    @history.setter
+    def history(self, value):
+        self._history = value
+
+    @property
+    def elapsed(self):
+        """The amount of time elapsed between sending the request
+        (:class:`datetime.timedelta`)."""
+        if self._elapsed is None:
+            self._elapsed = datetime.timedelta(0)
+        return self._elapsed
+
+    @elapsed.setter
+    def elapsed(self, value):
+        self._elapsed = value
+
 
     def get_mime_type(self, path):
         """
@@ -189,7 +444,8 @@ class Response():
 
     def build_content(self, path, base_dir):
         """
-        Loads the objects file from storage space.
+        Loads the objects file from storage space, through the shared
+        :data:`static_cache <daemon.filecache.static_cache>`.
 
         :params path (str): relative path to the file.
         :params base_dir (str): base directory where the file is located.
@@ -205,8 +461,12 @@ class Response():
             #        store in the return value of content
             #
         try:
-            with open(filepath, 'rb') as fh:
-                content = fh.read()
+            entry = static_cache.get(filepath, self.headers.get('Content-Type', 'application/octet-stream'))
+            content = entry.content
+            if content is None:
+                with open(filepath, 'rb') as fh:
+                    content = fh.read()
+            self.headers.update(entry.validators)
         except FileNotFoundError:
             # Not found -> return simple 404 body
             body = b"404 Not Found"
@@ -219,79 +479,64 @@ class Response():
         return len(content), content
 
 
+    def stream_content(self, path, base_dir, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Opens the object file for streaming instead of loading it.
+
+        :params path (str): relative path to the file.
+        :params base_dir (str): base directory where the file is located.
+        :params chunk_size (int): bytes read per piece.
+
+        :rtype tuple: (int, generator) content length and a generator of
+                      its pieces; the file is closed when it is exhausted
+                      or closed.
+
+        :raises OSError: If the file cannot be opened.
+        """
+        filepath = os.path.join(base_dir, path.lstrip('/'))
+        print("[Response] streaming the object at location {}".format(filepath))
+
+        fh = open(filepath, 'rb')
+        size = os.fstat(fh.fileno()).st_size
+
+        def pieces():
+            with fh:
+                while True:
+                    piece = fh.read(chunk_size)
+                    if not piece:
+                        return
+                    yield piece
+
+        return size, pieces()
+
+
     def build_response_header(self, request):
         """
         Constructs the HTTP response headers based on the class:`Request <Request>
-        and internal attributes.
+        and internal attributes, with :func:`build_head`: ``Content-Type``,
+        ``Content-Length``, ``Cache-Control`` (``no-cache`` unless set),
+        ``Date``, the other headers in :attr:`headers` and one
+        ``Set-Cookie`` line per cookie.
 
         :params request (class:`Request <Request>`): incoming request object.
 
         :rtypes bytes: encoded HTTP response header.
         """
-        reqhdr = request.headers
-        rsphdr = self.headers
-
-        #Build dynamic headers
-        headers = {
-                "Accept": "{}".format(reqhdr.get("Accept", "application/json")),
-                "Accept-Language": "{}".format(reqhdr.get("Accept-Language", "en-US,en;q=0.9")),
-                "Authorization": "{}".format(reqhdr.get("Authorization", "Basic <credentials>")),
-                "Cache-Control": "no-cache",
-                "Content-Type": "{}".format(self.headers.get('Content-Type', 'application/octet-stream')),
-                "Content-Length": "{}".format(len(self._content) if self._content is not False else 0),
-                #                "Cookie": "{}".format(reqhdr.get("Cookie", "sessionid=xyz789")), #dummy cooki
-        #
-        # TODO prepare the request authentication
-        #
-	# self.auth = ...
-                "Date": "{}".format(datetime.datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")),
-                "Max-Forward": "10",
-                "Pragma": "no-cache",
-                "Proxy-Authorization": "Basic dXNlcjpwYXNz",
-                "Warning": "199 Miscellaneous warning",
-                "User-Agent": "{}".format(reqhdr.get("User-Agent", "Chrome/123.0.0.0")),
-            }
-            # Header text alignment
-            #
-            #  TODO: implement the header building to create formated
-            #        header from the provied headers
-            #
-        #
-        # TODO prepare the request authentication
-        #
-	# self.auth = ...
-
-        # Allow any additional response headers already present in self.headers
-        for k, v in rsphdr.items():
-            # avoid overwriting the dynamic fields set above except when absent
-            if k not in headers:
-                headers[k] = v
-
-        # Prepare Set-Cookie headers from self.cookies (dict-like)
-        cookie_lines = []
-        if self.cookies:
-            try:
-                items = self.cookies.items()
-            except Exception:
-                items = []
-            for k, v in items:
-                # Basic Set-Cookie format; caller can extend (Expires, Secure, SameSite...)
-                cookie_lines.append(f"Set-Cookie: {k}={v}; Path=/; HttpOnly")
-
-        # Status line
+        headers = dict(self.headers)
+        headers.setdefault("Content-Type", "application/octet-stream")
+        if "cache-control" not in (key.lower() for key in headers):
+            headers["Cache-Control"] = "no-cache"
+
+        cookies = b""
+        if self._cookies:
+            # Basic Set-Cookie format; caller can extend (Expires, Secure, SameSite...)
+            cookies = "".join("Set-Cookie: {}={}; Path=/; HttpOnly\r\n".format(k, v)
+                              for k, v in self.cookies.items()).encode("utf-8")
+
         status = self.status_code or 200
         reason = self.reason or ("OK" if status == 200 else "")
-
-        fmt_header = f"HTTP/1.1 {status} {reason}\r\n"
-        for key, value in headers.items():
-            fmt_header += f"{key}: {value}\r\n"
-        # add cookie headers
-        for line in cookie_lines:
-            fmt_header += line + "\r\n"
-        # end of headers
-        fmt_header += "\r\n"
-#end todo Xuan
-        return fmt_header.encode('utf-8')
+        length = len(self._content) if self._content is not False else 0
+        return build_head("{} {}".format(status, reason), headers, length, tail=cookies)
 
 
     def build_notfound(self):
@@ -301,16 +546,9 @@ class Response():
         :rtype bytes: Encoded 404 response.
         """
 
-        return (
-                "HTTP/1.1 404 Not Found\r\n"
-                "Accept-Ranges: bytes\r\n"
-                "Content-Type: text/html\r\n"
-                "Content-Length: 13\r\n"
-                "Cache-Control: max-age=86000\r\n"
-                "Connection: close\r\n"
-                "\r\n"
-                "404 Not Found"
-            ).encode('utf-8')
+        body = b"404 Not Found"
+        return build_head("404 Not Found", {"Content-Type": "text/html"}, len(body),
+                          tail=b"Connection: close\r\n") + body
 
 
     def build_response(self, request):
@@ -321,6 +559,33 @@ class Response():
 
         :rtype bytes: complete HTTP response using prepared headers and content.
         """
+        return b"".join(self.build_buffers(request))
+
+
+    def send(self, conn, request):
+        """
+        Builds the response to ``request`` and writes it to ``conn`` with
+        :func:`send_buffers <daemon.sockio.send_buffers>`: header block and
+        content leave in one call, the content is not copied behind the header.
+
+        :params conn (socket.socket): connection the response is written to.
+        :params request (class:`Request <Request>`): incoming request object.
+
+        :rtype int: number of bytes written.
+        """
+        return send_buffers(conn, self.build_buffers(request))
+
+
+    def build_buffers(self, request):
+        """
+        Builds the header block and the content of the response to ``request``
+        as separate buffers.
+
+        :params request (class:`Request <Request>`): incoming request object.
+
+        :rtype tuple: ``(header, content)`` bytes, or a single complete
+                      response for a type that is not served.
+        """
 
         path = request.path
 
@@ -338,7 +603,7 @@ class Response():
         # TODO: add support objects
         #
         else:
-            return self.build_notfound()
+            return (self.build_notfound(),)
 
         # For testing: set a session cookie when serving index.html (browser will send it back)
         # Store in self.cookies so build_response_header() emits Set-Cookie lines.
@@ -349,6 +614,6 @@ class Response():
         c_len, self._content = self.build_content(path, base_dir)
         self._header = self.build_response_header(request)
 
-        return self._header + self._content
+        return self._header, self._content
     
     
\ No newline at end of file
@@ -0,0 +1,399 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.router
+~~~~~~~~~~~~~~~~~
+
+This module builds the dispatch table of the backend. The built-in endpoints
+of :mod:`daemon.endpoints` and the routes registered with
+:class:`WeApRous <WeApRous>` end up in one dict keyed by ``(method, path)``,
+so finding the handler of a request is a single lookup. Every entry is a
+callable taking the prepared :class:`Request <Request>` and returning
+``(status, headers, body)``.
+
+Paths may contain parameters and wildcards::
+
+  /peers/<name>            one segment, as str
+  /items/<int:id>          one segment, converted with int()
+  /static/<path:file>      the rest of the path, slashes included
+  /files/*                 the rest of the path, as params["*"]
+
+Exact paths stay in the dict. Patterns are compiled into a tree of path
+segments, so matching walks the segments of the request path once and its
+cost does not grow with the number of routes. Every tree node knows the
+methods registered on it, so a path that exists under another method is told
+apart from an unknown path (``405`` vs ``404``) without a second search.
+
+WeApRous route functions keep their own signature: they are wrapped once, at
+startup, according to the number of parameters they declare, and whatever
+they return is turned into a response tuple by :func:`to_response`.
+
+Usage Example:
+--------------
+>>> table = compile_routes(app.routes)
+>>> handler, params, allow = table.match("GET", "/peers/alice")
+>>> status, headers, body = handler(req)
+
+"""
+
+import http
+import inspect
+import json
+import re
+import urllib.parse
+
+from .endpoints import BUILTIN_ROUTES
+
+
+#: Converters of the ``<type:name>`` path parameters.
+CONVERTERS = {
+    "str": str,
+    "int": int,
+}
+
+
+def parse_pattern(path):
+    """
+    Splits a route path into its segments.
+
+    Each segment is ``("static", text)``, ``("param", converter, name)`` or
+    ``("path", name)``; a ``path`` segment must be the last one.
+
+    :param path (str): route path, e.g. ``"/peers/<name>"``.
+
+    :rtype list: the parsed segments.
+
+    :raises ValueError: If the path is malformed or uses an unknown type.
+    """
+    if not path.startswith("/"):
+        raise ValueError("route path must start with '/': {!r}".format(path))
+    segments = []
+    parts = path[1:].split("/")
+    for i, part in enumerate(parts):
+        last = i == len(parts) - 1
+        if part == "*":
+            if not last:
+                raise ValueError("'*' must end the route path: {!r}".format(path))
+            segments.append(("path", "*"))
+        elif part.startswith("<") and part.endswith(">"):
+            kind, sep, name = part[1:-1].rpartition(":")
+            kind = kind if sep else "str"
+            if not name.isidentifier():
+                raise ValueError("invalid parameter name in {!r}".format(path))
+            if kind == "path":
+                if not last:
+                    raise ValueError("<path:...> must end the route path: {!r}".format(path))
+                segments.append(("path", name))
+            elif kind in CONVERTERS:
+                segments.append(("param", CONVERTERS[kind], name))
+            else:
+                raise ValueError("unknown parameter type {!r} in {!r}".format(kind, path))
+        elif "<" in part or ">" in part:
+            raise ValueError("malformed parameter in {!r}".format(path))
+        else:
+            segments.append(("static", part))
+    return segments
+
+
+def normalize_path(path):
+    """
+    Decodes a request path and collapses repeated slashes, so that route
+    matching and the static fallback see the same path.
+
+    :param path (str): request path without the query string, as sent.
+
+    :rtype str: the normalized path, or None if it does not start with
+                ``/`` or holds a ``.`` or ``..`` segment (encoded or not);
+                such a request is answered with ``400``.
+    """
+    path = urllib.parse.unquote(path)
+    if not path.startswith("/"):
+        return None
+    if "//" in path:
+        path = re.sub("/{2,}", "/", path)
+    if "/." in path:
+        segments = path.split("/")
+        if "." in segments or ".." in segments:
+            return None
+    return path
+
+
+def is_pattern(path):
+    """True if ``path`` has parameters or wildcards."""
+    return "<" in path or path.endswith("/*")
+
+
+class _Node:
+    """One segment position of the route tree."""
+
+    __slots__ = ("static", "params", "catch_all", "handlers", "allow")
+
+    def __init__(self):
+        #: exact segment -> child node
+        self.static = {}
+        #: [(converter, name, child)], ``int`` before ``str``
+        self.params = []
+        #: (name, child) of a ``<path:...>`` or ``*`` tail
+        self.catch_all = None
+        #: method -> handler of the routes ending here
+        self.handlers = {}
+        #: ``Allow`` header value, filled in by :meth:`freeze`
+        self.allow = None
+
+    def insert(self, segments, method, handler, path):
+        node = self
+        for seg in segments:
+            if seg[0] == "static":
+                node = node.static.setdefault(seg[1], _Node())
+            elif seg[0] == "param":
+                conv, name = seg[1], seg[2]
+                for other_conv, other_name, child in node.params:
+                    if other_conv is conv:
+                        if other_name != name:
+                            raise ValueError("conflicting parameter names {!r} and {!r} in {!r}"
+                                             .format(other_name, name, path))
+                        node = child
+                        break
+                else:
+                    child = _Node()
+                    node.params.append((conv, name, child))
+                    node.params.sort(key=lambda p: p[0] is str)
+                    node = child
+            else:
+                name = seg[1]
+                if node.catch_all is None:
+                    node.catch_all = (name, _Node())
+                elif node.catch_all[0] != name:
+                    raise ValueError("conflicting parameter names {!r} and {!r} in {!r}"
+                                     .format(node.catch_all[0], name, path))
+                node = node.catch_all[1]
+        node.handlers[method] = handler
+
+    def freeze(self):
+        if self.handlers:
+            self.allow = ", ".join(sorted(self.handlers))
+        for child in self.static.values():
+            child.freeze()
+        for _, _, child in self.params:
+            child.freeze()
+        if self.catch_all is not None:
+            self.catch_all[1].freeze()
+
+    def find(self, segments, i, params):
+        """Depth-first match, static segments before parameters before tails."""
+        if i == len(segments):
+            if self.handlers:
+                return self
+        else:
+            seg = segments[i]
+            child = self.static.get(seg)
+            if child is not None:
+                found = child.find(segments, i + 1, params)
+                if found is not None:
+                    return found
+            if seg:
+                for conv, name, child in self.params:
+                    try:
+                        params[name] = conv(seg)
+                    except ValueError:
+                        continue
+                    found = child.find(segments, i + 1, params)
+                    if found is not None:
+                        return found
+                    del params[name]
+        if self.catch_all is not None and i < len(segments):
+            name, child = self.catch_all
+            if child.handlers:
+                params[name] = "/".join(segments[i:])
+                return child
+        return None
+
+
+class RouteTable(dict):
+    """``(method, path) -> handler`` mapping produced by :func:`compile_routes`.
+
+    The dict holds the routes with exact paths; :attr:`tree` holds all
+    routes, patterns included, for :meth:`match`.
+
+    :attrs app_routes (dict): the WeApRous routes it was compiled from.
+    :attrs tree (_Node): root of the route tree.
+    """
+
+    def __init__(self, entries, app_routes):
+        super().__init__()
+        self.app_routes = app_routes
+        self.tree = _Node()
+        for (method, path), handler in entries.items():
+            if not is_pattern(path):
+                self[(method, path)] = handler
+            self.tree.insert(parse_pattern(path), method, handler, path)
+        self.tree.freeze()
+        #: True if at least one handler streams its request body.
+        self.has_streams = any(getattr(h, "stream", False) for h in entries.values())
+
+    def streams(self, method, target):
+        """
+        Tells the parser whether the body of a request goes to a streaming
+        handler (see :class:`BodyStream <daemon.httpparser.BodyStream>`).
+
+        :param method (str): HTTP verb.
+        :param target (str): request target, query string included.
+
+        :rtype bool: True if the matched handler streams its body.
+        """
+        if not self.has_streams:
+            return False
+        path = normalize_path(target.split("?", 1)[0])
+        if path is None:
+            return False
+        handler = self.match(method, path)[0]
+        return getattr(handler, "stream", False)
+
+    def match(self, method, path):
+        """
+        Finds the handler of a request.
+
+        :param method (str): HTTP verb.
+        :param path (str): request path without the query string.
+
+        :rtype tuple: ``(handler, params, allow)``. ``handler`` is None if
+            nothing matches; ``allow`` is then the ``Allow`` header value if
+            the path exists under other methods (405), else None (404).
+        """
+        handler = self.get((method, path))
+        if handler is not None:
+            return handler, {}, None
+        params = {}
+        node = self.tree.find(path[1:].split("/"), 0, params)
+        if node is None:
+            return None, {}, None
+        handler = node.handlers.get(method)
+        if handler is None:
+            return None, {}, node.allow
+        return handler, params, None
+
+
+def status_line(status):
+    """
+    Returns the status as ``"<code> <reason>"``.
+
+    :param status (int or str): ``404`` or ``"404 Not Found"``.
+
+    :rtype str: the status line without the protocol version.
+    """
+    if isinstance(status, int):
+        try:
+            return "{} {}".format(status, http.HTTPStatus(status).phrase)
+        except ValueError:
+            return str(status)
+    return status
+
+
+def to_response(result):
+    """
+    Converts the return value of a WeApRous handler to ``(status, headers, body)``.
+
+    - a 3-tuple is taken as ``(status, headers, body)``;
+    - a dict or list is sent as JSON;
+    - str and bytes are sent as HTML and ``application/octet-stream``;
+    - a generator or other iterator is streamed, piece by piece, as
+      ``application/octet-stream``;
+    - None is an empty ``200 OK``.
+
+    :rtype tuple: ``(status, headers, body)``.
+    """
+    if isinstance(result, tuple) and len(result) == 3:
+        status, headers, body = result
+        return status_line(status), dict(headers or {}), body
+    if result is None:
+        return "200 OK", {"Content-Type": "text/plain"}, b""
+    if isinstance(result, (dict, list)):
+        return "200 OK", {"Content-Type": "application/json"}, json.dumps(result)
+    if isinstance(result, (bytes, bytearray, memoryview)):
+        return "200 OK", {"Content-Type": "application/octet-stream"}, bytes(result)
+    if hasattr(result, "__next__"):
+        return "200 OK", {"Content-Type": "application/octet-stream"}, result
+    return "200 OK", {"Content-Type": "text/html"}, str(result)
+
+
+def _arity(func, names=()):
+    try:
+        params = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return 2
+    kinds = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    if any(p.kind == inspect.Parameter.VAR_POSITIONAL for p in params):
+        return 2
+    return sum(1 for p in params if p.kind in kinds and p.name not in names)
+
+
+def _param_names(path):
+    return [seg[-1] for seg in parse_pattern(path) if seg[0] != "static"]
+
+
+def wrap_hook(func, names=()):
+    """
+    Adapts a WeApRous route function to the table handler convention.
+
+    ``func(headers, body)`` receives the request headers and the decoded
+    body, ``func(body)`` only the body and ``func()`` nothing. The path
+    parameters of the route are passed as keyword arguments, so they do not
+    count as positional parameters. A route registered with ``stream=True``
+    gets the :class:`BodyStream <daemon.httpparser.BodyStream>` as body
+    instead of the decoded text.
+
+    :param func (callable): function registered with :meth:`WeApRous.route`.
+    :param names (iterable): path parameter names of the route.
+
+    :rtype callable: ``handler(req) -> (status, headers, body)``.
+    """
+    nargs = _arity(func, names)
+    stream = getattr(func, "_route_stream", False)
+
+    def body(req):
+        return req.body if stream else req.text()
+
+    if nargs >= 2:
+        def handler(req):
+            return to_response(func(req.headers, body(req), **req.params))
+    elif nargs == 1:
+        def handler(req):
+            return to_response(func(body(req), **req.params))
+    else:
+        def handler(req):
+            return to_response(func(**req.params))
+    handler.__wrapped__ = func
+    handler.stream = stream
+    handler.__name__ = getattr(func, "__name__", "handler")
+    return handler
+
+
+def compile_routes(routes=None):
+    """
+    Builds the dispatch table from the built-in endpoints and ``routes``.
+    A WeApRous route overrides the built-in endpoint with the same key.
+    Compiling an already compiled table returns it unchanged.
+
+    :param routes (dict): WeApRous routes keyed by ``(method, path)``.
+
+    :rtype RouteTable: the dispatch table.
+
+    :raises ValueError: If a route path is malformed.
+    """
+    if isinstance(routes, RouteTable):
+        return routes
+    routes = routes or {}
+    table = dict(BUILTIN_ROUTES)
+    for (method, path), func in routes.items():
+        table[(method.upper(), path)] = wrap_hook(func, _param_names(path))
+    return RouteTable(table, routes)
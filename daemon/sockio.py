@@ -0,0 +1,77 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.sockio
+~~~~~~~~~~~~~~~~~
+
+This module provides the response writing layer of the backend.
+:func:`send_buffers` writes a list of buffers (header block, body, chunk
+framing) with one ``sendmsg`` scatter/gather call instead of gluing them
+together first, so a large body is never copied just to put its header in
+front of it.
+
+``sendmsg`` may accept only part of the data. The buffers are then resumed
+exactly where the kernel stopped, through a :class:`memoryview` of the
+first unsent one, still without copying.
+
+Connections without ``sendmsg`` (sockets on Windows, plain test doubles)
+get the buffers one by one with ``sendall``. The asyncio sinks
+implement ``sendmsg`` themselves on top of ``StreamWriter.writelines``.
+
+Usage::
+
+  >>> send_buffers(conn, [head, body])
+  1852
+"""
+
+#: Buffers passed to one ``sendmsg`` call; Linux rejects more than
+#: ``IOV_MAX`` (1024) with ``EMSGSIZE``.
+MAX_IOVEC = 1024
+
+
+def send_buffers(conn, buffers):
+    """
+    Writes ``buffers`` to ``conn`` in order, as if they were one byte string.
+
+    :param conn (socket.socket): connection (or sink) the bytes are written to.
+    :param buffers (iterable): ``bytes``, ``bytearray`` or ``memoryview``
+                               objects; empty ones are skipped.
+
+    :rtype int: number of bytes written.
+    """
+    pending = [buf for buf in buffers if len(buf)]
+    if not pending:
+        return 0
+    total = sum(len(buf) for buf in pending)
+
+    sendmsg = getattr(conn, "sendmsg", None)
+    if sendmsg is None:
+        for buf in pending:
+            conn.sendall(buf)
+        return total
+    if len(pending) == 1:
+        conn.sendall(pending[0])
+        return total
+
+    first = 0
+    while first < len(pending):
+        sent = sendmsg(pending[first:first + MAX_IOVEC])
+        # Drop the buffers written completely, cut into the next one.
+        while sent:
+            size = len(pending[first])
+            if sent < size:
+                pending[first] = memoryview(pending[first])[sent:]
+                break
+            sent -= size
+            first += 1
+    return total
@@ -0,0 +1,130 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.supervisor
+~~~~~~~~~~~~~~~~~
+
+This module provides the pre-fork mode of the backend daemon. A supervisor
+process starts N worker processes, each running its own
+:func:`create_backend <daemon.backend.create_backend>` on the same port with
+``SO_REUSEPORT``, so the kernel spreads incoming connections across them and
+every worker has its own GIL. Workers that die are restarted.
+
+Requirements:
+--------------
+- multiprocessing: worker processes.
+- socket: ``SO_REUSEPORT`` availability check.
+- signal: clean shutdown of the workers on SIGTERM, SIGHUP forwarded to them.
+
+Usage Example:
+--------------
+>>> run_workers(4, "0.0.0.0", 9000, routes={}, pool_size=32)
+
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+from .backend import create_backend
+
+#: A worker exiting sooner than this (seconds) after its start is restarted
+#: only after :data:`RESTART_DELAY`, so a failing worker cannot fork-loop.
+MIN_UPTIME = 1.0
+
+#: Seconds to wait before restarting a worker that died right after starting.
+RESTART_DELAY = 1.0
+
+#: Seconds between two liveness checks of the workers.
+CHECK_INTERVAL = 0.5
+
+
+def _context():
+    """Prefers ``fork`` so route handlers need not be picklable."""
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        return multiprocessing.get_context()
+
+
+def _spawn(ctx, index, ip, port, routes, options):
+    worker = ctx.Process(
+        target=create_backend,
+        args=(ip, port, routes),
+        kwargs=options,
+        name="backend-worker-{}".format(index),
+        daemon=False
+    )
+    worker.start()
+    print("[Supervisor] worker {} started pid={}".format(index, worker.pid))
+    return worker, time.monotonic()
+
+
+def run_workers(workers, ip, port, routes={}, **options):
+    """
+    Runs ``workers`` backend processes on the same address and keeps them
+    alive until the supervisor is interrupted or receives SIGTERM.
+
+    :param workers (int): number of worker processes.
+    :param ip (str): IP address to bind the servers.
+    :param port (int): Port number shared by all workers.
+    :param routes (dict): Dictionary of route handlers.
+    :param options: further keyword arguments of :func:`create_backend`.
+
+    :raises RuntimeError: If the platform has no ``SO_REUSEPORT``.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("SO_REUSEPORT is not available on this platform")
+
+    options = dict(options, reuse_port=True)
+    ctx = _context()
+
+    def _terminate(signum, frame):
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, _terminate)
+
+    procs = [_spawn(ctx, i, ip, port, routes, options) for i in range(workers)]
+
+    def _rescan(signum, frame):
+        for proc, _ in procs:
+            if proc.is_alive():
+                os.kill(proc.pid, signal.SIGHUP)
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _rescan)
+    print("[Supervisor] {} workers on port {}".format(workers, port))
+
+    try:
+        while True:
+            time.sleep(CHECK_INTERVAL)
+            for i, (proc, started) in enumerate(procs):
+                if proc.is_alive():
+                    continue
+                print("[Supervisor] worker {} pid={} exited with code {}".format(
+                    i, proc.pid, proc.exitcode))
+                if time.monotonic() - started < MIN_UPTIME:
+                    time.sleep(RESTART_DELAY)
+                procs[i] = _spawn(ctx, i, ip, port, routes, options)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc, _ in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for proc, _ in procs:
+            proc.join(timeout=5)
+        print("[Supervisor] stopped")
@@ -0,0 +1,562 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.upstream
+~~~~~~~~~~~~~~~~~
+
+This module provides the persistent HTTP/1.1 connections of the proxy to
+its backends. :class:`UpstreamPool` keeps, per ``(host, port)``, the idle
+connections of earlier requests so the next request to the same backend
+skips the TCP handshake:
+
+- at most :attr:`UpstreamPool.max_idle` idle connections are kept per
+  backend, and at most :attr:`UpstreamPool.max_total` are open at once,
+  idle or busy; a request beyond that waits for one to be returned;
+- an idle connection is closed after :attr:`UpstreamPool.idle_timeout`
+  seconds, or earlier if the backend's ``Keep-Alive: timeout=`` says so;
+- before reuse, an idle connection with pending input (the backend closed
+  it, or sent something unexpected) is dropped as stale.
+
+Requests and responses are relayed as they arrive, byte for byte, through
+one pooled buffer per exchange (:meth:`UpstreamConnection.relay`). The end
+of each body is found from its framing (:class:`Framing`),
+``Content-Length`` or ``Transfer-Encoding: chunked``, not from the peer
+closing the connection; only a response with neither is relayed up to
+EOF, and its connection is not reused. A request that fails on a reused
+connection before any byte of the response arrived is retried once on a
+new one, if its whole body is still at hand.
+
+All proxy threads share the module-level :data:`upstreams`.
+
+Usage::
+
+  >>> conn = upstreams.acquire("127.0.0.1", 9000)
+  >>> reusable = conn.relay(request, client)
+  >>> upstreams.release(conn, reusable)
+"""
+
+import select
+import socket
+import threading
+import time
+
+from .bufferpool import buffers
+from .httpparser import READ_SIZE, MAX_CHUNK_LINE
+from .sockio import send_buffers
+
+#: Idle connections kept per backend.
+DEFAULT_MAX_IDLE = 8
+
+#: Connections open at once per backend, idle or busy.
+DEFAULT_MAX_TOTAL = 32
+
+#: Seconds an idle connection is kept; below the backend's own keep-alive
+#: timeout (5 s) so the proxy closes first.
+DEFAULT_IDLE_TIMEOUT = 4.0
+
+#: Seconds to establish a connection to a backend.
+CONNECT_TIMEOUT = 5.0
+
+#: Seconds a backend may stay silent while answering.
+READ_TIMEOUT = 30.0
+
+#: Connection-level headers, not forwarded from one hop to the next.
+HOP_BY_HOP = ("connection", "keep-alive", "proxy-connection")
+
+#: :class:`Framing` states of a chunked body.
+CHUNK_SIZE, CHUNK_DATA, CHUNK_TRAILER = range(3)
+
+
+class UpstreamError(OSError):
+    """A backend exchange failed."""
+
+
+class StaleConnection(UpstreamError):
+    """A reused connection failed before any byte of the response arrived:
+    the backend closed it while idle, and the request can be sent again."""
+
+
+class ClientError(OSError):
+    """The client side of a relay failed: the client went away, or sent a
+    malformed body."""
+
+
+def _parse_head(head):
+    """
+    Splits a response head into status code, version and headers.
+
+    :param head (bytes): status line and header fields, without the blank line.
+
+    :rtype tuple: ``(code, version, headers)``, header names in lower case.
+    """
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(None, 2)
+    try:
+        version, code = parts[0], int(parts[1])
+    except (IndexError, ValueError):
+        raise UpstreamError("invalid status line: {!r}".format(lines[0]))
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return code, version, headers
+
+
+def keep_alive_timeout(value):
+    """Returns the ``timeout=`` of a ``Keep-Alive`` header, or None."""
+    for param in value.split(","):
+        name, _, number = param.strip().partition("=")
+        if name.strip().lower() == "timeout":
+            try:
+                return float(number)
+            except ValueError:
+                return None
+    return None
+
+
+def _rewrite_head(head, extra):
+    """Drops the hop-by-hop fields of a message head and appends ``extra``
+    (header lines with their CRLF)."""
+    lines = head.split(b"\r\n")
+    kept = [lines[0]]
+    for line in lines[1:]:
+        name = line.split(b":", 1)[0].strip().lower()
+        if name.decode("latin-1") not in HOP_BY_HOP:
+            kept.append(line)
+    return b"\r\n".join(kept) + b"\r\n" + extra + b"\r\n"
+
+
+def upstream_head(head):
+    """
+    Prepares a client request head for a pooled backend connection: its
+    own ``Connection`` fields are replaced by ``Connection: keep-alive``.
+
+    :param head (bytes): request line and header fields, without the blank line.
+
+    :rtype bytes: the head to send to the backend, blank line included.
+    """
+    return _rewrite_head(head, b"Connection: keep-alive\r\n")
+
+
+class Framing:
+    """Finds where a message body ends in the bytes relayed, without
+    decoding it: after ``Content-Length`` bytes, after the last chunk and
+    trailers of a chunked body, at EOF, or right away for a message
+    without body. Fed the body piece by piece with :meth:`consume`.
+
+    :attrs kind (str): ``"none"``, ``"length"``, ``"chunked"`` or ``"eof"``.
+    :attrs remaining (int): bytes left of the body, or of the current chunk
+                            and its CRLF.
+    """
+
+    __slots__ = ("kind", "remaining", "state", "line")
+
+    def __init__(self, kind, length=0):
+        self.kind = kind
+        self.remaining = length
+        self.state = CHUNK_SIZE
+        self.line = bytearray()
+
+    @classmethod
+    def request(cls, headers):
+        """Framing of a request body: no ``Content-Length`` or chunked
+        ``Transfer-Encoding`` means no body."""
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return cls("chunked")
+        if "content-length" in headers:
+            return cls("length", _content_length(headers))
+        return cls("none")
+
+    @classmethod
+    def response(cls, method, code, headers):
+        """Framing of a response body: none for ``HEAD``, ``204`` and
+        ``304``, otherwise up to EOF when neither header is present."""
+        if method == "HEAD" or code in (204, 304):
+            return cls("none")
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return cls("chunked")
+        if "content-length" in headers:
+            return cls("length", _content_length(headers))
+        return cls("eof")
+
+    def consume(self, buf, pos, end):
+        """
+        Takes the body bytes ``buf[pos:end]``.
+
+        :rtype int: offset in ``buf`` just past the end of the body, or -1
+                    if the body goes on past ``end``.
+
+        :raises ValueError: malformed chunked framing.
+        """
+        kind = self.kind
+        if kind == "length":
+            if self.remaining <= end - pos:
+                pos += self.remaining
+                self.remaining = 0
+                return pos
+            self.remaining -= end - pos
+            return -1
+        if kind == "chunked":
+            return self._chunked(buf, pos, end)
+        return pos if kind == "none" else -1
+
+    def _chunked(self, buf, pos, end):
+        while True:
+            if self.state == CHUNK_DATA:
+                take = min(self.remaining, end - pos)
+                pos += take
+                self.remaining -= take
+                if self.remaining:
+                    return -1
+                self.state = CHUNK_SIZE
+            # Chunk-size and trailer lines may span several pieces.
+            idx = buf.find(b"\n", pos, end)
+            if idx < 0:
+                self.line += buf[pos:end]
+                if len(self.line) > MAX_CHUNK_LINE:
+                    raise ValueError("chunk line too long")
+                return -1
+            line = bytes(self.line + buf[pos:idx]).rstrip(b"\r")
+            self.line.clear()
+            pos = idx + 1
+            if self.state == CHUNK_SIZE:
+                try:
+                    size = int(line.split(b";", 1)[0].strip(), 16)
+                except ValueError:
+                    raise ValueError("invalid chunk size")
+                if size:
+                    self.remaining = size + 2
+                    self.state = CHUNK_DATA
+                else:
+                    self.state = CHUNK_TRAILER
+            elif not line:
+                return pos
+
+
+def _content_length(headers):
+    try:
+        length = int(headers["content-length"])
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise ValueError("invalid Content-Length")
+    return length
+
+
+class UpstreamConnection:
+    """One persistent connection to a backend.
+
+    :attrs key (tuple): ``(host, port)`` of the backend.
+    :attrs sock (socket.socket): the connection.
+    :attrs requests (int): requests sent on it, 0 for a fresh connection.
+    :attrs expires (float): ``time.monotonic()`` after which it is not reused.
+    :attrs received (int): bytes of the current response received so far.
+    :attrs answered (bool): whether the client got part of the current response.
+    :attrs keeps_client (bool): whether the current response left the client
+                                connection open for another request.
+    """
+
+    __slots__ = ("key", "sock", "requests", "expires", "received", "answered",
+                 "keeps_client")
+
+    def __init__(self, key, sock):
+        self.key = key
+        self.sock = sock
+        self.requests = 0
+        self.expires = 0.0
+        self.received = 0
+        self.answered = False
+        self.keeps_client = False
+
+    @classmethod
+    def open(cls, host, port):
+        sock = socket.create_connection((host, port), CONNECT_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(READ_TIMEOUT)
+        return cls((host, port), sock)
+
+    def stale(self):
+        """True if the idle connection has pending input: EOF from a backend
+        that closed it, or bytes no request asked for."""
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def relay(self, request, client, keep_alive=None):
+        """
+        Sends a client request and streams the response back as it arrives.
+
+        The request body is read from the client while it is sent, and the
+        response is written to the client while it is read, through one
+        pooled buffer: nothing waits for the whole message, and a slow
+        reader on either side stalls the other side's reads (blocking
+        writes are the backpressure).
+
+        :param request (ClientRequest): the request, head already read; see
+                                        :class:`daemon.proxy.ClientRequest`.
+        :param client (socket.socket): the client connection.
+        :param keep_alive (bytes): ``Connection`` / ``Keep-Alive`` lines for
+                                   a client connection kept open after the
+                                   response, None to close it. In both
+                                   cases they replace the backend's.
+
+        :rtype bool: whether the connection can carry another request;
+                     :attr:`keeps_client` tells whether the client's can.
+
+        :raises StaleConnection: a reused connection failed before any byte
+                                 of the response, and the request can be
+                                 sent again.
+        :raises ClientError: the client failed; the backend connection is
+                             then in an unknown state.
+        :raises OSError: any other failure; :attr:`answered` tells whether
+                         the client already got part of the response.
+        """
+        reused = self.requests > 0
+        self.requests += 1
+        self.received = 0
+        self.answered = False
+        self.keeps_client = False
+        try:
+            self.sock.sendall(request.upstream_head)
+            for piece in request.body():
+                self.sock.sendall(piece)
+            return self._relay_response(client, request.method, keep_alive)
+        except ClientError:
+            raise
+        except OSError as e:
+            if (reused and not self.received and request.replayable
+                    and not isinstance(e, socket.timeout)):
+                raise StaleConnection(str(e) or "connection closed")
+            raise
+
+    def _relay_response(self, client, method, keep_alive):
+        buf = buffers.acquire(READ_SIZE)
+        start = size = 0   # head of the final response, after interim ones
+        try:
+            with memoryview(buf) as view:
+                while True:
+                    idx = buf.find(b"\r\n\r\n", start, size)
+                    if idx < 0:
+                        if start:
+                            buf[:size - start] = buf[start:size]
+                            size -= start
+                            start = 0
+                        if size == len(buf):
+                            raise UpstreamError("response head too large")
+                        nbytes = self.sock.recv_into(view[size:])
+                        if not nbytes:
+                            raise UpstreamError("backend closed the connection before responding")
+                        self.received += nbytes
+                        size += nbytes
+                        continue
+                    code, version, headers = _parse_head(bytes(buf[start:idx]))
+                    if 100 <= code < 200 and code != 101:
+                        # Interim response (100 Continue): passed on as is.
+                        self._send(client, (view[start:idx + 4],))
+                        start = idx + 4
+                        continue
+                    break
+
+                try:
+                    framing = Framing.response(method, code, headers)
+                except ValueError as e:
+                    raise UpstreamError(str(e))
+                reusable = self.reusable(version, headers)
+                # A body delimited by EOF ends the client connection too.
+                self.keeps_client = keep_alive is not None and framing.kind != "eof"
+                connection = keep_alive if self.keeps_client else b"Connection: close\r\n"
+                pos = idx + 4
+                end = self._consume(framing, buf, pos, size)
+                head = _rewrite_head(bytes(buf[start:idx]), connection)
+                self._send(client, (head, view[pos:size if end < 0 else end]))
+                while end < 0:
+                    size = self.sock.recv_into(view)
+                    if not size:
+                        if framing.kind == "eof":
+                            return False
+                        raise UpstreamError("backend closed the connection mid-response")
+                    end = self._consume(framing, buf, 0, size)
+                    self._send(client, (view[:size if end < 0 else end],))
+                # Bytes past the response were never asked for: the
+                # connection is then not reused.
+                return reusable and end == size
+        finally:
+            buffers.release(buf)
+
+    @staticmethod
+    def _consume(framing, buf, pos, end):
+        try:
+            return framing.consume(buf, pos, end)
+        except ValueError as e:
+            raise UpstreamError(str(e))
+
+    def _send(self, client, pieces):
+        try:
+            send_buffers(client, pieces)
+        except OSError as e:
+            raise ClientError("client write failed: {}".format(e))
+        self.answered = True
+
+    def reusable(self, version, headers):
+        """Applies the ``Connection`` semantics of the response and records
+        the backend's ``Keep-Alive`` timeout."""
+        tokens = [t.strip().lower() for t in headers.get("connection", "").split(",")]
+        if "close" in tokens:
+            return False
+        if version == "HTTP/1.0" and "keep-alive" not in tokens:
+            return False
+        timeout = keep_alive_timeout(headers.get("keep-alive", ""))
+        self.expires = 0.0 if timeout is None else time.monotonic() + timeout - 1.0
+        return True
+
+
+class UpstreamPool:
+    """Idle connections to the backends, keyed by ``(host, port)``.
+
+    :attrs max_idle (int): idle connections kept per backend.
+    :attrs max_total (int): connections open at once per backend.
+    :attrs idle_timeout (float): seconds an idle connection is kept.
+    """
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE, max_total=DEFAULT_MAX_TOTAL,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.idle = {}
+        self.total = {}
+        self.created = 0
+        self.reused = 0
+        self.stale = 0
+        self.expired = 0
+        self.retried = 0
+        self.cond = threading.Condition()
+
+    def configure(self, max_idle=None, max_total=None, idle_timeout=None):
+        with self.cond:
+            if max_idle is not None:
+                self.max_idle = max_idle
+            if max_total is not None:
+                self.max_total = max_total
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout
+            self.cond.notify_all()
+
+    def acquire(self, host, port, timeout=CONNECT_TIMEOUT):
+        """
+        Returns a live idle connection to ``(host, port)``, or a new one.
+        Waits up to ``timeout`` seconds when :attr:`max_total` connections
+        are already open.
+
+        :rtype UpstreamConnection: the connection, owned by the caller until
+                                   :meth:`release`.
+
+        :raises OSError: the backend cannot be reached, or no connection
+                         was freed in time.
+        """
+        key = (host, port)
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                idle = self.idle.get(key)
+                now = time.monotonic()
+                while idle:
+                    conn = idle.pop()
+                    if now >= conn.expires:
+                        self.expired += 1
+                    elif conn.stale():
+                        self.stale += 1
+                    else:
+                        self.reused += 1
+                        return conn
+                    conn.close()
+                    self.total[key] -= 1
+                if self.total.get(key, 0) < self.max_total:
+                    self.total[key] = self.total.get(key, 0) + 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0 or not self.cond.wait(remaining):
+                    raise UpstreamError("no free connection to {}:{}".format(host, port))
+        try:
+            conn = UpstreamConnection.open(host, port)
+        except OSError:
+            with self.cond:
+                self.total[key] -= 1
+                self.cond.notify()
+            raise
+        with self.cond:
+            self.created += 1
+        return conn
+
+    def release(self, conn, reusable=True):
+        """
+        Gives a connection back after its exchange: kept idle if it can carry
+        another request and :attr:`max_idle` allows, closed otherwise.
+        """
+        with self.cond:
+            idle = self.idle.setdefault(conn.key, [])
+            now = time.monotonic()
+            # Oldest first: drop the ones that outlived the idle timeout.
+            while idle and now >= idle[0].expires:
+                idle.pop(0).close()
+                self.total[conn.key] -= 1
+                self.expired += 1
+            if reusable and len(idle) < self.max_idle:
+                expires = now + self.idle_timeout
+                conn.expires = min(conn.expires, expires) if conn.expires else expires
+                idle.append(conn)
+            else:
+                conn.close()
+                self.total[conn.key] -= 1
+            self.cond.notify()
+
+    def count_retry(self):
+        """Counts a request sent again after a :class:`StaleConnection`."""
+        with self.cond:
+            self.retried += 1
+
+    def stats(self):
+        """
+        Returns the pool counters.
+
+        :rtype dict: limits, open and idle connections per backend, and the
+                     created / reused / stale / expired / retried counts.
+        """
+        with self.cond:
+            return {
+                "max_idle": self.max_idle,
+                "max_total": self.max_total,
+                "idle_timeout": self.idle_timeout,
+                "backends": {
+                    "{}:{}".format(*key): {"open": total, "idle": len(self.idle.get(key, ()))}
+                    for key, total in self.total.items()
+                },
+                "created": self.created,
+                "reused": self.reused,
+                "stale": self.stale,
+                "expired": self.expired,
+                "retried": self.retried,
+            }
+
+
+#: Backend connections shared by every proxy thread.
+upstreams = UpstreamPool()
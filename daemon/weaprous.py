@@ -18,6 +18,7 @@ This module provides a WeApRous object to deploy RESTful url web app with routin
 """
 
 from .backend import create_backend
+from .router import parse_pattern
 
 class WeApRous:
     """The fully mutable :class:`WeApRous <WeApRous>` object, which is a lightweight,
@@ -40,6 +41,15 @@ class WeApRous:
       >>> def hello(headers, body):
       >>>     return {'message': 'Hello, world!'}
 
+      >>> @app.route('/peers/<name>', methods=['GET'])
+      >>> def peer(headers, body, name):
+      >>>     return {'peer': name}
+
+      >>> @app.route('/upload', methods=['POST'], stream=True)
+      >>> def upload(headers, body):
+      >>>     size = sum(len(piece) for piece in body)
+      >>>     return {'received': size}
+
       >>> app.run()
     """
 
@@ -64,15 +74,24 @@ class WeApRous:
         self.ip = ip
         self.port = port
 
-    def route(self, path, methods=['GET']):
+    def route(self, path, methods=['GET'], stream=False):
         """
         Decorator to register a route handler for a specific path and HTTP methods.
 
-        :param path (str): The URL path to route.
+        :param path (str): The URL path to route, with optional parameters
+                           (``/peers/<name>``, ``/items/<int:id>``,
+                           ``/static/<path:file>``) or a trailing ``*``.
         :param methods (list): A list of HTTP methods (e.g., ['GET', 'POST']) to bind.
+        :param stream (bool): pass the request body as an iterator of byte
+                              pieces read from the socket on demand, instead
+                              of the whole body as text.
 
         :rtype: function - A decorator that registers the handler function.
+
+        :raises ValueError: If the path pattern is malformed.
         """
+        parse_pattern(path)
+
         def decorator(func):
             for method in methods:
                 self.routes[(method.upper(), path)] = func
@@ -80,6 +99,7 @@ class WeApRous:
             # Optional attach route metadata to the function
             func._route_path = path
             func._route_methods = methods
+            func._route_stream = stream
 
             return func
         return decorator
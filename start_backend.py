@@ -26,6 +26,12 @@ import socket
 import argparse
 
 from daemon import create_backend
+from daemon.supervisor import run_workers
+from daemon.backend import DEFAULT_QUEUE_SIZE, DEFAULT_RETRY_AFTER
+from daemon.httpadapter import KEEPALIVE_TIMEOUT, MAX_KEEPALIVE_REQUESTS, MAX_PIPELINE_DEPTH
+from daemon.httpparser import MAX_BODY_SIZE
+from daemon.filecache import DEFAULT_CACHE_BYTES, DEFAULT_REVALIDATE_INTERVAL, DEFAULT_CACHE_CONTROL
+from daemon.compression import DEFAULT_MIN_SIZE, DEFAULT_LEVEL
 
 # Default port number used if none is specified via command-line arguments.
 PORT = 9000 
@@ -40,6 +46,20 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --pool-size (int): worker threads, 0 for thread-per-connection (default: 0).
+    :arg --queue-size (int): connections waiting for a worker before 503 (default: 128).
+    :arg --retry-after (int): Retry-After seconds sent with the 503 (default: 1).
+    :arg --engine (str): "threading" or "asyncio" (default: threading).
+    :arg --keepalive-timeout (float): idle seconds before closing a persistent connection (default: 5).
+    :arg --max-keepalive-requests (int): requests served per connection (default: 100).
+    :arg --max-pipeline (int): pipelined requests queued per connection (default: 16).
+    :arg --max-body-size (int): largest request body held in memory, larger ones get 413 (default: 16 MiB).
+    :arg --workers (int): worker processes sharing the port via SO_REUSEPORT (default: 1).
+    :arg --cache-size (int): static file cache budget in bytes, 0 disables it (default: 32 MiB).
+    :arg --cache-revalidate (float): seconds before a cached file is checked on disk again (default: 2).
+    :arg --cache-control (str): DIR=VALUE Cache-Control policy of a served directory, repeatable.
+    :arg --compress-min-size (int): smallest response body compressed (default: 1024).
+    :arg --compress-level (int): zlib level of dynamic responses, 0 disables compression (default: 6).
     """
 
     parser = argparse.ArgumentParser(
@@ -58,9 +78,132 @@ if __name__ == "__main__":
         default=PORT,
         help='Port number to bind the server. Default is {}.'.format(PORT)
     )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=0,
+        help='Number of worker threads. Default is 0 (one thread per connection).'
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help='Connections allowed to wait for a worker before answering 503. '
+             'Default is {}.'.format(DEFAULT_QUEUE_SIZE)
+    )
+    parser.add_argument(
+        '--retry-after',
+        type=int,
+        default=DEFAULT_RETRY_AFTER,
+        help='Retry-After seconds sent with the 503. Default is {}.'.format(DEFAULT_RETRY_AFTER)
+    )
+    parser.add_argument(
+        '--engine',
+        choices=['threading', 'asyncio'],
+        default='threading',
+        help='Connection engine. With asyncio, --pool-size sizes the handler executor. '
+             'Default is threading.'
+    )
+    parser.add_argument(
+        '--keepalive-timeout',
+        type=float,
+        default=KEEPALIVE_TIMEOUT,
+        help='Idle seconds before a persistent connection is closed. '
+             'Default is {}.'.format(KEEPALIVE_TIMEOUT)
+    )
+    parser.add_argument(
+        '--max-keepalive-requests',
+        type=int,
+        default=MAX_KEEPALIVE_REQUESTS,
+        help='Requests served on one connection before it is closed. '
+             'Default is {}.'.format(MAX_KEEPALIVE_REQUESTS)
+    )
+    parser.add_argument(
+        '--max-pipeline',
+        type=int,
+        default=MAX_PIPELINE_DEPTH,
+        help='Pipelined requests queued ahead on one connection. '
+             'Default is {}.'.format(MAX_PIPELINE_DEPTH)
+    )
+    parser.add_argument(
+        '--max-body-size',
+        type=int,
+        default=MAX_BODY_SIZE,
+        help='Largest request body held in memory, in bytes; a larger one is '
+             'answered with 413. Default is {}.'.format(MAX_BODY_SIZE)
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Worker processes sharing the port via SO_REUSEPORT, restarted '
+             'by a supervisor when they die. Default is 1 (no supervisor).'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=DEFAULT_CACHE_BYTES,
+        help='Bytes of static file content kept in memory, 0 disables the cache. '
+             'Default is {}.'.format(DEFAULT_CACHE_BYTES)
+    )
+    parser.add_argument(
+        '--cache-revalidate',
+        type=float,
+        default=DEFAULT_REVALIDATE_INTERVAL,
+        help='Seconds a cached file is served before its mtime and size are '
+             'checked again. Default is {}.'.format(DEFAULT_REVALIDATE_INTERVAL)
+    )
+    parser.add_argument(
+        '--cache-control',
+        action='append',
+        default=[],
+        metavar='DIR=VALUE',
+        help='Cache-Control of the files served from DIR, e.g. '
+             '"static=public, max-age=31536000". Repeatable. Defaults: {}.'.format(
+                 "; ".join("{}={}".format(*item) for item in DEFAULT_CACHE_CONTROL.items()))
+    )
  
+    parser.add_argument(
+        '--compress-min-size',
+        type=int,
+        default=DEFAULT_MIN_SIZE,
+        help='Smallest response body sent with gzip/deflate. Default is {}.'.format(DEFAULT_MIN_SIZE)
+    )
+    parser.add_argument(
+        '--compress-level',
+        type=int,
+        choices=range(0, 10),
+        default=DEFAULT_LEVEL,
+        metavar='0-9',
+        help='zlib level of the responses compressed on the fly, 0 disables '
+             'compression. Default is {}.'.format(DEFAULT_LEVEL)
+    )
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    create_backend(ip, port)
+    cache_control = {}
+    for item in args.cache_control:
+        directory, sep, value = item.partition('=')
+        if not sep or not directory or not value:
+            parser.error('--cache-control expects DIR=VALUE, got {!r}'.format(item))
+        cache_control[directory] = value
+
+    options = dict(pool_size=args.pool_size,
+                   queue_size=args.queue_size,
+                   retry_after=args.retry_after,
+                   engine=args.engine,
+                   keepalive_timeout=args.keepalive_timeout,
+                   max_keepalive_requests=args.max_keepalive_requests,
+                   max_pipeline_depth=args.max_pipeline,
+                   max_body_size=args.max_body_size,
+                   cache_size=args.cache_size,
+                   cache_revalidate=args.cache_revalidate,
+                   cache_control=cache_control,
+                   compress_min_size=args.compress_min_size,
+                   compress_level=args.compress_level)
+
+    if args.workers > 1:
+        run_workers(args.workers, ip, port, **options)
+    else:
+        create_backend(ip, port, **options)
\ No newline at end of file
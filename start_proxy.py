@@ -43,6 +43,11 @@ from urllib.parse import urlparse
 from collections import defaultdict
 
 from daemon import create_proxy
+from daemon.proxy import STATUS_HOST
+from daemon.upstream import DEFAULT_MAX_IDLE, DEFAULT_MAX_TOTAL, DEFAULT_IDLE_TIMEOUT
+from daemon.httpadapter import KEEPALIVE_TIMEOUT, MAX_KEEPALIVE_REQUESTS
+from daemon.health import (HealthCheck, DEFAULT_HEALTH_INTERVAL, DEFAULT_HEALTH_TIMEOUT,
+                           DEFAULT_HEALTH_FAILS, DEFAULT_HEALTH_PASSES)
 
 PROXY_PORT = 8080
 
@@ -51,8 +56,15 @@ def parse_virtual_hosts(config_file):
     """
     Parses virtual host blocks from a config file.
 
+    A host block lists its backends with ``proxy_pass http://host:port;``
+    (optionally followed by ``weight=N``) and picks how they share the
+    requests with ``dist_policy`` (``round-robin`` by default, see
+    :mod:`daemon.balancer` for the others).
+
     :config_file (str): Path to the NGINX config file.
-    :rtype list of dict: Each dict contains 'listen'and 'server_name'.
+    :rtype dict: host name to ``(proxy_map, dist_policy)``; ``proxy_map`` is
+                 the ``"host:port"`` of a single backend, or a list of
+                 ``"host:port"`` and ``("host:port", weight)`` entries.
     """
 
     with open(config_file, 'r') as f:
@@ -67,14 +79,18 @@ def parse_virtual_hosts(config_file):
     for host, block in host_blocks:
         proxy_map = {}
 
-        # Find all proxy_pass entries
-        proxy_passes = re.findall(r'proxy_pass\s+http://([^\s;]+);', block)
+        # Find all proxy_pass entries, "weight=N" kept for weighted-round-robin
+        proxy_passes = [
+            (address, int(weight)) if weight else address
+            for address, weight in re.findall(
+                r'proxy_pass\s+http://([^\s;]+)(?:\s+weight=(\d+))?\s*;', block)
+        ]
         map = proxy_map.get(host,[])
         map = map + proxy_passes
         proxy_map[host] = map
 
         # Find dist_policy if present
-        policy_match = re.search(r'dist_policy\s+(\w+)', block)
+        policy_match = re.search(r'dist_policy\s+([\w-]+)', block)
         if policy_match:
             dist_policy_map = policy_match.group(1)
         else: #default policy is round_robin
@@ -101,6 +117,58 @@ def parse_virtual_hosts(config_file):
     return routes
 
 
+def parse_health_checks(config_file):
+    """
+    Parses the health check settings of the host blocks of a config file.
+
+    A block enables the checks with ``health_check <path>;`` and may tune
+    them with ``health_interval``, ``health_timeout`` (seconds),
+    ``health_fails`` and ``health_passes`` (probes in a row).
+
+    :config_file (str): Path to the NGINX config file.
+    :rtype dict: host name to :class:`HealthCheck <daemon.health.HealthCheck>`,
+                 for the blocks with ``health_check`` only.
+
+    :raises ValueError: If a setting is not a number of the expected kind
+                        (whole for ``health_fails`` and ``health_passes``)
+                        or out of range.
+    """
+
+    with open(config_file, 'r') as f:
+        config_text = f.read()
+
+    host_blocks = re.findall(r'host\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL)
+
+    checks = {}
+    for host, block in host_blocks:
+        path_match = re.search(r'health_check\s+([^\s;]+)', block)
+        if not path_match:
+            continue
+
+        def setting(name, convert, default):
+            match = re.search(r'\b' + name + r'\s+([^\s;]+)', block)
+            if not match:
+                return default
+            value = match.group(1)
+            number = r'\d+' if convert is int else r'\d+(?:\.\d+)?'
+            if not re.fullmatch(number, value):
+                raise ValueError('host "{}": {} {!r} is not {}'.format(
+                    host, name, value, "a whole number" if convert is int else "a number"))
+            return convert(value)
+
+        interval = setting('health_interval', float, DEFAULT_HEALTH_INTERVAL)
+        timeout = setting('health_timeout', float, DEFAULT_HEALTH_TIMEOUT)
+        fails = setting('health_fails', int, DEFAULT_HEALTH_FAILS)
+        passes = setting('health_passes', int, DEFAULT_HEALTH_PASSES)
+        try:
+            checks[host] = HealthCheck(path_match.group(1), interval=interval,
+                                       timeout=timeout, fails=fails, passes=passes)
+        except ValueError as e:
+            raise ValueError('host "{}": {}'.format(host, e))
+        print (host, 'health_check', path_match.group(1))
+    return checks
+
+
 if __name__ == "__main__":
     """
     Entry point for launching the proxy server.
@@ -111,16 +179,74 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --keepalive-timeout (float): idle seconds before closing a persistent client connection (default: 5).
+    :arg --max-keepalive-requests (int): requests served per client connection (default: 100).
+    :arg --status-host (str): host name whose /proxy-status the proxy answers itself (default: proxy.status).
     """
 
     parser = argparse.ArgumentParser(prog='Proxy', description='', epilog='Proxy daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PROXY_PORT)
+    parser.add_argument(
+        '--keepalive-timeout',
+        type=float,
+        default=KEEPALIVE_TIMEOUT,
+        help='Idle seconds before a persistent client connection is closed. '
+             'Default is {}.'.format(KEEPALIVE_TIMEOUT)
+    )
+    parser.add_argument(
+        '--max-keepalive-requests',
+        type=int,
+        default=MAX_KEEPALIVE_REQUESTS,
+        help='Requests served on one client connection before it is closed. '
+             'Default is {}.'.format(MAX_KEEPALIVE_REQUESTS)
+    )
+    parser.add_argument(
+        '--upstream-max-idle',
+        type=int,
+        default=DEFAULT_MAX_IDLE,
+        help='Idle keep-alive connections kept per backend. '
+             'Default is {}.'.format(DEFAULT_MAX_IDLE)
+    )
+    parser.add_argument(
+        '--upstream-max-total',
+        type=int,
+        default=DEFAULT_MAX_TOTAL,
+        help='Connections open at once per backend, idle or busy. '
+             'Default is {}.'.format(DEFAULT_MAX_TOTAL)
+    )
+    parser.add_argument(
+        '--upstream-idle-timeout',
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+        help='Seconds an idle backend connection is kept. '
+             'Default is {}.'.format(DEFAULT_IDLE_TIMEOUT)
+    )
+    parser.add_argument(
+        '--status-host',
+        default=STATUS_HOST,
+        help='Host name whose /proxy-status the proxy answers itself, for '
+             'loopback clients, instead of forwarding; "" forwards every host. '
+             'Default is {}.'.format(STATUS_HOST)
+    )
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
     routes = parse_virtual_hosts("config/proxy.conf")
-
-    create_proxy(ip, port, routes)
+    try:
+        health_checks = parse_health_checks("config/proxy.conf")
+    except ValueError as e:
+        parser.error("config/proxy.conf: {}".format(e))
+    if args.status_host and args.status_host in routes:
+        parser.error('--status-host {} is also a host of config/proxy.conf'.format(args.status_host))
+
+    create_proxy(ip, port, routes,
+                 upstream_max_idle=args.upstream_max_idle,
+                 upstream_max_total=args.upstream_max_total,
+                 upstream_idle_timeout=args.upstream_idle_timeout,
+                 health_checks=health_checks,
+                 keepalive_timeout=args.keepalive_timeout,
+                 max_keepalive_requests=args.max_keepalive_requests,
+                 status_host=args.status_host)
@@ -0,0 +1,37 @@
+"""Tests of daemon.backend: the 503 answer of a saturated pool."""
+
+import socket
+import threading
+
+from daemon.backend import reject_connection
+
+
+def test_rejected_client_reads_the_503():
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        client = socket.create_connection(server.getsockname())
+        conn, _ = server.accept()
+        received = []
+
+        def read():
+            client.sendall(b"POST /add-list HTTP/1.1\r\nContent-Length: 200000\r\n\r\n"
+                           + b"x" * 200000)
+            data = b""
+            while True:
+                piece = client.recv(4096)
+                if not piece:
+                    break
+                data += piece
+            received.append(data)
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        reject_connection(conn, retry_after=7)
+        thread.join(5)
+        client.close()
+
+    head = received[0].split(b"\r\n\r\n", 1)[0]
+    assert head.startswith(b"HTTP/1.1 503 Service Unavailable\r\n")
+    assert b"\r\nRetry-After: 7\r\n" in head
+    assert b"\r\nConnection: close" in head
@@ -0,0 +1,118 @@
+"""Tests of daemon.balancer: backend selection by each dist_policy."""
+
+from collections import Counter
+
+import pytest
+
+from daemon.balancer import create_balancer, parse_members, BalancerRegistry
+
+
+def picks(balancer, count):
+    chosen = []
+    for _ in range(count):
+        member = balancer.acquire()
+        chosen.append(member.address)
+        member.release()
+    return chosen
+
+
+def test_round_robin():
+    balancer = create_balancer(["a:1", "b:2", "c:3"])
+    assert picks(balancer, 6) == ["a:1", "b:2", "c:3"] * 2
+
+
+def test_weighted_round_robin_interleaves():
+    balancer = create_balancer([("a:1", 5), "b:2", "c:3"], "weighted-round-robin")
+    assert picks(balancer, 7) == ["a:1", "a:1", "b:2", "a:1", "c:3", "a:1", "a:1"]
+
+
+def test_weighted_round_robin_reduces_weights():
+    balancer = create_balancer([("a:1", 4), ("b:2", 2)], "wrr")
+    assert len(balancer.schedule) == 3
+    assert Counter(picks(balancer, 30)) == {"a:1": 20, "b:2": 10}
+
+
+def test_least_outstanding():
+    balancer = create_balancer(["a:1", "b:2", "c:3"], "least-outstanding")
+    first, second, third = balancer.acquire(), balancer.acquire(), balancer.acquire()
+    assert [first.address, second.address, third.address] == ["a:1", "b:2", "c:3"]
+    second.release()
+    assert balancer.acquire() is second
+    third.release()
+    fourth = balancer.acquire()
+    assert fourth is third
+    assert [m.outstanding for m in balancer.members] == [1, 1, 1]
+
+
+def test_power_of_two_avoids_loaded_backend():
+    balancer = create_balancer(["a:1", "b:2"], "power-of-two")
+    busy = balancer.acquire()
+    for _ in range(20):
+        member = balancer.acquire()
+        assert member is not busy
+        member.release()
+
+
+def test_power_of_two_single_backend():
+    balancer = create_balancer(["a:1"], "p2c")
+    assert picks(balancer, 3) == ["a:1"] * 3
+
+
+@pytest.mark.parametrize("policy", ["round-robin", "weighted-round-robin",
+                                    "least-outstanding", "power-of-two"])
+def test_unhealthy_backends_are_skipped(policy):
+    balancer = create_balancer(["a:1", "b:2", "c:3"], policy)
+    a, b, c = balancer.members
+    assert balancer.set_healthy(b, False)
+    assert not balancer.set_healthy(b, False)
+    assert set(picks(balancer, 20)) == {"a:1", "c:3"}
+    balancer.set_healthy(a, False)
+    balancer.set_healthy(c, False)
+    assert balancer.acquire() is None
+    balancer.set_healthy(b, True)
+    assert set(picks(balancer, 5)) == {"b:2"}
+
+
+def test_release_after_backend_went_down():
+    balancer = create_balancer(["a:1", "b:2"], "least-outstanding")
+    member = balancer.acquire()
+    balancer.set_healthy(member, False)
+    member.release()
+    assert member.outstanding == 0
+    balancer.set_healthy(member, True)
+    assert [m.outstanding for m in balancer.members] == [0, 0]
+
+
+def test_picks_are_counted():
+    balancer = create_balancer(["a:1", "b:2"])
+    picks(balancer, 5)
+    stats = balancer.stats()
+    assert stats["policy"] == "round-robin"
+    assert {addr: m["picks"] for addr, m in stats["members"].items()} == {"a:1": 3, "b:2": 2}
+
+
+@pytest.mark.parametrize("proxy_map, policy", [
+    (["a:1"], "random"),
+    (["a"], None),
+    ([("a:1", 0)], None),
+    ([], None),
+])
+def test_invalid_configuration(proxy_map, policy):
+    with pytest.raises(ValueError):
+        create_balancer(proxy_map, policy)
+
+
+def test_parse_members():
+    members = parse_members("127.0.0.1:9000")
+    assert [(m.host, m.port, m.weight) for m in members] == [("127.0.0.1", 9000, 1)]
+
+
+def test_registry_keeps_one_balancer_per_host():
+    routes = {"app.local": (["a:1", "b:2"], "round-robin"), "empty.local": ([], None)}
+    registry = BalancerRegistry()
+    registry.configure(routes)
+    balancer = registry.lookup("app.local", routes)
+    assert registry.lookup("app.local", routes) is balancer
+    assert registry.lookup("empty.local", routes) is None
+    assert registry.lookup("other.local", routes) is None
+    assert set(registry.stats()) == {"app.local"}
@@ -0,0 +1,78 @@
+"""Tests of daemon.health: probe thresholds and health check settings."""
+
+import pytest
+
+from daemon.balancer import create_balancer
+from daemon.health import HealthCheck, MemberHealth
+from start_proxy import parse_health_checks
+
+
+def target(fails=2, passes=2):
+    balancer = create_balancer(["a:1", "b:2"])
+    return MemberHealth("app.local", balancer.members[0], HealthCheck("/", fails=fails, passes=passes))
+
+
+def test_first_probe_decides_at_once():
+    health = target()
+    assert health.record(False, "refused")
+    assert not health.member.healthy
+    assert health.member.balancer.active == [health.member.balancer.members[1]]
+
+
+def test_thresholds():
+    health = target(fails=2, passes=3)
+    health.record(True, "200")
+    assert not health.record(False, "500")
+    assert health.member.healthy
+    assert health.record(False, "500")
+    assert not health.member.healthy
+    assert not health.record(True, "200")
+    assert not health.record(True, "200")
+    assert health.record(True, "200")
+    assert health.member.healthy
+    assert (health.checks, health.successes, health.failures, health.last) == (6, 3, 0, "200")
+
+
+@pytest.mark.parametrize("settings", [
+    {"path": "status"},
+    {"interval": 0},
+    {"timeout": -1},
+    {"fails": 0},
+    {"passes": 0},
+])
+def test_invalid_check(settings):
+    with pytest.raises(ValueError):
+        HealthCheck(**settings)
+
+
+def test_timeout_capped_by_interval():
+    assert HealthCheck("/", interval=1, timeout=5).timeout == 1
+
+
+def write_config(tmp_path, block):
+    path = tmp_path / "proxy.conf"
+    path.write_text('host "app.local" {\n    proxy_pass http://127.0.0.1:9001;\n' + block + "}\n")
+    return str(path)
+
+
+def test_parse_health_checks(tmp_path):
+    config = write_config(tmp_path, "    health_check /login;\n    health_interval 2.5;\n"
+                                    "    health_fails 3;\n")
+    check = parse_health_checks(config)["app.local"]
+    assert (check.path, check.interval, check.fails, check.passes) == ("/login", 2.5, 3, 2)
+
+
+def test_hosts_without_health_check(tmp_path):
+    assert parse_health_checks(write_config(tmp_path, "")) == {}
+
+
+@pytest.mark.parametrize("block", [
+    "    health_check /login;\n    health_fails 2.5;\n",
+    "    health_check /login;\n    health_interval fast;\n",
+    "    health_check /login;\n    health_passes 0;\n",
+    "    health_check login;\n",
+])
+def test_parse_health_checks_rejects(tmp_path, block):
+    with pytest.raises(ValueError) as info:
+        parse_health_checks(write_config(tmp_path, block))
+    assert 'host "app.local"' in str(info.value)
@@ -0,0 +1,192 @@
+"""Tests of daemon.httpparser: request framing, pipelining, malformed input."""
+
+import pytest
+
+from daemon.bufferpool import SIZE_CLASSES
+from daemon.httpparser import (RequestParser, HttpParseError, BodyTooLarge,
+                               READ_SIZE)
+
+
+def parse_all(parser, data):
+    parser.feed(data)
+    requests = []
+    while True:
+        req = parser.next_request()
+        if req is None:
+            return requests
+        requests.append((req.method, req.target, req.version, req.headers, bytes(req.body)))
+        req.release()
+
+
+def test_request_without_body():
+    parser = RequestParser()
+    [(method, target, version, headers, body)] = parse_all(
+        parser, b"GET /index.html?a=1 HTTP/1.1\r\nHost: x\r\nX-Token: abc\r\n\r\n")
+    assert (method, target, version) == ("GET", "/index.html?a=1", "HTTP/1.1")
+    assert headers == {"host": "x", "x-token": "abc"}
+    assert body == b""
+    assert not parser.pending()
+
+
+def test_content_length_body_split_across_reads():
+    parser = RequestParser()
+    assert parse_all(parser, b"POST /login HTTP/1.1\r\nContent-Length: 10\r\n\r\nuser") == []
+    assert parser.pending()
+    [req] = parse_all(parser, b"=admin")
+    assert req[4] == b"user=admin"
+    assert not parser.pending()
+
+
+def test_content_length_body_complete():
+    parser = RequestParser()
+    [req] = parse_all(parser, b"POST /login HTTP/1.1\r\nContent-Length: 10\r\n\r\nuser=admin")
+    assert req[0] == "POST"
+    assert req[4] == b"user=admin"
+
+
+def test_head_split_across_reads():
+    parser = RequestParser()
+    assert parse_all(parser, b"GET / HTTP/1.1\r\nHost: x\r") == []
+    assert parse_all(parser, b"\n\r") == []
+    [req] = parse_all(parser, b"\n")
+    assert req[:2] == ("GET", "/")
+
+
+def test_chunked_body():
+    parser = RequestParser()
+    [req] = parse_all(parser, b"POST /up HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+                              b"5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\nX-Trailer: 1\r\n\r\n")
+    assert req[4] == b"hello world"
+    assert "content-length" not in req[3]
+
+
+def test_chunked_body_byte_by_byte():
+    data = (b"POST /up HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"3\r\nabc\r\na\r\n0123456789\r\n0\r\n\r\n")
+    parser = RequestParser()
+    requests = []
+    for i in range(len(data)):
+        requests += parse_all(parser, data[i:i + 1])
+    assert [req[4] for req in requests] == [b"abc0123456789"]
+    assert not parser.pending()
+
+
+def test_transfer_encoding_overrides_content_length():
+    parser = RequestParser()
+    [req] = parse_all(parser, b"POST /up HTTP/1.1\r\nContent-Length: 100\r\n"
+                              b"Transfer-Encoding: chunked\r\n\r\n2\r\nok\r\n0\r\n\r\n")
+    assert req[4] == b"ok"
+
+
+def test_pipelined_requests():
+    parser = RequestParser()
+    requests = parse_all(parser, b"GET /a HTTP/1.1\r\n\r\n"
+                                 b"POST /b HTTP/1.1\r\nContent-Length: 3\r\n\r\nxyz"
+                                 b"POST /c HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n1\r\nq\r\n0\r\n\r\n"
+                                 b"GET /d HTTP/1.1\r\n")
+    assert [(req[1], req[4]) for req in requests] == [("/a", b""), ("/b", b"xyz"), ("/c", b"q")]
+    assert parser.pending()
+    [req] = parse_all(parser, b"\r\n")
+    assert req[1] == "/d"
+
+
+def test_empty_lines_before_request_line():
+    parser = RequestParser()
+    [req] = parse_all(parser, b"\r\n\r\nGET /a HTTP/1.1\r\n\r\n")
+    assert req[1] == "/a"
+
+
+def test_request_line_without_version():
+    parser = RequestParser()
+    [req] = parse_all(parser, b"GET /a\r\n\r\n")
+    assert req[2] == "HTTP/1.1"
+
+
+@pytest.mark.parametrize("data", [
+    b"GET\r\n\r\n",
+    b"GET / HTTP/1.1 extra\r\n\r\n",
+    b"POST / HTTP/1.1\r\nContent-Length: ten\r\n\r\n",
+    b"POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+    b"POST / HTTP/1.1\r\nTransfer-Encoding: gzip\r\n\r\n",
+    b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n",
+])
+def test_malformed_request(data):
+    parser = RequestParser()
+    with pytest.raises(HttpParseError) as info:
+        parse_all(parser, data)
+    assert info.value.status == "400 Bad Request"
+
+
+def test_header_block_too_large():
+    parser = RequestParser(max_header_size=64)
+    with pytest.raises(HttpParseError):
+        parse_all(parser, b"GET / HTTP/1.1\r\nX-Long: " + b"a" * 100)
+
+
+def test_content_length_above_limit():
+    parser = RequestParser(max_body_size=1024)
+    with pytest.raises(BodyTooLarge) as info:
+        parse_all(parser, b"POST / HTTP/1.1\r\nContent-Length: 1025\r\n\r\n")
+    assert info.value.status == "413 Content Too Large"
+
+
+def test_chunked_body_above_limit():
+    parser = RequestParser(max_body_size=1024)
+    parse_all(parser, b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n")
+    with pytest.raises(BodyTooLarge):
+        for _ in range(3):
+            parse_all(parser, b"200\r\n" + b"x" * 0x200 + b"\r\n")
+
+
+def test_buffer_grows_with_received_bytes():
+    size = 4 * 1024 * 1024
+    parser = RequestParser()
+    parser.feed(b"POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % size)
+    assert parser.next_request() is None
+    # Nothing announced is allocated ahead: a pooled buffer holds the first reads.
+    with parser.writable() as view:
+        assert len(view) <= SIZE_CLASSES[-1]
+    received = 0
+    while received < size:
+        with parser.writable() as view:
+            n = min(len(view), size - received)
+            view[:n] = b"x" * n
+        parser.commit(n)
+        received += n
+        assert len(parser.buffer) <= max(2 * parser.end + READ_SIZE, SIZE_CLASSES[-1])
+    req = parser.next_request()
+    assert len(req.body) == size
+    req.release()
+
+
+def test_streamed_body():
+    parser = RequestParser(stream_body=lambda method, target: target == "/up")
+    parser.feed(b"POST /up HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n")
+    req = parser.next_request()
+    pieces = [b"2\r\nde\r\n0\r\n\r\nGET /next HTTP/1.1\r\n\r\n"]
+
+    def fill():
+        if not pieces:
+            return 0
+        parser.feed(pieces.pop())
+        return 1
+
+    req.body.fill = fill
+    assert req.body.read() == b"abcde"
+    [nxt] = parse_all(parser, b"")
+    assert nxt[1] == "/next"
+
+
+def test_bench_reader_parses_its_requests():
+    from tools.bench_reader import MemorySocket, build_request, parser_read
+
+    size = 3 * 64 * 1024 + 5
+    req = parser_read(MemorySocket(build_request(size)))
+    assert req.method == "POST"
+    assert len(req.body) == size
+    req.release()
+    req = parser_read(MemorySocket(build_request(size)), max_body_size=size)
+    assert len(req.body) == size
+    req.release()
+    with pytest.raises(BodyTooLarge):
+        parser_read(MemorySocket(build_request(size)), max_body_size=size - 1)
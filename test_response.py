@@ -0,0 +1,49 @@
+"""Tests of daemon.response.parse_range."""
+
+import pytest
+
+from daemon.response import parse_range, MAX_RANGES
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=100-", [(100, 999)]),
+    ("bytes=-200", [(800, 999)]),
+    ("bytes=-5000", [(0, 999)]),
+    ("bytes=900-5000", [(900, 999)]),
+    ("BYTES = 0-0 , 10-19", [(0, 0), (10, 19)]),
+    ("bytes=500-599,0-9", [(500, 599), (0, 9)]),
+    ("bytes=0-9,5000-6000", [(0, 9)]),
+])
+def test_satisfiable(value, expected):
+    assert parse_range(value, 1000) == expected
+
+
+@pytest.mark.parametrize("value", ["bytes=1000-", "bytes=2000-3000", "bytes=-0"])
+def test_unsatisfiable(value):
+    assert parse_range(value, 1000) == []
+
+
+def test_empty_file():
+    assert parse_range("bytes=-10", 0) == []
+    assert parse_range("bytes=0-", 0) == []
+
+
+@pytest.mark.parametrize("value", [
+    "items=0-9",
+    "bytes",
+    "bytes=",
+    "bytes=abc",
+    "bytes=5-1",
+    "bytes=-",
+    "bytes=1-2-3",
+    "bytes=+1-2",
+])
+def test_ignored(value):
+    assert parse_range(value, 1000) is None
+
+
+def test_too_many_ranges():
+    value = "bytes=" + ",".join("%d-%d" % (i, i) for i in range(MAX_RANGES + 1))
+    assert parse_range(value, 1000) is None
+    assert len(parse_range(value, 1000, max_ranges=MAX_RANGES + 1)) == MAX_RANGES + 1
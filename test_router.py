@@ -0,0 +1,139 @@
+"""Tests of daemon.router: route matching and request path normalization."""
+
+import pytest
+
+from daemon.request import Request
+from daemon.router import RouteTable, compile_routes, normalize_path, parse_pattern
+
+
+def handler(name, stream=False):
+    def func(req):
+        return name
+    func.stream = stream
+    return func
+
+
+def table(*paths, method="GET"):
+    entries = {}
+    for path in paths:
+        entries[(method, path)] = handler(path, stream=path.startswith("/upload"))
+    return RouteTable(entries, {})
+
+
+def matched(routes, method, path):
+    func, params, allow = routes.match(method, path)
+    return (func(None) if func else None), params, allow
+
+
+def prepared(path, routes=None):
+    req = Request()
+    req.prepare_parsed("GET", path, "HTTP/1.1", {}, b"", compile_routes(routes))
+    return req
+
+
+def test_exact_path():
+    routes = table("/login", "/index.html")
+    assert matched(routes, "GET", "/login") == ("/login", {}, None)
+
+
+def test_unknown_path_is_404():
+    routes = table("/login")
+    assert matched(routes, "GET", "/nothing") == (None, {}, None)
+
+
+def test_other_method_is_405_with_allow():
+    routes = RouteTable({("GET", "/login"): handler("get"),
+                         ("POST", "/login"): handler("post")}, {})
+    func, params, allow = routes.match("PUT", "/login")
+    assert func is None
+    assert set(allow.split(", ")) == {"GET", "POST"}
+
+
+def test_app_route_overrides_builtin():
+    routes = compile_routes({("get", "/login"): lambda: "mine"})
+    func, _, _ = routes.match("GET", "/login")
+    assert func is not None
+    assert compile_routes(routes) is routes
+
+
+def test_root_goes_to_app_route():
+    req = prepared("/", {("GET", "/"): lambda: "home"})
+    assert req.path == "/"
+    assert req.hook is not None
+
+
+def test_root_falls_back_to_index():
+    req = prepared("/?x=1")
+    assert req.path == "/index.html"
+    assert req.hook is compile_routes().get(("GET", "/index.html"))
+
+
+def test_request_path_is_normalized():
+    req = prepared("//log%69n")
+    assert req.path == "/login"
+    assert req.hook is not None
+
+
+def test_dot_segments_are_bad_requests():
+    req = prepared("/static/%2e%2e/users.json")
+    assert req.hook(req)[0].startswith("400")
+
+
+def test_parameters():
+    routes = table("/peers/<name>", "/items/<int:id>", "/static/<path:file>", "/files/*")
+    assert matched(routes, "GET", "/peers/alice") == ("/peers/<name>", {"name": "alice"}, None)
+    assert matched(routes, "GET", "/items/42") == ("/items/<int:id>", {"id": 42}, None)
+    assert matched(routes, "GET", "/static/css/chat.css") == (
+        "/static/<path:file>", {"file": "css/chat.css"}, None)
+    assert matched(routes, "GET", "/files/a/b") == ("/files/*", {"*": "a/b"}, None)
+    assert matched(routes, "GET", "/peers/alice/more")[0] is None
+
+
+def test_precedence():
+    routes = table("/items/new", "/items/<int:id>", "/items/<name>", "/items/*")
+    assert matched(routes, "GET", "/items/new")[0] == "/items/new"
+    assert matched(routes, "GET", "/items/7")[0] == "/items/<int:id>"
+    assert matched(routes, "GET", "/items/seven")[0] == "/items/<name>"
+    assert matched(routes, "GET", "/items/a/b")[0] == "/items/*"
+
+
+@pytest.mark.parametrize("path", ["peers", "/a/*/b", "/a/<path:p>/b", "/a/<float:x>", "/a/<1x>"])
+def test_malformed_pattern(path):
+    with pytest.raises(ValueError):
+        parse_pattern(path)
+
+
+def test_streams_uses_normalized_path():
+    routes = table("/upload", "/login", method="POST")
+    assert routes.streams("POST", "/upload?x=1")
+    assert routes.streams("POST", "//upload")
+    assert routes.streams("POST", "/%75pload")
+    assert not routes.streams("POST", "/login")
+    assert not routes.streams("GET", "/upload")
+    assert not routes.streams("POST", "/../upload")
+    assert not table("/login", method="POST").has_streams
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/index.html", "/index.html"),
+    ("//index.html", "/index.html"),
+    ("/css///chat.css", "/css/chat.css"),
+    ("/hello%20world.txt", "/hello world.txt"),
+    ("/.hidden/x", "/.hidden/x"),
+    ("/a/..b", "/a/..b"),
+])
+def test_normalize_path(path, expected):
+    assert normalize_path(path) == expected
+
+
+@pytest.mark.parametrize("path", [
+    "index.html",
+    "/./index.html",
+    "/%2e/index.html",
+    "/static/../apps/sampleapp.py",
+    "/static/%2e%2e/users.json",
+    "/static/..",
+    "/a/.",
+])
+def test_normalize_path_rejects(path):
+    assert normalize_path(path) is None
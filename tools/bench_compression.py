@@ -0,0 +1,131 @@
+"""
+tools.bench_compression
+~~~~~~~~~~~~~~~~~
+
+Bytes on the wire and CPU per request of the response content codings, for
+the bodies the backend actually sends: the ``www/`` pages, the ``static/``
+stylesheets and ``/get-list`` answers of growing size.
+
+For every body the table shows the identity size and, for each coding, the
+encoded size and the CPU time spent per request:
+
+- static files (``www/``, ``static/``) go through
+  :meth:`FileCache.encoded <daemon.filecache.FileCache.encoded>`, so the
+  variant is compressed once at :data:`STATIC_LEVEL` and a request only
+  pays the lookup; the one-time build cost is shown separately;
+- ``/get-list`` is compressed on the fly by
+  :meth:`Encoder.encode <daemon.compression.Encoder.encode>` at ``--level``.
+
+CPU time is process time, best of ``--repeat`` rounds.
+
+Usage::
+
+  python tools/bench_compression.py
+  python tools/bench_compression.py --level 1 --entries 10 300 3000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.compression import CODINGS, STATIC_LEVEL, Encoder, compress
+from daemon.filecache import FileCache
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+#: Static files measured, relative to the repository root.
+STATIC_FILES = [
+    ("www/index.html", "text/html"),
+    ("www/login.html", "text/html"),
+    ("static/css/chat.css", "text/css"),
+    ("static/css/styles.css", "text/css"),
+]
+
+
+def build_list(count):
+    entries = [{"user": "user{}".format(i), "item": "item{}".format(i),
+                "host": "127.0.0.1", "port": 20000 + i} for i in range(count)]
+    return json.dumps({"count": count, "list": entries}).encode()
+
+
+def measure(fn, repeat):
+    """Best of ``repeat`` rounds of CPU seconds per call; a round runs for 0.2 s."""
+    best = None
+    for _ in range(repeat):
+        loops = 0
+        started = time.process_time()
+        while True:
+            fn()
+            loops += 1
+            elapsed = time.process_time() - started
+            if elapsed >= 0.2:
+                break
+        per_call = elapsed / loops
+        best = per_call if best is None else min(best, per_call)
+    return best
+
+
+def fmt(seconds):
+    if seconds < 1e-3:
+        return "{:.1f} us".format(seconds * 1e6)
+    return "{:.2f} ms".format(seconds * 1e3)
+
+
+def row(name, identity, cells):
+    print("{:<24} {:>9}".format(name, identity) + "".join(
+        " {:>9} {:>10}".format(size, cpu) for size, cpu in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content coding benchmark")
+    parser.add_argument("--level", type=int, default=6,
+                        help="zlib level of the on-the-fly compression")
+    parser.add_argument("--entries", type=int, nargs="+", default=[10, 300, 3000],
+                        help="/get-list sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    header = "{:<24} {:>9}".format("body", "identity")
+    for coding in CODINGS:
+        header += " {:>9} {:>10}".format(coding, "cpu/req")
+    print(header)
+
+    cache = FileCache()
+    for path, content_type in STATIC_FILES:
+        full = os.path.join(ROOT, path)
+        if not os.path.isfile(full):
+            continue
+        entry = cache.get(full, content_type)
+        cells = []
+        builds = []
+        for coding in CODINGS:
+            builds.append(fmt(measure(lambda: compress(entry.content, coding, STATIC_LEVEL),
+                                      args.repeat)))
+            variant = cache.encoded(entry, coding)
+            cpu = measure(lambda: cache.encoded(cache.get(full, content_type), coding), args.repeat)
+            cells.append((len(variant.content), fmt(cpu)))
+        row(path, entry.size, cells)
+        print("{:<24} {:>9}".format("  (built once)", "") + "".join(
+            " {:>9} {:>10}".format("", build) for build in builds))
+
+    encoder = Encoder(level=args.level)
+    for count in args.entries:
+        body = build_list(count)
+        cells = []
+        for coding in CODINGS:
+            request = {"accept-encoding": coding}
+
+            def encode():
+                return encoder.encode(request, "200 OK",
+                                      {"Content-Type": "application/json"}, body)
+            _, data = encode()
+            cells.append((len(data), fmt(measure(encode, args.repeat))))
+        row("/get-list {} entries".format(count), len(body), cells)
+
+
+if __name__ == "__main__":
+    main()
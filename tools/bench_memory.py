@@ -0,0 +1,160 @@
+"""
+tools.bench_memory
+~~~~~~~~~~~~~~~~~
+
+Per-connection memory footprint of the backend objects, measured with
+:mod:`tracemalloc` over ``--connections`` simultaneous idle keep-alive
+connections (10 000 by default), each holding the adapter, request and
+response objects it had after serving one request:
+
+- ``legacy`` replicates the former ``__dict__`` classes: an adapter that
+  builds its :class:`Response`, :class:`RequestParser` and pipeline
+  ``deque`` up front, a response creating its ``CaseInsensitiveDict``,
+  ``timedelta`` and history list in ``__init__``;
+- ``slotted`` is the current :class:`HttpAdapter`, :class:`Request` and
+  :class:`Response`: ``__slots__`` and members created on first use.
+
+The threading engine reads through the adapter's parser, the asyncio
+engine through its own, so both cases are shown. Both versions use the
+current (slotted) :class:`RequestParser`, and its receive buffer is left
+out: it depends on the traffic, not on the objects.
+
+Usage::
+
+  python tools/bench_memory.py
+  python tools/bench_memory.py --connections 50000
+"""
+
+import argparse
+import datetime
+import gc
+import os
+import sys
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import daemon.request
+from daemon.dictionary import CaseInsensitiveDict
+from daemon.httpadapter import HttpAdapter
+from daemon.httpparser import RequestParser
+from daemon.request import Request
+from daemon.response import Response
+
+daemon.request.DEBUG = False
+
+#: Request every connection has served, as handed out by the parser.
+HEADERS = {
+    "host": "127.0.0.1:9000",
+    "user-agent": "Mozilla/5.0 (X11; Linux x86_64) Chrome/123.0.0.0",
+    "accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+    "connection": "keep-alive",
+}
+
+
+class LegacyRequest:
+    """The former ``Request``: a ``__dict__`` class."""
+
+    prepare_parsed = Request.prepare_parsed
+
+    def __init__(self):
+        self.method = None
+        self.url = None
+        self.headers = None
+        self.path = None
+        self.cookies = None
+        self.body = None
+        self.routes = {}
+        self.hook = None
+        self.params = {}
+        self.allow = None
+        self.query = {}
+        self.user = None
+        self.auth = False
+
+
+class LegacyResponse:
+    """The former ``Response.__init__``."""
+
+    def __init__(self):
+        self._content = False
+        self._content_consumed = False
+        self._next = None
+        self.status_code = None
+        self.headers = {}
+        self.url = None
+        self.encoding = None
+        self.history = []
+        self.reason = None
+        self.cookies = CaseInsensitiveDict()
+        self.elapsed = datetime.timedelta(0)
+        self.request = None
+
+
+class LegacyAdapter:
+    """The former ``HttpAdapter.__init__``."""
+
+    def __init__(self, ip, port, conn, connaddr, routes):
+        self.ip = ip
+        self.port = port
+        self.conn = conn
+        self.connaddr = connaddr
+        self.routes = routes
+        self.request = LegacyRequest()
+        self.response = LegacyResponse()
+        self.keep_alive = False
+        self.allow_keep_alive = False
+        self.served = 0
+        self.parser = RequestParser(stream_body=None)
+        self.pipeline = deque()
+        self.closing = False
+
+
+def serve_one(adapter, threaded):
+    """Leaves ``adapter`` as it is after one request on a keep-alive connection."""
+    if threaded:
+        adapter.parser
+        adapter.pipeline
+    adapter.served = 1
+    adapter.keep_alive = adapter.allow_keep_alive = True
+    adapter.request.prepare_parsed("GET", "/index.html", "HTTP/1.1",
+                                   dict(HEADERS), b"", None)
+
+
+def footprint(factory, threaded, count):
+    """Bytes allocated per connection for ``count`` live connections."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    live = []
+    for i in range(count):
+        adapter = factory("127.0.0.1", 9000, None, ("127.0.0.1", 40000 + i % 20000), None)
+        serve_one(adapter, threaded)
+        live.append(adapter)
+    # The list holding the connections is not part of their footprint.
+    after = tracemalloc.get_traced_memory()[0] - sys.getsizeof(live)
+    tracemalloc.stop()
+    del live
+    gc.collect()
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-connection memory benchmark")
+    parser.add_argument("--connections", type=int, default=10000)
+    args = parser.parse_args()
+
+    print("{} connections".format(args.connections))
+    print("{:<10} {:>12} {:>12} {:>10}".format("engine", "legacy", "slotted", "saved"))
+    for engine, threaded in (("threading", True), ("asyncio", False)):
+        legacy = footprint(LegacyAdapter, threaded, args.connections)
+        slotted = footprint(HttpAdapter, threaded, args.connections)
+        print("{:<10} {:>8.0f} B/c {:>8.0f} B/c {:>9.0%}".format(
+            engine, legacy, slotted, 1 - slotted / legacy))
+        print("{:<10} {:>8.1f} MB   {:>8.1f} MB".format(
+            "", legacy * args.connections / 1e6, slotted * args.connections / 1e6))
+
+
+if __name__ == "__main__":
+    main()
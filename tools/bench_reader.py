@@ -0,0 +1,181 @@
+"""
+tools.bench_reader
+~~~~~~~~~~~~~~~~~
+
+Microbenchmark of the request read path: the original ``recv(4096)`` /
+``msg += chunk`` / decode-everything loop of ``HttpAdapter.handle_client``
+against :class:`daemon.httpparser.RequestParser`, for POST bodies of 1 KB,
+1 MB and 50 MB.
+
+Both readers pull from the same in-memory socket, which hands out at most
+64 KB per call like a kernel receive buffer would, so the numbers are the
+CPU cost of framing, header parsing and copying only. The legacy side also
+pays for the second header pass the POST branches did to find the body.
+The legacy loop is quadratic; it is abandoned once it exceeds ``--budget``
+seconds and reported as a lower bound.
+
+Usage::
+
+  python tools/bench_reader.py
+  python tools/bench_reader.py --sizes 1024 1048576 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.bufferpool import buffers
+from daemon.httpparser import RequestParser, MAX_BODY_SIZE, MAX_HEADER_SIZE, READ_SIZE
+
+#: Largest number of bytes the fake socket returns from one call.
+DELIVERY = 64 * 1024
+
+
+class MemorySocket:
+    """Serves a prebuilt request through ``recv`` / ``recv_into``."""
+
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def recv(self, size):
+        size = min(size, DELIVERY)
+        chunk = bytes(self.data[self.pos:self.pos + size])
+        self.pos += len(chunk)
+        return chunk
+
+    def recv_into(self, view):
+        size = min(len(view), DELIVERY, len(self.data) - self.pos)
+        view[:size] = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return size
+
+
+def legacy_read(conn, budget):
+    """The original read loop, minus the socket timeouts."""
+    started = time.perf_counter()
+    msg = b""
+    while True:
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        msg += chunk
+
+        raw_req = msg.decode(errors="ignore")
+        header_end = raw_req.find("\r\n\r\n")
+        if header_end == -1:
+            continue
+
+        headers_part = raw_req[:header_end]
+        content_len = 0
+        for line in headers_part.split("\r\n"):
+            if line.lower().startswith("content-length:"):
+                content_len = int(line.split(":", 1)[1].strip())
+                break
+
+        body_bytes_len = len(msg) - (header_end + 4)
+        if content_len == 0 or body_bytes_len >= content_len:
+            break
+        if time.perf_counter() - started > budget:
+            return None
+    # Request.prepare parsed the headers, then the POST branch rescanned
+    # them for Content-Length and sliced the body out of ``msg``.
+    raw_req = msg.decode(errors="ignore")
+    headers = {}
+    for line in raw_req.split("\r\n")[1:]:
+        if ": " in line:
+            key, val = line.split(": ", 1)
+            headers[key.lower()] = val
+    header_end = raw_req.find("\r\n\r\n")
+    for line in raw_req[:header_end].split("\r\n"):
+        if line.lower().startswith("content-length:"):
+            content_len = int(line.split(":", 1)[1].strip())
+            break
+    start = header_end + 4
+    return msg[start:start + content_len]
+
+
+def parser_read(conn, max_body_size=MAX_BODY_SIZE):
+    """Reads one request with :class:`RequestParser`, which accepts bodies
+    up to ``max_body_size`` bytes."""
+    parser = RequestParser(max_body_size=max_body_size)
+    while True:
+        req = parser.next_request()
+        if req is not None:
+            return req
+        nbytes = conn.recv_into(parser.writable())
+        if not nbytes:
+            return None
+        parser.commit(nbytes)
+
+
+def build_request(size):
+    body = b"x" * size
+    head = ("POST /add-list HTTP/1.1\r\n"
+            "Host: 127.0.0.1:9000\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: {}\r\n"
+            "\r\n").format(size).encode()
+    return head + body
+
+
+def measure(fn, data, repeat):
+    """Best of ``repeat`` rounds; a round loops until it has run for 0.2 s."""
+    best = None
+    for _ in range(repeat):
+        loops = 0
+        started = time.perf_counter()
+        while True:
+            if fn(MemorySocket(data)) is None:
+                return None
+            loops += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= 0.2:
+                break
+        per_call = elapsed / loops
+        best = per_call if best is None else min(best, per_call)
+    return best
+
+
+def fmt(seconds, budget):
+    if seconds is None:
+        return "> {:.0f} s".format(budget)
+    if seconds < 1e-3:
+        return "{:.1f} us".format(seconds * 1e6)
+    if seconds < 1:
+        return "{:.2f} ms".format(seconds * 1e3)
+    return "{:.2f} s".format(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request reader microbenchmark")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1024, 1024 * 1024, 50 * 1024 * 1024])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=30.0,
+                        help="seconds before the legacy loop is abandoned")
+    args = parser.parse_args()
+
+    # The benchmark bodies may be above the server's default cap.
+    max_body_size = max(max(args.sizes), MAX_BODY_SIZE)
+    buffers.configure(max_size=max(buffers.max_size,
+                                   MAX_HEADER_SIZE + max_body_size + READ_SIZE))
+
+    print("{:>12} {:>14} {:>14} {:>10}".format("body", "legacy loop", "RequestParser", "speedup"))
+    for size in args.sizes:
+        data = build_request(size)
+        legacy = measure(lambda c: legacy_read(c, args.budget), data, args.repeat)
+        new = measure(lambda c: parser_read(c, max_body_size), data, args.repeat)
+        if legacy is None:
+            speedup = "> {:.0f}x".format(args.budget / new)
+        else:
+            speedup = "{:.1f}x".format(legacy / new)
+        print("{:>12} {:>14} {:>14} {:>10}".format(
+            size, fmt(legacy, args.budget), fmt(new, args.budget), speedup))
+
+
+if __name__ == "__main__":
+    main()